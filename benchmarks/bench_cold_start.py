@@ -0,0 +1,120 @@
+# Cold-start cost of a new server process, run from the repo root:
+#
+#   python -m benchmarks.bench_cold_start --repeat 5
+#
+# Each sample is a fresh interpreter. 'server' times `streamlit run main.py`
+# from launch until it answers the health check and serves the app's HTML.
+# 'first_run' times the first script run of main.py (the Resume page) under
+# AppTest, with and without the background warm-up, lists which heavy
+# libraries it imported and how long the warm-up took to finish behind it.
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+HEAVY_MODULES = ['numpy', 'pandas', 'pyarrow', 'matplotlib', 'scipy', 'altair']
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def server_start(timeout):  # Seconds from launch to a healthy server and to its first HTML response
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-m', 'streamlit', 'run', 'main.py', '--server.headless', 'true',
+                               '--server.port', str(port), '--browser.gatherUsageStats', 'false'],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env={**os.environ, 'WARM_UP': '0'})
+    try:
+        healthy = None
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1) as response:
+                    if response.status == 200:
+                        healthy = time.perf_counter() - start
+                        break
+            except (urllib.error.URLError, ConnectionError, OSError):
+                time.sleep(0.02)
+        if healthy is None:
+            raise RuntimeError(f'streamlit did not become healthy within {timeout} s')
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=timeout) as response:
+            response.read()
+        return {'healthy_s': healthy, 'first_response_s': time.perf_counter() - start}
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def first_run(warm_up):  # Runs in a fresh interpreter; see child()
+    env = {**os.environ, 'WARM_UP': '1' if warm_up else '0'}
+    output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_cold_start', '--child'],
+                            env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def child():
+    # Everything up to AppTest is harness cost, reported apart from the run itself
+    start = time.perf_counter()
+    import streamlit.logger
+    streamlit.logger.set_log_level('error')
+    from streamlit.testing.v1 import AppTest
+    harness = time.perf_counter() - start
+    at = AppTest.from_file('main.py', default_timeout=120)
+    start = time.perf_counter()
+    at.run()
+    result = {'harness_s': harness, 'first_run_s': time.perf_counter() - start}
+    result['exceptions'] = [str(e.value) for e in at.exception]
+    # With the warm-up on, its thread may have imported some of these already
+    result['heavy_modules_loaded'] = [name for name in HEAVY_MODULES if name in sys.modules]
+    from utils.warmup import WARM_UP, start_warmup
+    if WARM_UP:
+        start = time.perf_counter()
+        start_warmup().join()
+        result['warm_up_remaining_s'] = time.perf_counter() - start
+    print(json.dumps(result))
+
+
+def summarize(samples, field):
+    values = [sample[field] for sample in samples if field in sample]
+    return {'median': statistics.median(values), 'min': min(values), 'max': max(values)} if values else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark cold start of the app.')
+    parser.add_argument('--repeat', type=int, default=3, help='fresh processes per measurement')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--skip-server', action='store_true', help='only time the first script run')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--out', help='JSON output path, stdout if omitted')
+    args = parser.parse_args(argv)
+    if args.child:
+        child()
+        return
+    results = {}
+    if not args.skip_server:
+        samples = [server_start(args.timeout) for _ in range(args.repeat)]
+        results['server'] = {field: summarize(samples, field) for field in ('healthy_s', 'first_response_s')}
+    for name, warm_up in (('first_run', False), ('first_run_with_warm_up', True)):
+        samples = [first_run(warm_up) for _ in range(args.repeat)]
+        print(json.dumps({name: samples}), file=sys.stderr)
+        results[name] = {field: summarize(samples, field) for field in ('harness_s', 'first_run_s', 'warm_up_remaining_s')}
+        results[name]['heavy_modules_loaded'] = samples[-1]['heavy_modules_loaded']
+        results[name]['exceptions'] = samples[-1]['exceptions']
+    output = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
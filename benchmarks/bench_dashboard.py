@@ -0,0 +1,202 @@
+# Headless benchmark of the Sales Dashboard pipeline, run from the repo root:
+#
+#   python -m benchmarks.bench_dashboard --rows 10000 1000000 --out bench.json
+#   python -m benchmarks.bench_dashboard --csv assets/salesDF.csv
+#   python -m benchmarks.bench_dashboard --rows 10000 --baseline bench.json
+#
+# Times every stage the page runs (CSV load and clean, snapshot write/read,
+# index and cube builds, filtering, each tab's aggregation and each chart
+# render) for a set of filter scenarios and writes the results as JSON. With
+# --baseline, exits non-zero when a stage is slower than tolerance x baseline.
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import matplotlib
+import numpy as np
+import pandas as pd
+import streamlit.logger
+
+matplotlib.use('Agg')
+# The cache decorators warn about the missing Streamlit runtime on import
+streamlit.logger.set_log_level('error')
+
+from benchmarks.synth_sales import write_sales_csv
+from utils.charts import (draw_customer_orders, draw_customer_sales, draw_product_mix, draw_sales_by_rep, draw_sales_trend,
+                          draw_turnaround, render_figure)
+from utils.sales_aggregates import (build_order_facts, build_order_stats, summarize_customers, summarize_products,
+                                    summarize_sales_reps, summarize_sales_trends, summarize_turnaround)
+from utils.sales_cube import SalesCube
+from utils.sales_data import current_rss, read_sales_csv, read_snapshot, write_snapshot
+from utils.sales_index import SalesFilter, SalesIndex
+
+TOP_CUSTOMERS = 10
+
+
+def timed(fn, repeat):  # Result of the last call and the wall time of each call
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        seconds.append(time.perf_counter() - start)
+    return result, seconds
+
+
+def make_scenarios(sales_df):  # Representative filter states, from the page default to narrow selections
+    start = sales_df['Order Received'].min().date()
+    end = dt.date.today()
+    top_rep = sales_df.groupby('Sales Rep', observed=True)['Line Item Total ($)'].sum().idxmax()
+    top_category = sales_df['Product Category'].value_counts().index[0]
+    top_customers = sales_df['Customer'].value_counts().index[:3]
+    last_day = sales_df['Order Received'].max().date()
+    return {
+        'default': SalesFilter((), (), (), (), start, end),
+        'one_rep': SalesFilter((top_rep,), (), (), (), start, end),
+        'category_customers': SalesFilter((), (top_category,), (), tuple(top_customers), start, end),
+        'last_60_days': SalesFilter((), (), (), (), last_day - dt.timedelta(days=60), end),
+    }
+
+
+def bench_file(csv_path, repeat, charts=True):
+    results = []
+
+    def record(stage, seconds, scenario=None, **extra):
+        results.append({
+            'stage': stage,
+            'scenario': scenario,
+            'median_s': statistics.median(seconds),
+            'min_s': min(seconds),
+            'repeat': len(seconds),
+            'rss_mb': current_rss() / 1e6,
+            **extra,
+        })
+
+    # --- Load ---
+    sales_df, seconds = timed(lambda: read_sales_csv(csv_path), repeat)
+    record('load.csv', seconds, rows=len(sales_df), frame_mb=sales_df.memory_usage(deep=True).sum() / 1e6)
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_path = os.path.join(tmp, 'sales.parquet')
+        _, seconds = timed(lambda: write_snapshot(sales_df, csv_path, snapshot_path), repeat)
+        record('load.snapshot_write', seconds, file_mb=os.path.getsize(snapshot_path) / 1e6)
+        _, seconds = timed(lambda: read_snapshot(snapshot_path), repeat)
+        record('load.snapshot_read', seconds)
+    index, seconds = timed(lambda: SalesIndex(sales_df), repeat)
+    record('build.index', seconds)
+    cube, seconds = timed(lambda: SalesCube(sales_df, index), repeat)
+    record('build.cube', seconds, cells=len(cube.cells))
+
+    # --- Per Filter State ---
+    for scenario, sales_filter in make_scenarios(sales_df).items():
+        positions, seconds = timed(lambda: index.positions(sales_filter), repeat)
+        record('filter', seconds, scenario, rows=len(positions))
+        if not len(positions):
+            continue
+        cells, seconds = timed(lambda: cube.query(sales_filter), repeat)
+        record('aggregate.cells', seconds, scenario, cells=len(cells))
+        order_facts, seconds = timed(lambda: build_order_facts(sales_df.take(positions)), repeat)
+        record('aggregate.order_facts', seconds, scenario, orders=len(order_facts))
+        order_stats, seconds = timed(lambda: build_order_stats(order_facts), repeat)
+        record('aggregate.order_stats', seconds, scenario, customers=len(order_stats.customers))
+
+        tabs = {
+            'trends': lambda: summarize_sales_trends(cells),
+            'reps': lambda: summarize_sales_reps(cells, order_stats),
+            'products': lambda: summarize_products(cells),
+            'customers': lambda: summarize_customers(cells, order_stats, TOP_CUSTOMERS),
+            'turnaround': lambda: summarize_turnaround(order_stats),
+        }
+        summaries = {}
+        for tab, summarize in tabs.items():
+            summaries[tab], seconds = timed(summarize, repeat)
+            record(f'tab.{tab}', seconds, scenario)
+        if not charts:
+            continue
+
+        trends, reps, products = summaries['trends'], summaries['reps'], summaries['products']
+        customers, tat = summaries['customers'], summaries['turnaround'].tat_counts
+        by_period = trends.sales_by_period
+        renders = {
+            'sales_trend': lambda: render_figure(draw_sales_trend, by_period[trends.period_col], by_period['Line Item Total ($)'],
+                                                 trends.trend_line, figsize=(8, 4)),
+            'sales_by_rep': lambda: render_figure(draw_sales_by_rep, reps.sales_by_rep.index, reps.sales_by_rep),
+            'product_mix': lambda: render_figure(draw_product_mix, products.sales_pivot),
+            'customer_sales': lambda: render_figure(draw_customer_sales, customers['Customer'], customers['total_sales']),
+            'customer_orders': lambda: render_figure(draw_customer_orders, customers['Customer'], customers['order_count']),
+            'turnaround': lambda: render_figure(draw_turnaround, tat.index.to_series(), weights=tat.to_numpy()),
+        }
+        for chart, render in renders.items():
+            image, seconds = timed(render, repeat)
+            record(f'chart.{chart}', seconds, scenario, png_kb=len(image) / 1e3)
+    return results
+
+
+def find_regressions(results, baseline, tolerance, floor_s=0.005):
+    # Stages slower than tolerance x the baseline median; very fast stages are too noisy to judge
+    previous = {(r['dataset'], r['stage'], r['scenario']): r['median_s'] for r in baseline['results']}
+    regressions = []
+    for r in results:
+        base = previous.get((r['dataset'], r['stage'], r['scenario']))
+        if base is not None and r['median_s'] > max(base, floor_s) * tolerance:
+            regressions.append({**r, 'baseline_s': base, 'ratio': r['median_s'] / base if base else float('inf')})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the Sales Dashboard pipeline without Streamlit.')
+    parser.add_argument('--rows', type=int, nargs='*', help='synthetic dataset sizes, 10000 if no --csv is given')
+    parser.add_argument('--csv', nargs='*', default=[], help='existing salesDF-shaped CSV files')
+    parser.add_argument('--data-dir', default=tempfile.gettempdir(), help='where synthetic CSVs are written and reused')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-charts', action='store_true', help='skip the chart renders')
+    parser.add_argument('--out', help='JSON output path, stdout if omitted')
+    parser.add_argument('--baseline', help='earlier JSON output to compare against')
+    parser.add_argument('--tolerance', type=float, default=1.5)
+    args = parser.parse_args(argv)
+
+    datasets = {os.path.basename(path): path for path in args.csv}
+    for rows in args.rows if args.rows is not None else ([] if args.csv else [10_000]):
+        path = os.path.join(args.data_dir, f'synthetic_sales_{rows}_{args.seed}.csv')
+        if not os.path.exists(path):
+            write_sales_csv(path, rows, seed=args.seed)
+        datasets[f'synthetic_{rows}'] = path
+
+    results = []
+    for name, path in datasets.items():
+        for r in bench_file(path, args.repeat, charts=not args.no_charts):
+            results.append({'dataset': name, **r})
+    report = {
+        'created': dt.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'results': results,
+    }
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['regressions'] = find_regressions(results, json.load(f), args.tolerance)
+        for r in report['regressions']:
+            print(f"REGRESSION {r['dataset']} {r['stage']} [{r['scenario']}]: "
+                  f"{r['median_s']:.4f}s vs {r['baseline_s']:.4f}s ({r['ratio']:.2f}x)", file=sys.stderr)
+        status = 1 if report['regressions'] else 0
+
+    output = json.dumps(report, indent=2, default=str)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+# Time per step of the groundwater engine as the grid is refined, run from the repo root:
+#
+#   python -m benchmarks.bench_groundwater --grids 50x25 100x50 200x100 400x200 --out gw.json
+#
+# Reports the one-off factorization, the per-step flow solve and transport
+# substep, how many substeps stability needs at that resolution, and the
+# resulting wall time per 5-day step of the page's default scenario.
+import argparse
+import json
+import statistics
+import sys
+import time
+import numpy as np
+import streamlit.logger
+
+# The cache decorators warn about the missing Streamlit runtime on import
+streamlit.logger.set_log_level('error')
+
+from scipy.sparse.linalg import splu
+from utils.groundwater import (GroundwaterParams, conductivity_field, dispersion_coefficients, flow_matrix, flow_rhs,
+                               seepage_velocity, simulate_groundwater, stable_substeps, transport_step)
+
+
+def median_seconds(fn, repeat):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+    return statistics.median(seconds)
+
+
+def bench_grid(nx, ny, steps, repeat):
+    params = GroundwaterParams(nx=nx, ny=ny, days=5.0 * steps, steps=steps, snapshot_every=steps, pump_start=0.0)
+    k = conductivity_field(params)
+    dt = params.days / params.steps
+    matrix = flow_matrix(params, k, dt)
+    factorize = median_seconds(lambda: splu(matrix), repeat)
+    solver = splu(matrix)
+    h = np.full(k.shape, params.head_right)
+    pumping = np.zeros_like(k)
+    solve = median_seconds(lambda: solver.solve(flow_rhs(params, h, dt, pumping)), repeat)
+    h = solver.solve(flow_rhs(params, h, dt, pumping)).reshape(k.shape)
+    vx, vy = seepage_velocity(params, k, h)
+    dx_face, dy_face = dispersion_coefficients(params, vx, vy)
+    c = np.random.default_rng(0).random(k.shape)
+    sink = np.zeros_like(k)
+    substep = median_seconds(lambda: transport_step(params, c, vx, vy, dx_face, dy_face, sink, dt), repeat)
+    start = time.perf_counter()
+    run = simulate_groundwater(params)
+    total = time.perf_counter() - start
+    return {
+        'grid': f'{nx}x{ny}',
+        'cells': nx * ny,
+        'factorize_ms': factorize * 1000,
+        'flow_solve_ms': solve * 1000,
+        'transport_substep_ms': substep * 1000,
+        'substeps_per_step': run.substeps / steps,
+        'first_step_substeps': stable_substeps(params, vx, vy, dx_face, dy_face, dt),
+        'step_ms': total / steps * 1000,
+        'steps': steps,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the groundwater engine across grid sizes.')
+    parser.add_argument('--grids', nargs='*', default=['50x25', '100x50', '200x100', '400x200'])
+    parser.add_argument('--steps', type=int, default=10, help='5-day steps simulated per grid')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--out', help='JSON output path, stdout if omitted')
+    args = parser.parse_args(argv)
+    results = []
+    for grid in args.grids:
+        nx, ny = (int(n) for n in grid.lower().split('x'))
+        results.append(bench_grid(nx, ny, args.steps, args.repeat))
+        print(json.dumps(results[-1]), file=sys.stderr)
+    output = json.dumps({'results': results}, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
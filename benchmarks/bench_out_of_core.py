@@ -0,0 +1,129 @@
+# Out-of-core Sales Dashboard queries against the in-memory path, run from the repo root:
+#
+#   python -m benchmarks.bench_out_of_core --rows 100000 1000000
+#   python -m benchmarks.bench_out_of_core --csv assets/salesDF.csv
+#
+# Writes the month partitions, then for each filter scenario builds every tab
+# summary both ways, checks they match and reports the time and peak memory
+# of each. Peak memory is Python-side allocations (tracemalloc, which covers
+# numpy and pandas buffers) plus the Arrow pool's high-water mark.
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+import pyarrow as pa
+import streamlit.logger
+
+# The cache decorators warn about the missing Streamlit runtime on import
+streamlit.logger.set_log_level('error')
+
+from benchmarks.bench_dashboard import TOP_CUSTOMERS, make_scenarios
+from benchmarks.synth_sales import write_sales_csv
+from utils.sales_aggregates import (build_order_facts, build_order_stats, summarize_customers, summarize_products,
+                                    summarize_sales_reps, summarize_sales_trends, summarize_turnaround)
+from utils.sales_cube import SalesCube
+from utils.sales_data import read_sales_csv
+from utils.sales_index import SalesIndex
+from utils.sales_partitions import SalesPartitions, write_partitions
+
+
+def summarize_all(cells, order_stats):
+    return {
+        'trends': summarize_sales_trends(cells),
+        'reps': summarize_sales_reps(cells, order_stats),
+        'products': summarize_products(cells),
+        'customers': summarize_customers(cells, order_stats, TOP_CUSTOMERS),
+        'turnaround': summarize_turnaround(order_stats),
+    }
+
+
+def same(a, b):  # Summaries equal to float rounding; frames and series compared by value
+    if isinstance(a, (pd.DataFrame, pd.Series)):
+        try:
+            (pd.testing.assert_frame_equal if isinstance(a, pd.DataFrame) else pd.testing.assert_series_equal)(
+                a, b, check_dtype=False, check_categorical=False, check_index_type=False)
+            return True
+        except AssertionError:
+            return False
+    if isinstance(a, tuple):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    if isinstance(a, float):
+        return abs(a - b) <= 1e-9 * max(1.0, abs(a))
+    if hasattr(a, '__len__') and not isinstance(a, str):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def measured(fn):  # Result, seconds and peak MB of one call
+    pool = pa.default_memory_pool()
+    arrow_before = pool.max_memory() or 0
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # The Arrow high-water mark only ever rises, so this is an upper bound
+    return result, seconds, (peak + max(0, (pool.max_memory() or 0) - arrow_before)) / 1e6
+
+
+def bench_file(csv_path, parts_dir):
+    _, build_s, build_mb = measured(lambda: write_partitions(csv_path, parts_dir))
+    partitions = SalesPartitions(parts_dir)
+    results = {'partitions_build_s': build_s, 'partitions_build_peak_mb': build_mb, 'months': len(partitions.months), 'scenarios': {}}
+    sales_df, load_s, load_mb = measured(lambda: read_sales_csv(csv_path))
+    index = SalesIndex(sales_df)
+    cube = SalesCube(sales_df, index)
+    results.update(in_memory_load_s=load_s, in_memory_load_peak_mb=load_mb)
+    for scenario, sales_filter in make_scenarios(sales_df).items():
+        positions = index.positions(sales_filter)
+        if not len(positions):
+            continue
+        memory, memory_s, memory_mb = measured(
+            lambda: summarize_all(cube.query(sales_filter), build_order_stats(build_order_facts(sales_df.take(positions)))))
+        on_disk, disk_s, disk_mb = measured(lambda: summarize_all(*partitions.query(sales_filter)))
+        results['scenarios'][scenario] = {
+            'rows': len(positions),
+            'in_memory_s': memory_s, 'in_memory_peak_mb': memory_mb,
+            'out_of_core_s': disk_s, 'out_of_core_peak_mb': disk_mb,
+            'mismatched_tabs': [tab for tab in memory if not same(memory[tab], on_disk[tab])],
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare out-of-core and in-memory dashboard queries.')
+    parser.add_argument('--rows', type=int, nargs='*', default=None, help='synthetic dataset sizes (default 100000 if no --csv)')
+    parser.add_argument('--csv', nargs='*', default=[], help='existing salesDF-shaped CSVs to benchmark')
+    parser.add_argument('--data-dir', default=tempfile.gettempdir(), help='where synthetic CSVs are written and reused')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='JSON output path, stdout if omitted')
+    args = parser.parse_args(argv)
+    paths = list(args.csv)
+    for rows in args.rows if args.rows is not None else ([] if args.csv else [100_000]):
+        path = os.path.join(args.data_dir, f'synthetic_sales_{rows}_{args.seed}.csv')
+        if not os.path.exists(path):
+            write_sales_csv(path, rows, args.seed)
+        paths.append(path)
+    results, mismatches = {}, 0
+    for path in paths:
+        with tempfile.TemporaryDirectory() as tmp:
+            results[path] = bench_file(path, os.path.join(tmp, 'partitions'))
+        mismatches += sum(len(s['mismatched_tabs']) for s in results[path]['scenarios'].values())
+        print(json.dumps({path: results[path]}), file=sys.stderr)
+    output = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+# Memory of several dashboard worker processes with and without the shared
+# sales data, run from the repo root:
+#
+#   python -m benchmarks.bench_shared_data --rows 1000000 --workers 4
+#   python -m benchmarks.bench_shared_data --csv assets/salesDF.csv
+#
+# Starts --workers fresh processes per mode. Each one loads the sales data
+# ('private': its own SalesStore, 'shared': attached to one published
+# generation) and builds every tab summary for the benchmark's filter
+# scenarios. While all of them are still alive, each reads its RSS, PSS
+# (shared pages split between the processes mapping them) and private
+# memory from /proc/self/smaps_rollup, so this only runs on Linux. The sum of
+# PSS is what the workers cost the machine together.
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.synth_sales import write_sales_csv
+
+
+def memory_mb():  # RSS, PSS and private memory of this process
+    fields = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {'rss_mb': fields['Rss'], 'pss_mb': fields['Pss'],
+            'private_mb': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)}
+
+
+def worker(mode, csv_path, root, loaded, results):
+    import streamlit.logger
+    # The cache decorators warn about the missing Streamlit runtime on import
+    streamlit.logger.set_log_level('error')
+    from benchmarks.bench_dashboard import make_scenarios
+    from benchmarks.bench_out_of_core import summarize_all
+    from utils.sales_aggregates import build_order_facts, build_order_stats
+    from utils.sales_shared import SharedSalesStore
+    from utils.sales_store import SalesStore
+    start = time.perf_counter()
+    store = SharedSalesStore(csv_path, root) if mode == 'shared' else SalesStore(csv_path)
+    snapshot = store.snapshot()
+    load_s = time.perf_counter() - start
+    for sales_filter in make_scenarios(snapshot.segments[0].sales_df).values():
+        lines = snapshot.lines(sales_filter)
+        if len(lines):
+            summarize_all(snapshot.cells(sales_filter), build_order_stats(build_order_facts(lines)))
+    # Measure only once every worker holds its data, then stay alive until all have measured
+    loaded.wait()
+    results.put({'load_s': load_s, 'rows': snapshot.rows, **memory_mb()})
+    loaded.wait()
+
+
+def run_workers(mode, csv_path, root, workers):
+    context = multiprocessing.get_context('spawn')
+    loaded, results = context.Barrier(workers), context.Queue()
+    processes = [context.Process(target=worker, args=(mode, csv_path, root, loaded, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    samples = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return {
+        'workers': workers,
+        'rows': samples[0]['rows'],
+        'load_s_median': statistics.median(sample['load_s'] for sample in samples),
+        'load_s_max': max(sample['load_s'] for sample in samples),
+        'rss_mb_per_worker': statistics.median(sample['rss_mb'] for sample in samples),
+        'private_mb_per_worker': statistics.median(sample['private_mb'] for sample in samples),
+        'pss_mb_total': sum(sample['pss_mb'] for sample in samples),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare worker memory with private and shared sales data.')
+    parser.add_argument('--rows', type=int, nargs='*', default=None, help='synthetic dataset sizes (default 500000 if no --csv)')
+    parser.add_argument('--csv', nargs='*', default=[], help='existing salesDF-shaped CSVs to benchmark')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--data-dir', default=tempfile.gettempdir(), help='where synthetic CSVs are written and reused')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='JSON output path, stdout if omitted')
+    args = parser.parse_args(argv)
+    paths = list(args.csv)
+    for rows in args.rows if args.rows is not None else ([] if args.csv else [500_000]):
+        path = os.path.join(args.data_dir, f'synthetic_sales_{rows}_{args.seed}.csv')
+        if not os.path.exists(path):
+            write_sales_csv(path, rows, args.seed)
+        paths.append(path)
+    results = {}
+    for path in paths:
+        with tempfile.TemporaryDirectory() as tmp:
+            # Both modes start from the same parsed snapshot next to the CSV, so load time compares fairly
+            results[path] = {mode: run_workers(mode, path, os.path.join(tmp, 'shared'), args.workers)
+                             for mode in ('private', 'shared')}
+        print(json.dumps({path: results[path]}), file=sys.stderr)
+    output = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
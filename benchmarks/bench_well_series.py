@@ -0,0 +1,104 @@
+# Query latency of the monitoring-well store as the record grows, run from the repo root:
+#
+#   python -m benchmarks.bench_well_series --wells 20 --analytes 3 --years 10 --interval 15
+#
+# Writes a synthetic store (logger readings every --interval minutes: a
+# seasonal cycle, slow trend, noise and occasional spikes per well/analyte),
+# then times windows of decreasing length. Every window returns at most
+# MAX_POINTS points, so query time should stay flat as --years grows.
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+import streamlit.logger
+
+# The cache decorators warn about the missing Streamlit runtime on import
+streamlit.logger.set_log_level('error')
+
+from utils.well_series import MAX_POINTS, WellSeriesStore, WellSeriesWriter
+
+ANALYTES = [('Benzene', 'µg/L'), ('Nitrate', 'mg/L'), ('Water level', 'm'), ('Conductivity', 'µS/cm')]
+WINDOWS = {'all': None, 'year': 365, 'month': 30, 'week': 7, 'day': 1}
+
+
+def synthetic_series(rng, start, samples, interval):
+    times = np.datetime64(start, 's') + (np.arange(samples) * interval * 60).astype('timedelta64[s]')
+    days = np.arange(samples) * interval / 1440
+    values = (10 + 3 * np.sin(2 * np.pi * days / 365.25 + rng.uniform(0, 2 * np.pi)) + rng.normal(0, 0.002) * days
+              + rng.normal(0, 0.5, samples))
+    spikes = rng.random(samples) < 1e-4
+    values[spikes] += rng.exponential(20, spikes.sum())
+    return times, values
+
+
+def write_store(root, wells, analytes, years, interval, seed):
+    rng = np.random.default_rng(seed)
+    samples = int(years * 365.25 * 1440 / interval)
+    writer = WellSeriesWriter(root)
+    for well in range(wells):
+        for analyte, unit in ANALYTES[:analytes]:
+            writer.write(f'MW-{well + 1}', analyte, *synthetic_series(rng, '2015-01-01', samples, interval), unit)
+    writer.close()
+    return samples
+
+
+def bench_store(root, repeat, seed):
+    store = WellSeriesStore(root)
+    rng = np.random.default_rng(seed)
+    keys = list(store.catalog)
+    results = {}
+    for name, days in WINDOWS.items():
+        seconds, points, levels = [], [], set()
+        for _ in range(repeat):
+            well, analyte = keys[rng.integers(len(keys))]
+            first, last = store.span(well, analyte)
+            if days is None:
+                start, end = first, last
+            else:
+                length = np.timedelta64(days * 86400, 's')
+                start = first + (last - first - length) * rng.random()
+                end = start + length
+            begin = time.perf_counter()
+            window = store.query(well, analyte, start, end)
+            seconds.append(time.perf_counter() - begin)
+            points.append(len(window.times))
+            levels.add(window.level)
+        results[name] = {'median_ms': statistics.median(seconds) * 1000, 'max_ms': max(seconds) * 1000,
+                         'max_points': max(points), 'levels': sorted(levels)}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark monitoring-well window queries.')
+    parser.add_argument('--wells', type=int, default=10)
+    parser.add_argument('--analytes', type=int, default=2, choices=range(1, len(ANALYTES) + 1))
+    parser.add_argument('--years', type=float, default=5.0)
+    parser.add_argument('--interval', type=float, default=15.0, help='minutes between logger readings')
+    parser.add_argument('--root', help='store directory, a temporary one if omitted')
+    parser.add_argument('--repeat', type=int, default=20, help='queries per window length')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='JSON output path, stdout if omitted')
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        root = args.root or os.path.join(tmp, 'monitoring')
+        start = time.perf_counter()
+        samples = write_store(root, args.wells, args.analytes, args.years, args.interval, args.seed)
+        build = time.perf_counter() - start
+        print(f'wrote {args.wells * args.analytes} series of {samples:,} samples in {build:.1f} s', file=sys.stderr)
+        output = json.dumps({
+            'series': args.wells * args.analytes, 'samples_per_series': samples, 'build_s': build,
+            'max_points': MAX_POINTS, 'windows': bench_store(root, args.repeat, args.seed),
+        }, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
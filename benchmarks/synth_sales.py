@@ -0,0 +1,98 @@
+# Synthetic salesDF.csv-shaped data for benchmarks.
+#
+#   python -m benchmarks.synth_sales --rows 1000000 --out /tmp/sales_1m.csv
+#
+# Same raw columns and string formats as assets/salesDF.csv (hex order IDs,
+# '2021-04-30 10:30 AM' timestamps, '$1,900.00' totals), with anonymized
+# Customer_N / Sales Rep_N / Product_N values and multi-line orders.
+import argparse
+import numpy as np
+import pandas as pd
+
+# Odd, so multiplying by it modulo 2**32 permutes the 32-bit range: sequential
+# order numbers become unique IDs that still look random
+ORDER_ID_MULTIPLIER = 0x9E3779B1
+RAW_HEADER = ['', 'orderID', 'anon_customer', 'order_date', 'start_ship_date', 'anon_rep', 'anon_product_line',
+              'anon_product', 'Qty (Units)', 'line_item_total', 'anon_category']
+
+
+def make_catalog(rng, products=120, product_lines=14, categories=6):
+    # Products belong to lines, lines to categories; the last lines carry the
+    # anomalous Category_4-6 that clean_sales drops, and are rarely ordered
+    line_category = np.concatenate([np.arange(product_lines - 3) % 3, np.arange(3, categories)])
+    product_line = np.concatenate([np.arange(product_lines), rng.integers(0, product_lines - 3, products - product_lines)])
+    product_weight = np.where(line_category[product_line] < 3, 1.0, 0.25)
+    unit_price = np.round(np.exp(rng.normal(3.5, 1.5, products)), 2)
+    return product_line, line_category[product_line], product_weight / product_weight.sum(), unit_price
+
+
+def generate_sales(rows, seed=0, chunk_rows=1_000_000, customers=None, reps=None, start='2021-01-01', years=4):
+    # Yields raw frames of about chunk_rows line items each, whole orders only
+    rng = np.random.default_rng(seed)
+    customers = customers or max(50, int(rows ** 0.6))
+    reps = reps or max(5, int(np.log2(max(rows, 2))) // 2)
+    product_line, product_category, product_weight, unit_price = make_catalog(rng)
+    customer_rep = rng.integers(0, reps, customers)
+    # Popular customers order far more often than the long tail
+    customer_weight = 1 / np.arange(1, customers + 1) ** 0.9
+    customer_weight /= customer_weight.sum()
+    start = np.datetime64(start, 'm')
+    span_minutes = years * 365 * 24 * 60
+    row_id, order_id, produced = 0, 0, 0
+    while produced < rows:
+        target = min(chunk_rows, rows - produced)
+        # Lines per order are geometric, mean about 4
+        order_lines = rng.geometric(0.25, target)
+        order_lines = order_lines[np.cumsum(order_lines) <= target]
+        if not len(order_lines):
+            order_lines = np.array([target])
+        order_lines[-1] += target - order_lines.sum()
+        orders = len(order_lines)
+        order_customer = rng.choice(customers, orders, p=customer_weight)
+        # Orders arrive in time order, during business hours
+        order_day = np.sort(rng.integers(0, span_minutes // (24 * 60), orders))
+        order_time = start + (order_day * 24 * 60 + rng.integers(8 * 60, 18 * 60, orders)).astype('timedelta64[m]')
+        tat = np.clip(rng.exponential(4, orders).astype(int), 0, 40)
+        shipped = rng.random(orders) > 0.04
+        # Unique across the whole file, so no order merges with another customer's or month's
+        order_ids = (np.arange(order_id, order_id + orders, dtype=np.uint64) * ORDER_ID_MULTIPLIER) % 2 ** 32
+
+        per_line = np.repeat(np.arange(orders), order_lines)
+        product = rng.choice(len(unit_price), target, p=product_weight)
+        qty = np.where(rng.random(target) < 0.7, rng.integers(1, 100, target), rng.integers(1, 5, target)).astype(float)
+        total = np.round(qty * unit_price[product], 2)
+
+        ship_date = pd.Series(pd.to_datetime(order_time + tat.astype('timedelta64[D]')).strftime('%Y-%m-%d'))
+        ship_date[~shipped] = None
+        frame = pd.DataFrame({
+            '': np.arange(row_id, row_id + target),
+            'orderID': pd.Series(order_ids).map('{:08x}'.format).to_numpy()[per_line],
+            'anon_customer': ('Customer_' + pd.Series(order_customer + 1).astype(str)).to_numpy()[per_line],
+            'order_date': pd.to_datetime(order_time).strftime('%Y-%m-%d %I:%M %p').to_numpy()[per_line],
+            'start_ship_date': ship_date.to_numpy()[per_line],
+            'anon_rep': ('Sales Rep_' + pd.Series(customer_rep[order_customer] + 1).astype(str)).to_numpy()[per_line],
+            'anon_product_line': 'Product_Line_' + pd.Series(product_line[product] + 1).astype(str),
+            'anon_product': 'Product_' + pd.Series(product + 1).astype(str),
+            'Qty (Units)': qty,
+            'line_item_total': pd.Series(total).map('${:,.2f}'.format),
+            'anon_category': 'Category_' + pd.Series(product_category[product] + 1).astype(str),
+        }, columns=RAW_HEADER)
+        yield frame
+        row_id += target
+        order_id += orders
+        produced += target
+
+
+def write_sales_csv(path, rows, seed=0, chunk_rows=1_000_000):
+    for i, frame in enumerate(generate_sales(rows, seed=seed, chunk_rows=chunk_rows)):
+        frame.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write a synthetic salesDF.csv-shaped file.')
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', required=True)
+    args = parser.parse_args()
+    write_sales_csv(args.out, args.rows, seed=args.seed)
@@ -1,8 +1,11 @@
 import streamlit as st
 import re
-import requests
+import sqlite3
 import time  # To generate unique form keys
 
+from forms.delivery import FAILED, QUEUED, load_delivery_queue
+from forms.throttle import REJECTION_MESSAGES, load_submission_guard, request_identity
+
 WEBHOOK_URL = st.secrets['webhook']['WEBHOOK_URL']
 
 def email_is_valid(address):
@@ -38,11 +41,53 @@ def contact_form():
             data = {'email': email, 'name': name, 'message': message}
             st.write("Message Preview: ", data)
             
+            # Rate limits and duplicate suppression, before anything is queued or sent
+            guard = load_submission_guard()
+            rejection = guard.check(*request_identity(), data)
+            if rejection:
+                st.error(REJECTION_MESSAGES[rejection], icon='🛑')
+                return
+
+            # Hand the message to the background delivery queue; the form returns at once
             try:
-                response = requests.post(WEBHOOK_URL, json=data)
-                if response.status_code == 200:
-                    st.success('Thanks for your message!', icon='🚀')
-                else:
-                    st.error(f"Error sending message: {response.status_code}. Details: {response.text}", icon='😱')
-            except Exception as e:
-                st.error(f"An error occurred: {str(e)}", icon='😱')
+                message_id = load_delivery_queue(WEBHOOK_URL).submit(data)
+            except sqlite3.Error:
+                # Never queued, so sending it again is not a duplicate
+                guard.forget(data)
+                st.error('Email service error. Please try again later.', icon='📧')
+                return
+            st.session_state['contact_message_id'] = message_id
+            st.session_state['contact_payload'] = data
+
+    if 'contact_message_id' in st.session_state:
+        delivery_status(st.session_state['contact_message_id'])
+
+@st.fragment(run_every=2)
+def delivery_status(message_id):  # Polls the spool so the status updates without a full rerun
+    status = load_delivery_queue(WEBHOOK_URL).status(message_id)
+    if status is not None and status[0] == QUEUED:
+        if status[1] == 0:
+            st.info('Sending your message...', icon='📨')
+        else:
+            st.warning('The email service is slow to respond. Your message is saved and will be retried.', icon='⏳')
+        return
+    # Sent, failed or gone from the spool. Only a full rerun stops the polling;
+    # it closes the dialog, so the outcome is shown by delivery_notice instead.
+    del st.session_state['contact_message_id']
+    payload = st.session_state.pop('contact_payload', None)
+    if payload is not None and (status is None or status[0] == FAILED):
+        # Not delivered, so the same message may be sent again
+        load_submission_guard().forget(payload)
+    st.session_state['contact_delivery'] = status
+    st.rerun()
+
+def delivery_notice():  # The outcome of the last message once it is final, shown once
+    if 'contact_delivery' not in st.session_state:
+        return
+    status = st.session_state.pop('contact_delivery')
+    if status is None:
+        st.toast('Your message could not be found. Please send it again.', icon='❔')
+    elif status[0] == FAILED:
+        st.toast(f"Error sending message. Details: {status[2]}", icon='😱')
+    else:
+        st.toast('Thanks for your message!', icon='🚀')
@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+SPOOL_PATH = r'./spool/contact_outbox.db'
+
+# Connect and read timeouts in seconds; a slow webhook only ever holds the worker
+TIMEOUT = (3.05, 10)
+MAX_ATTEMPTS = 8
+BASE_DELAY = 1.0  # Seconds before the first retry, doubled after each failure
+MAX_DELAY = 300.0
+# Client errors other than these will fail the same way on every retry
+RETRYABLE_4XX = {408, 425, 429}
+
+QUEUED, SENT, FAILED = 'queued', 'sent', 'failed'
+
+
+def retry_delay(attempts, base=BASE_DELAY, cap=MAX_DELAY):  # Exponential backoff with full jitter
+    return random.uniform(0, min(cap, base * 2 ** (attempts - 1)))
+
+
+class DeliveryQueue:
+    # Outbound webhook messages. submit() writes the message to a SQLite spool
+    # and returns at once; a single background worker posts it over a pooled
+    # session, retrying with backoff. Messages still queued when the process
+    # stops are picked up again by the next queue opened on the same spool.
+    def __init__(self, url, spool_path=SPOOL_PATH, timeout=TIMEOUT, max_attempts=MAX_ATTEMPTS, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+        self.url = url
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        if os.path.dirname(spool_path):
+            os.makedirs(os.path.dirname(spool_path), exist_ok=True)
+        self._db = sqlite3.connect(spool_path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS outbox ('
+            'id INTEGER PRIMARY KEY, url TEXT, payload TEXT, status TEXT, attempts INTEGER DEFAULT 0, '
+            'next_attempt REAL, last_error TEXT, created REAL, updated REAL)')
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._worker = threading.Thread(target=self._run, name='contact-delivery', daemon=True)
+        self._worker.start()
+
+    def submit(self, payload):  # Spool a message for delivery and return its id
+        now = time.time()
+        with self._lock:
+            message_id = self._db.execute(
+                'INSERT INTO outbox (url, payload, status, next_attempt, created, updated) VALUES (?, ?, ?, ?, ?, ?)',
+                (self.url, json.dumps(payload), QUEUED, now, now, now)).lastrowid
+        self._wake.set()
+        return message_id
+
+    def status(self, message_id):  # (status, attempts, last_error), or None for an unknown id
+        with self._lock:
+            return self._db.execute('SELECT status, attempts, last_error FROM outbox WHERE id = ?', (message_id,)).fetchone()
+
+    def wait(self, message_id, timeout=None):  # Block until the message is sent or failed; mostly for tests
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while deadline is None or time.monotonic() < deadline:
+            status = self.status(message_id)
+            if status is None or status[0] != QUEUED:
+                return status
+            time.sleep(0.05)
+        return self.status(message_id)
+
+    def close(self):
+        self._stopped.set()
+        self._wake.set()
+        self._worker.join()
+        self.session.close()
+        self._db.close()
+
+    # --- Worker ---
+    def _next_due(self):  # The oldest message due now, or how long until one is
+        with self._lock:
+            row = self._db.execute(
+                'SELECT id, url, payload, attempts, next_attempt FROM outbox WHERE status = ? ORDER BY next_attempt, id LIMIT 1',
+                (QUEUED,)).fetchone()
+        if row is None:
+            return None, None
+        wait = row[4] - time.time()
+        return (row, 0) if wait <= 0 else (None, wait)
+
+    def _run(self):
+        # The only worker: if it died, every later message would stay queued
+        # for good, so no error may escape the loop
+        while not self._stopped.is_set():
+            row = None
+            try:
+                row, wait = self._next_due()
+                if row is None:
+                    self._wake.wait(wait)
+                    self._wake.clear()
+                    continue
+                self._deliver(*row[:4])
+            except Exception as e:
+                logger.exception('Contact delivery worker error')
+                if row is not None:
+                    # Counts as an attempt, so a message that always fails ends up failed
+                    try:
+                        self._record(row[0], row[3] + 1, f'{type(e).__name__}: {e}', True)
+                    except Exception:
+                        logger.exception('Could not record the failed attempt of contact message %d', row[0])
+                # Back off, so a broken spool does not spin the loop
+                self._stopped.wait(self.base_delay)
+
+    def _deliver(self, message_id, url, payload, attempts):
+        attempts += 1
+        error, retry = None, False
+        try:
+            response = self.session.post(url, data=payload, headers={'Content-Type': 'application/json'}, timeout=self.timeout)
+            if response.status_code >= 300:
+                error = f'HTTP {response.status_code}: {response.text[:200]}'
+                retry = response.status_code >= 500 or response.status_code in RETRYABLE_4XX
+        except requests.RequestException as e:
+            error, retry = f'{type(e).__name__}: {e}', True
+        self._record(message_id, attempts, error, retry)
+
+    def _record(self, message_id, attempts, error, retry):  # Store the outcome of an attempt
+        now = time.time()
+        if error is None:
+            status, next_attempt = SENT, None
+        elif retry and attempts < self.max_attempts:
+            status, next_attempt = QUEUED, now + retry_delay(attempts, self.base_delay, self.max_delay)
+        else:
+            # Kept in the spool for inspection or a manual resend
+            status, next_attempt = FAILED, None
+        if error:
+            logger.warning('Contact message %d attempt %d failed: %s', message_id, attempts, error)
+        with self._lock:
+            self._db.execute('UPDATE outbox SET status = ?, attempts = ?, next_attempt = ?, last_error = ?, updated = ? WHERE id = ?',
+                             (status, attempts, next_attempt, error, now, message_id))
+
+
+@st.cache_resource
+def load_delivery_queue(url, spool_path=SPOOL_PATH):  # One worker per process, shared by every session
+    return DeliveryQueue(url, spool_path)
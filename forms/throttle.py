@@ -0,0 +1,132 @@
+from collections import Counter, OrderedDict
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+logger = logging.getLogger(__name__)
+
+# (burst, seconds per extra token) for each limit
+SESSION_RATE = (3, 60.0)
+IP_RATE = (5, 120.0)
+GLOBAL_RATE = (30, 10.0)
+DUPLICATE_WINDOW = 600.0  # Seconds an identical message is suppressed for
+MAX_KEYS = 10_000  # Per table; least recently seen keys are evicted first
+# Reverse proxies in front of the app that append to X-Forwarded-For. Entries
+# to the left of theirs are whatever the client sent, so only the address the
+# outermost trusted proxy appended identifies the client. 0 ignores the header.
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', '1'))
+
+REJECTION_MESSAGES = {
+    'duplicate': 'This message was already sent. Thanks for your patience!',
+    'session': 'Too many messages from this session. Please try again in a few minutes.',
+    'ip': 'Too many messages from your network. Please try again in a few minutes.',
+    'global': 'The contact form is busy right now. Please try again shortly.',
+}
+
+
+class TokenBuckets:  # One token bucket per key, in an LRU-bounded table
+    def __init__(self, capacity, refill_seconds, max_keys=MAX_KEYS):
+        self.capacity = capacity
+        self.refill_seconds = refill_seconds
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    def _tokens(self, key, now):
+        tokens, last = self._buckets.get(key, (self.capacity, now))
+        return min(self.capacity, tokens + (now - last) / self.refill_seconds)
+
+    def available(self, key, now):
+        return self._tokens(key, now) >= 1
+
+    def take(self, key, now):
+        self._buckets[key] = (self._tokens(key, now) - 1, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SubmissionGuard:
+    # Decides whether a contact submission may be sent, before any network
+    # I/O. Duplicates are checked first so they never spend tokens, and a
+    # submission only takes tokens once all three limits have one spare.
+    def __init__(self, session_rate=SESSION_RATE, ip_rate=IP_RATE, global_rate=GLOBAL_RATE,
+                 duplicate_window=DUPLICATE_WINDOW, max_keys=MAX_KEYS):
+        self.sessions = TokenBuckets(*session_rate, max_keys=max_keys)
+        self.ips = TokenBuckets(*ip_rate, max_keys=max_keys)
+        self.everyone = TokenBuckets(*global_rate, max_keys=1)
+        self.duplicate_window = duplicate_window
+        self.max_keys = max_keys
+        self._seen = OrderedDict()  # Content hash -> time first sent, oldest first
+        self._lock = threading.Lock()
+        self.counters = Counter()
+
+    @staticmethod
+    def content_hash(payload):  # Same message regardless of case and surrounding whitespace
+        normalized = {k: ' '.join(str(v).split()).lower() for k, v in payload.items()}
+        return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+
+    def check(self, session_id, client_ip, payload, now=None):  # None if accepted, else the rejection reason
+        now = time.monotonic() if now is None else now
+        digest = self.content_hash(payload)
+        with self._lock:
+            # Expire old hashes; insertion order is time order
+            while self._seen and now - next(iter(self._seen.values())) > self.duplicate_window:
+                self._seen.popitem(last=False)
+            if digest in self._seen:
+                reason = 'duplicate'
+            elif not self.sessions.available(session_id, now):
+                reason = 'session'
+            elif client_ip is not None and not self.ips.available(client_ip, now):
+                reason = 'ip'
+            elif not self.everyone.available(None, now):
+                reason = 'global'
+            else:
+                reason = None
+                self.sessions.take(session_id, now)
+                if client_ip is not None:
+                    self.ips.take(client_ip, now)
+                self.everyone.take(None, now)
+                self._seen[digest] = now
+                if len(self._seen) > self.max_keys:
+                    self._seen.popitem(last=False)
+            self.counters['rejected.' + reason if reason else 'accepted'] += 1
+        if reason:
+            logger.warning('Contact submission rejected (%s) for session %s, ip %s', reason, session_id, client_ip)
+        return reason
+
+    def forget(self, payload):  # Let a message that was never delivered be sent again
+        digest = self.content_hash(payload)
+        with self._lock:
+            self._seen.pop(digest, None)
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, 'sessions': len(self.sessions), 'ips': len(self.ips), 'recent_messages': len(self._seen)}
+
+
+def forwarded_client(forwarded, hops=TRUSTED_PROXY_HOPS):  # Client address from X-Forwarded-For, or None
+    if not forwarded or hops < 1:
+        return None
+    addresses = [address.strip() for address in forwarded.split(',')]
+    # Fewer entries than trusted proxies means the header did not come through all of them
+    return (addresses[-hops] or None) if len(addresses) >= hops else None
+
+
+def request_identity():  # (session id, client ip or None) of the current script run
+    ctx = get_script_run_ctx()
+    session_id = ctx.session_id if ctx else None
+    # Without a trusted forwarded address only the session and global limits apply
+    return session_id, forwarded_client(st.context.headers.get('X-Forwarded-For'))
+
+
+@st.cache_resource
+def load_submission_guard():  # One guard per process, shared by every session
+    return SubmissionGuard()
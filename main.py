@@ -1,8 +1,14 @@
+import os
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib
-import numpy as np
+
+from forms.throttle import load_submission_guard
+from utils.profiling import PROFILE_PAGES, finish_trace, render_trace_panel, start_trace
+from utils.warmup import WARM_UP, start_warmup
+
+# Charts are rendered off-screen only. Set before anything imports matplotlib,
+# which each page does itself: the navigation here needs no pandas, numpy or
+# matplotlib, so the Resume page paints without paying for them.
+os.environ.setdefault('MPLBACKEND', 'Agg')
 
 st.set_page_config(layout="wide")
 
@@ -45,10 +51,37 @@ portfolio2 = st.Page(
 # --- SIDEBAR NAVIGATION ---
 pg = st.navigation(
     {'About Me': [home],
-     'Projects': [portfolio2]}
+     'Projects': [portfolio2, portfolio1]}
 )
 
 st.sidebar.text('© 2025 Ian Temchin. All rights reserved.')
 
-pg.run()
+# --- PROFILING ---
+# ?profile=1 traces this rerun and shows the stage timings in the sidebar;
+# PROFILE_PAGES=1 traces every rerun to the log only
+show_profile = st.query_params.get('profile') == '1'
+start_trace(pg.title, enabled=PROFILE_PAGES or show_profile)
+try:
+    pg.run()
+finally:
+    page_trace = finish_trace()
+
+# --- WARM-UP ---
+# Once the first page is served, load the heavy libraries, the sales data and
+# the Sales Dashboard's default and most requested views in the background.
+# WARM_UP=0 turns it off.
+if WARM_UP:
+    start_warmup()
+
+if show_profile and page_trace:
+    # Imported only for the panel; the pages that use these modules import them themselves
+    from utils.charts import render_cache
+    from utils.sales_aggregates import load_summary_cache
+    from utils.sales_data import load_report
+    render_trace_panel(page_trace, {
+        'Chart cache': render_cache.stats(),
+        'Sales data load': load_report(),
+        'Summary cache': load_summary_cache().stats(),
+        'Contact form guard': load_submission_guard().stats(),
+    })
 
@@ -0,0 +1,141 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+
+import pytest
+
+from forms.delivery import FAILED, QUEUED, SENT, DeliveryQueue
+
+
+class StubEndpoint:
+    # Webhook stand-in answering with the scripted status codes in turn, then 200
+    def __init__(self, codes=()):
+        self.codes = list(codes)
+        self.received = []
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                endpoint.received.append(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+                code = endpoint.codes.pop(0) if endpoint.codes else 200
+                self.send_response(code)
+                self.end_headers()
+                self.wfile.write(b'stub')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/hook'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def make_queue(tmp_path):
+    opened = []
+
+    def make(codes=(), **kwargs):
+        endpoint = StubEndpoint(codes)
+        queue = DeliveryQueue(endpoint.url, str(tmp_path / 'outbox.db'), base_delay=0.01, max_delay=0.05, **kwargs)
+        opened.append((queue, endpoint))
+        return queue, endpoint
+
+    yield make
+    for queue, endpoint in opened:
+        queue.close()
+        endpoint.close()
+
+
+def test_delivers_message(make_queue):
+    queue, endpoint = make_queue()
+    message_id = queue.submit({'name': 'Ada', 'message': 'Hello'})
+    assert queue.wait(message_id, timeout=5) == (SENT, 1, None)
+    assert endpoint.received == [{'name': 'Ada', 'message': 'Hello'}]
+
+
+def test_retries_until_sent(make_queue):
+    queue, endpoint = make_queue([503, 429])
+    message_id = queue.submit({'message': 'retry me'})
+    status, attempts, _ = queue.wait(message_id, timeout=5)
+    assert (status, attempts) == (SENT, 3)
+    assert len(endpoint.received) == 3
+
+
+def test_client_error_fails_without_retry(make_queue):
+    queue, endpoint = make_queue([400])
+    message_id = queue.submit({'message': 'bad'})
+    status, attempts, last_error = queue.wait(message_id, timeout=5)
+    assert (status, attempts) == (FAILED, 1)
+    assert last_error.startswith('HTTP 400')
+    assert len(endpoint.received) == 1
+
+
+def test_gives_up_after_max_attempts(make_queue):
+    queue, endpoint = make_queue([500] * 10, max_attempts=3)
+    message_id = queue.submit({'message': 'down'})
+    status, attempts, _ = queue.wait(message_id, timeout=5)
+    assert (status, attempts) == (FAILED, 3)
+    assert len(endpoint.received) == 3
+
+
+def test_unknown_message_has_no_status(make_queue):
+    queue, _ = make_queue()
+    assert queue.status(12345) is None
+    assert queue.wait(12345, timeout=1) is None
+
+
+def test_queued_messages_resume_on_reopen(tmp_path):
+    endpoint = StubEndpoint([503])
+    spool = str(tmp_path / 'outbox.db')
+    queue = DeliveryQueue(endpoint.url, spool, base_delay=60)
+    message_id = queue.submit({'message': 'later'})
+    try:
+        status, attempts, _ = queue.wait(message_id, timeout=0.5)
+        assert (status, attempts) == (QUEUED, 1)
+    finally:
+        queue.close()
+    # Due right away in the next process's queue
+    reopened = DeliveryQueue(endpoint.url, spool, base_delay=60)
+    try:
+        reopened._db.execute('UPDATE outbox SET next_attempt = 0 WHERE id = ?', (message_id,))
+        reopened._wake.set()
+        assert reopened.wait(message_id, timeout=5)[0] == SENT
+    finally:
+        reopened.close()
+        endpoint.close()
+
+
+def test_worker_survives_unexpected_errors(make_queue):
+    queue, endpoint = make_queue()
+    post = queue.session.post
+    calls = []
+
+    def flaky_post(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            raise ValueError('not a RequestException')
+        return post(*args, **kwargs)
+
+    queue.session.post = flaky_post
+    first = queue.submit({'message': 'first'})
+    status, attempts, _ = queue.wait(first, timeout=5)
+    assert (status, attempts) == (SENT, 2)
+    # The worker is still running for later messages
+    assert queue.wait(queue.submit({'message': 'second'}), timeout=5)[0] == SENT
+    assert len(endpoint.received) == 2
+
+
+def test_message_that_always_errors_fails(make_queue):
+    queue, _ = make_queue(max_attempts=2)
+
+    def broken_post(*args, **kwargs):
+        raise ValueError('bad payload')
+
+    queue.session.post = broken_post
+    status, attempts, last_error = queue.wait(queue.submit({'message': 'never'}), timeout=5)
+    assert (status, attempts) == (FAILED, 2)
+    assert last_error == 'ValueError: bad payload'
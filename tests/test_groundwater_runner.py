@@ -0,0 +1,35 @@
+import gc
+import os
+
+import numpy as np
+
+from utils.groundwater import GroundwaterParams
+from utils.groundwater_runner import DONE, RunManager, SimulationRun
+
+
+def small_params(**changes):
+    return GroundwaterParams(nx=20, ny=10, steps=20, snapshot_every=5)._replace(**changes)
+
+
+def test_same_run_is_computed_once(tmp_path):
+    # Two openers of one run directory stand in for two server processes
+    first, second = SimulationRun(small_params(), str(tmp_path)), SimulationRun(small_params(), str(tmp_path))
+    first.start()
+    second.start()
+    assert first.wait(60).status == DONE
+    assert second.wait(60).status == DONE
+    # Whichever came second found the run finished instead of computing it again
+    assert first.seconds == second.seconds
+    np.testing.assert_array_equal(first.result().well_conc, second.result().well_conc)
+
+
+def test_prune_skips_runs_open_elsewhere(tmp_path):
+    manager = RunManager(str(tmp_path), max_stored=1)
+    elsewhere = SimulationRun(small_params(seed=1), str(tmp_path))
+    manager.get(small_params(seed=2))
+    assert os.path.isdir(elsewhere.path)
+    path = elsewhere.path
+    del elsewhere
+    gc.collect()
+    manager.get(small_params(seed=3))
+    assert not os.path.isdir(path)
@@ -0,0 +1,27 @@
+from forms.throttle import SubmissionGuard, forwarded_client
+
+
+def test_forwarded_client_uses_trusted_hop():
+    # The client controls everything left of what the proxy appended
+    assert forwarded_client('6.6.6.6, 1.2.3.4') == '1.2.3.4'
+    assert forwarded_client('6.6.6.6, 1.2.3.4, 10.0.0.2', hops=2) == '1.2.3.4'
+    assert forwarded_client('1.2.3.4', hops=2) is None
+    assert forwarded_client('1.2.3.4', hops=0) is None
+    assert forwarded_client(None) is None
+
+
+def test_spoofed_forwarded_entries_share_one_bucket():
+    guard = SubmissionGuard(session_rate=(100, 60.0), ip_rate=(2, 120.0))
+    reasons = [guard.check(f'session-{i}', forwarded_client(f'10.0.0.{i}, 1.2.3.4'), {'message': str(i)}, now=0.0)
+               for i in range(3)]
+    assert reasons == [None, None, 'ip']
+
+
+def test_forgotten_message_can_be_sent_again():
+    guard = SubmissionGuard()
+    payload = {'name': 'Ada', 'message': 'Hello'}
+    assert guard.check('session', None, payload, now=0.0) is None
+    assert guard.check('session', None, payload, now=1.0) == 'duplicate'
+    # Delivery failed, so resending it is not a duplicate
+    guard.forget(payload)
+    assert guard.check('session', None, payload, now=2.0) is None
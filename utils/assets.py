@@ -0,0 +1,85 @@
+from collections import namedtuple
+import hashlib
+import io
+import logging
+import os
+import threading
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+# Widest the portrait column gets in the wide layout, doubled for high-DPI screens
+PORTRAIT_WIDTH = 1200
+
+Asset = namedtuple('Asset', ['data', 'sha256', 'version'])
+
+
+def file_version(path):  # Cheap change detector, checked on every access
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def resize_image(data, max_width):  # Downscale only, keeping the original format
+    from PIL import Image
+    image = Image.open(io.BytesIO(data))
+    if image.width <= max_width:
+        return data
+    image_format = image.format
+    height = round(image.height * max_width / image.width)
+    buffer = io.BytesIO()
+    image.resize((max_width, height), Image.LANCZOS).save(buffer, format=image_format, quality=90, optimize=True)
+    return buffer.getvalue()
+
+
+class AssetStore:
+    # Static files read once per process and shared by every session as
+    # immutable bytes. A stat on each access notices edits; the content hash
+    # decides whether the bytes really changed, so a touched or re-copied file
+    # keeps its existing buffer and anything derived from it.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._assets = {}
+        self._derived = {}
+
+    def get(self, path):
+        version = file_version(path)
+        asset = self._assets.get(path)
+        if asset is None or asset.version != version:
+            with self._lock:
+                asset = self._assets.get(path)
+                if asset is None or asset.version != version:
+                    asset = self._read(path, version, asset)
+        return asset
+
+    def _read(self, path, version, previous):
+        with open(path, 'rb') as f:
+            data = f.read()
+        sha256 = hashlib.sha256(data).hexdigest()
+        if previous is not None and previous.sha256 == sha256:
+            data = previous.data
+        else:
+            logger.info('Loaded asset %s (%d bytes)', path, len(data))
+        asset = Asset(data, sha256, version)
+        self._assets[path] = asset
+        return asset
+
+    def derived(self, path, name, build):  # Bytes built from an asset, rebuilt only when its content changes
+        asset = self.get(path)
+        sha256, data = self._derived.get((path, name), (None, None))
+        if sha256 != asset.sha256:
+            data = build(asset.data)
+            self._derived[(path, name)] = (asset.sha256, data)
+        return data
+
+
+@st.cache_resource
+def _load_asset_store():
+    return AssetStore()
+
+
+def load_asset(path):  # Shared bytes of a static file
+    return _load_asset_store().get(path).data
+
+
+def load_image(path, max_width=PORTRAIT_WIDTH):  # Shared bytes of an image, no wider than max_width
+    return _load_asset_store().derived(path, ('width', max_width), lambda data: resize_image(data, max_width))
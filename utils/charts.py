@@ -0,0 +1,246 @@
+from collections import OrderedDict
+import io
+import threading
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter, MaxNLocator
+import streamlit as st
+
+from utils import native_charts
+from utils.profiling import trace
+
+# Same output st.pyplot produces, so cached images look identical
+SAVEFIG_OPTIONS = {'bbox_inches': 'tight', 'dpi': 200}
+
+
+def currency(x, _):  # Format axis values as currency
+    return f"${x:,.0f}"
+
+
+def percent(x, _):  # Format y-axis values as percentage
+    return f'{100 * x:.1f}%'
+
+
+def remove_spines(ax):  # Remove spines for a cleaner look
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+
+
+# --- Chart Drawers ---
+def draw_sales_trend(ax, periods, sales, trend_line):
+    # Plot the sales data
+    ax.plot(periods, sales, marker='o', color='#53A2BE', linestyle='-', linewidth=2)
+    # Plot the trend line
+    ax.plot(periods, trend_line, color='#FF5733', linestyle='--', linewidth=2)
+    ax.set_title('Sales Over Time', fontsize=14, weight='bold', color='#333333')
+    ax.yaxis.set_major_formatter(FuncFormatter(currency))
+    # Rotate x-axis labels for readability
+    ax.tick_params(axis='x', rotation=45)
+    remove_spines(ax)
+
+
+def draw_sales_by_rep(ax, reps, sales):
+    ax.bar(reps, sales, color='#53A2BE')
+    ax.set_title('Sales by Rep', fontsize=16, weight='bold')
+    ax.set_xlabel('Sales Rep')
+    ax.set_ylabel('Total Sales ($)')
+    ax.tick_params(axis='x', rotation=45)
+    ax.yaxis.set_major_formatter(FuncFormatter(currency))
+    remove_spines(ax)
+
+
+def draw_product_mix(ax, sales_pivot):  # Stacked bar of product lines within each category
+    sales_pivot.plot(kind='bar', stacked=True, ax=ax, cmap='Set3', width=0.8)
+    ax.set_title('Sales Performance by Product Line per Category', fontsize=14, weight='bold', color='#333333')
+    ax.set_xlabel(None)
+    ax.yaxis.set_major_formatter(FuncFormatter(currency))
+    ax.tick_params(axis='x', rotation=45)
+    remove_spines(ax)
+
+
+def draw_customer_sales(ax, customers, sales):
+    ax.barh(customers, sales, color='#53A2BE')
+    ax.set_xlabel('Total Sales')
+    ax.xaxis.set_major_formatter(FuncFormatter(currency))
+    remove_spines(ax)
+
+
+def draw_customer_orders(ax, customers, order_count):
+    ax.barh(customers, order_count, color='#EF8354')
+    ax.set_xlabel('Number of Orders')
+    remove_spines(ax)
+
+
+def draw_turnaround(ax, tat_days, weights=None):
+    # Number of bins equals the maximum TAT, at least 1
+    num_bins = max(int(tat_days.max()), 1)
+    # Plot the histogram with normalized values (percentage)
+    _, _, patches = ax.hist(tat_days, bins=num_bins, weights=weights, edgecolor='black', density=True, color='#53A2BE')
+    ax.set_title('Delivery Turnaround Time')
+    ax.set_xlabel('Turnaround Time (days)')
+    ax.set_ylabel('Percentage of Orders')
+    ax.grid(False)
+    remove_spines(ax)
+    ax.yaxis.set_major_formatter(FuncFormatter(percent))
+    # Add percentages to each bar
+    for patch in patches:
+        height = patch.get_height()
+        if height > 0:
+            ax.text(patch.get_x() + patch.get_width() / 2, height, f'{height * 100:.1f}%',
+                    ha='center', va='bottom', fontsize=8, color='black')
+    # Ensure x-axis ticks are integers
+    ax.xaxis.set_major_locator(MaxNLocator(integer=True))
+
+
+def draw_running_profit(ax, dates, profit):  # Cumulative tournament profit, already downsampled
+    ax.plot(dates, profit, color='#53A2BE', linewidth=1.5)
+    ax.axhline(0, color='#999999', linewidth=0.8)
+    ax.set_title('Running Profit', fontsize=14, weight='bold', color='#333333')
+    ax.yaxis.set_major_formatter(FuncFormatter(currency))
+    ax.tick_params(axis='x', rotation=45)
+    remove_spines(ax)
+
+
+def draw_plume(ax, x, y, conc, head, wells, pump):  # Plume map with head contours and well locations
+    mesh = ax.pcolormesh(x, y, conc, cmap='YlOrRd', shading='nearest', vmin=0)
+    ax.figure.colorbar(mesh, ax=ax, label='Concentration (mg/L)')
+    contours = ax.contour(x, y, head, levels=10, colors='#53A2BE', linewidths=0.8)
+    ax.clabel(contours, fontsize=7, fmt='%.2f')
+    for name, wx, wy in wells:
+        ax.plot(wx, wy, marker='^', color='black', markersize=6)
+        ax.annotate(name, (wx, wy), textcoords='offset points', xytext=(4, 4), fontsize=8)
+    ax.plot(*pump, marker='o', color='#53A2BE', markeredgecolor='black', markersize=8)
+    ax.annotate('RW-1', pump, textcoords='offset points', xytext=(4, -10), fontsize=8)
+    ax.set_aspect('equal')
+    ax.set_xlabel('x (m)')
+    ax.set_ylabel('y (m)')
+    ax.set_title('Plume and Groundwater Head', fontsize=14, weight='bold', color='#333333')
+
+
+def draw_well_series(ax, times, values, names, ylabel):  # One line per monitoring well
+    for name, series in zip(names, values.T):
+        ax.plot(times, series, linewidth=1.5, label=name)
+    ax.set_xlabel('Day')
+    ax.set_ylabel(ylabel)
+    ax.legend(frameon=False)
+    remove_spines(ax)
+
+
+def draw_well_record(ax, times, values, lower, upper, ylabel):  # Downsampled record with the range of the samples behind each point
+    ax.fill_between(times, lower, upper, color='#53A2BE', alpha=0.25, linewidth=0, step='post')
+    ax.plot(times, values, color='#53A2BE', linewidth=1.2)
+    ax.set_ylabel(ylabel)
+    ax.tick_params(axis='x', rotation=45)
+    remove_spines(ax)
+
+
+# --- Figure Pool ---
+class FigurePool:
+    # Reusable Agg figures per size. They never touch pyplot's global figure
+    # registry, so nothing is left open after a render.
+    def __init__(self, per_size=4):
+        self.per_size = per_size
+        self._free = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, figsize):
+        with self._lock:
+            free = self._free.get(figsize)
+            if free:
+                return free.pop()
+        return Figure(figsize=figsize)
+
+    def release(self, fig, figsize):
+        fig.clear()
+        with self._lock:
+            free = self._free.setdefault(figsize, [])
+            if len(free) < self.per_size:
+                free.append(fig)
+
+
+# --- Render Cache ---
+class RenderCache:  # Thread-safe LRU of rendered images, bounded by total bytes
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            image = self._images.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self._images.move_to_end(key)
+            self.hits += 1
+            return image
+
+    def put(self, key, image):
+        if len(image) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._images.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            self._images[key] = image
+            self.bytes += len(image)
+            while self.bytes > self.max_bytes:
+                _, evicted = self._images.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._images), 'bytes': self.bytes, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions}
+
+
+figure_pool = FigurePool()
+render_cache = RenderCache()
+
+
+def render_figure(draw, *args, figsize=(10, 6), fmt='png', **kwargs):  # Draw on a pooled figure and return the image bytes
+    fig = figure_pool.acquire(figsize)
+    try:
+        draw(fig.subplots(), *args, **kwargs)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=fmt, **SAVEFIG_OPTIONS)
+        return buffer.getvalue()
+    finally:
+        figure_pool.release(fig, figsize)
+
+
+def cached_chart(key, draw, *args, figsize=(10, 6), fmt='png', **kwargs):
+    # key identifies the chart's inputs (chart name, data generation, filter
+    # state and parameters); the drawing is only rasterized on a miss.
+    key = (draw.__name__, figsize, fmt, key)
+    image = render_cache.get(key)
+    if image is None:
+        image = render_figure(draw, *args, figsize=figsize, fmt=fmt, **kwargs)
+        render_cache.put(key, image)
+    return image
+
+
+# Chart rendering backends: 'server' rasterizes with matplotlib, 'browser'
+# ships the aggregated series and lets Vega-Lite draw it client-side
+NATIVE_CHARTS = {
+    draw_sales_trend: native_charts.sales_trend_chart,
+    draw_sales_by_rep: native_charts.sales_by_rep_chart,
+    draw_product_mix: native_charts.product_mix_chart,
+    draw_customer_sales: native_charts.customer_sales_chart,
+    draw_customer_orders: native_charts.customer_orders_chart,
+    draw_turnaround: native_charts.turnaround_chart,
+}
+
+
+def show_chart(key, draw, *args, figsize=(10, 6), backend='server', **kwargs):  # st.pyplot replacement
+    with trace(f'chart.{draw.__name__}'):
+        if backend == 'browser':
+            st.altair_chart(NATIVE_CHARTS[draw](*args, **kwargs), use_container_width=True)
+        elif key is None:  # A frame that will not be shown again, such as a run in progress; not worth a cache slot
+            st.image(render_figure(draw, *args, figsize=figsize, **kwargs), use_container_width=True)
+        else:
+            st.image(cached_chart(key, draw, *args, figsize=figsize, **kwargs), use_container_width=True)
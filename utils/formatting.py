@@ -0,0 +1,17 @@
+def format_large_number(value):  # Format large numbers
+    if isinstance(value, int):  # Check if the value is an integer
+        if value >= 1_000_000:
+            return f"{value // 1_000_000}M"
+        elif value >= 1_000:
+            return f"{value // 1_000}K"
+        else:
+            return f"{value:,}"  # No decimal places for small integers
+    elif isinstance(value, float):  # For floats
+        if value >= 1_000_000:
+            return f"{value / 1_000_000:.2f}M"
+        elif value >= 1_000:
+            return f"{value / 1_000:.2f}K"
+        else:
+            return f"{value:,.2f}"  # Two decimal places for small floats
+    else:
+        raise ValueError("Input must be an int or float.")
@@ -0,0 +1,210 @@
+from collections import namedtuple
+import numpy as np
+import scipy.sparse as sp
+from scipy.ndimage import gaussian_filter
+from scipy.sparse.linalg import splu
+
+# --- Parameters ---
+# Lengths in m, time in days. Flow runs left to right between fixed-head
+# boundaries; top and bottom are no-flow. Every field is hashable, so a
+# parameter set is its own cache key.
+GroundwaterParams = namedtuple('GroundwaterParams', [
+    'length', 'width', 'nx', 'ny',
+    'k_mean', 'k_sigma', 'k_corr', 'thickness', 'storativity', 'porosity', 'seed',
+    'head_left', 'head_right', 'pump_x', 'pump_y', 'pump_rate', 'pump_start',
+    'source_x', 'source_y', 'source_radius', 'source_conc', 'source_days',
+    'alpha_l', 'alpha_t', 'diffusion', 'decay',
+    'days', 'steps', 'snapshot_every', 'wells',
+], defaults=[
+    500.0, 250.0, 100, 50,
+    30.0, 0.5, 30.0, 20.0, 0.05, 0.25, 0,
+    20.0, 18.0, 350.0, 125.0, 200.0, 180.0,
+    100.0, 125.0, 10.0, 100.0, 365.0,
+    10.0, 1.0, 1e-4, 0.0,
+    730.0, 146, 5,
+    (('MW-1', 150.0, 125.0), ('MW-2', 250.0, 140.0), ('MW-3', 330.0, 115.0), ('MW-4', 250.0, 60.0)),
+])
+
+# times (days) of the well samples; heads and concentrations per well at those
+# times; the head and plume at the snapshot times; and the solver workload
+GroundwaterRun = namedtuple('GroundwaterRun', ['x', 'y', 'k', 'times', 'well_names', 'well_heads', 'well_conc',
+                                               'snapshot_times', 'heads', 'plumes', 'substeps'])
+
+
+# --- Grid ---
+def cell_centers(params):
+    dx, dy = params.length / params.nx, params.width / params.ny
+    return (np.arange(params.nx) + 0.5) * dx, (np.arange(params.ny) + 0.5) * dy, dx, dy
+
+
+def cell_at(params, x, y):  # (row, column) of the cell containing a point
+    _, _, dx, dy = cell_centers(params)
+    return min(int(y / dy), params.ny - 1), min(int(x / dx), params.nx - 1)
+
+
+def conductivity_field(params):  # Log-normal K with a Gaussian correlation length, in m/d
+    rng = np.random.default_rng(params.seed)
+    _, _, dx, dy = cell_centers(params)
+    noise = gaussian_filter(rng.standard_normal((params.ny, params.nx)), sigma=(params.k_corr / dy, params.k_corr / dx), mode='wrap')
+    noise /= noise.std() or 1.0
+    return params.k_mean * np.exp(params.k_sigma * noise - params.k_sigma ** 2 / 2)
+
+
+def harmonic_mean(a, b):
+    return 2 * a * b / (a + b)
+
+
+# --- Flow ---
+def flow_matrix(params, k, dt):
+    # Backward-Euler finite volumes: (S A / dt) (h' - h) = sum of C (h_neighbour - h) + Q.
+    # dt=None gives the steady-state operator. Fixed-head columns become identity rows.
+    ny, nx = k.shape
+    _, _, dx, dy = cell_centers(params)
+    t = k * params.thickness
+    cx = harmonic_mean(t[:, :-1], t[:, 1:]) * dy / dx  # Conductance across each x-face
+    cy = harmonic_mean(t[:-1, :], t[1:, :]) * dx / dy
+    idx = np.arange(nx * ny).reshape(ny, nx)
+    diag = np.zeros((ny, nx))
+    if dt is not None:
+        diag += params.storativity * dx * dy / dt
+    diag[:, :-1] += cx
+    diag[:, 1:] += cx
+    diag[:-1, :] += cy
+    diag[1:, :] += cy
+    rows = [idx[:, :-1], idx[:, 1:], idx[:-1, :], idx[1:, :]]
+    cols = [idx[:, 1:], idx[:, :-1], idx[1:, :], idx[:-1, :]]
+    vals = [-cx, -cx, -cy, -cy]
+    fixed = np.zeros((ny, nx), dtype=bool)
+    fixed[:, [0, -1]] = True
+    diag[fixed] = 1.0
+    rows = np.concatenate([r.ravel() for r in rows] + [idx.ravel()])
+    cols = np.concatenate([c.ravel() for c in cols] + [idx.ravel()])
+    vals = np.concatenate([v.ravel() for v in vals] + [diag.ravel()])
+    keep = ~fixed.ravel()[rows] | (rows == cols)
+    return sp.csc_matrix((vals[keep], (rows[keep], cols[keep])), shape=(nx * ny, nx * ny))
+
+
+def flow_rhs(params, h, dt, pumping):
+    _, _, dx, dy = cell_centers(params)
+    rhs = pumping.copy() if dt is None else params.storativity * dx * dy / dt * h + pumping
+    rhs[:, 0], rhs[:, -1] = params.head_left, params.head_right
+    return rhs.ravel()
+
+
+def seepage_velocity(params, k, h):  # Pore velocities on the x-faces (ny, nx + 1) and y-faces (ny + 1, nx)
+    _, _, dx, dy = cell_centers(params)
+    vx = np.zeros((params.ny, params.nx + 1))
+    vy = np.zeros((params.ny + 1, params.nx))
+    vx[:, 1:-1] = -harmonic_mean(k[:, :-1], k[:, 1:]) * np.diff(h, axis=1) / dx / params.porosity
+    vy[1:-1, :] = -harmonic_mean(k[:-1, :], k[1:, :]) * np.diff(h, axis=0) / dy / params.porosity
+    # Water crosses the fixed-head boundaries at the rate of the first interior face
+    vx[:, 0], vx[:, -1] = vx[:, 1], vx[:, -2]
+    return vx, vy
+
+
+# --- Transport ---
+def dispersion_coefficients(params, vx, vy):  # Face dispersion from cell-centred speeds
+    ux, uy = np.abs((vx[:, :-1] + vx[:, 1:]) / 2), np.abs((vy[:-1, :] + vy[1:, :]) / 2)
+    dxx = params.alpha_l * ux + params.alpha_t * uy + params.diffusion
+    dyy = params.alpha_t * ux + params.alpha_l * uy + params.diffusion
+    # Interior faces only; no dispersive flux across the domain edges
+    return (dxx[:, :-1] + dxx[:, 1:]) / 2, (dyy[:-1, :] + dyy[1:, :]) / 2
+
+
+def stable_substeps(params, vx, vy, dx_face, dy_face, dt):
+    _, _, dx, dy = cell_centers(params)
+    rate = (np.abs(vx).max() / dx + np.abs(vy).max() / dy
+            + 2 * dx_face.max(initial=0) / dx ** 2 + 2 * dy_face.max(initial=0) / dy ** 2 + params.decay)
+    return max(1, int(np.ceil(dt * rate / 0.9)))
+
+
+def transport_step(params, c, vx, vy, dx_face, dy_face, sink, dt):
+    # Explicit upwind advection and central dispersion; clean water enters through the boundaries
+    _, _, dx, dy = cell_centers(params)
+    padded_x = np.pad(c, ((0, 0), (1, 1)))
+    fx = np.where(vx > 0, vx * padded_x[:, :-1], vx * padded_x[:, 1:])
+    fy = np.zeros_like(vy)
+    fy[1:-1, :] = np.where(vy[1:-1, :] > 0, vy[1:-1, :] * c[:-1, :], vy[1:-1, :] * c[1:, :])
+    dc = -(np.diff(fx, axis=1) / dx + np.diff(fy, axis=0) / dy)
+    gx = dx_face * np.diff(c, axis=1) / dx
+    gy = dy_face * np.diff(c, axis=0) / dy
+    dc[:, :-1] += gx / dx
+    dc[:, 1:] -= gx / dx
+    dc[:-1, :] += gy / dy
+    dc[1:, :] -= gy / dy
+    dc -= (params.decay + sink) * c
+    return np.maximum(c + dt * dc, 0.0)
+
+
+# --- Simulation ---
+def snapshot_steps(params):  # Step indices whose fields are kept
+    return [step for step in range(params.steps) if (step + 1) % params.snapshot_every == 0 or step + 1 == params.steps]
+
+
+class GroundwaterModel:
+    # Flow and transport state, advanced one time step at a time. The state is
+    # just (step, h, c), so a run can be checkpointed and resumed exactly.
+    def __init__(self, params):
+        self.params = params
+        self.x, self.y, dx, dy = cell_centers(params)
+        self.k = conductivity_field(params)
+        self.dt = params.days / params.steps
+        self.times = self.dt * np.arange(1, params.steps + 1)
+        self.pumping = np.zeros((params.ny, params.nx))
+        pump_cell = cell_at(params, params.pump_x, params.pump_y)
+        self.pumping[pump_cell] = -params.pump_rate
+        # Extraction removes solute at the cell's concentration, as a first-order sink
+        self.sink = np.zeros_like(self.pumping)
+        self.sink[pump_cell] = params.pump_rate / (params.porosity * params.thickness * dx * dy)
+        self.idle = np.zeros_like(self.k)
+        self.source = (self.x[None, :] - params.source_x) ** 2 + (self.y[:, None] - params.source_y) ** 2 <= params.source_radius ** 2
+        self.source[cell_at(params, params.source_x, params.source_y)] = True
+        self.well_names = [name for name, _, _ in params.wells]
+        self.well_cells = tuple(np.array([cell_at(params, wx, wy) for _, wx, wy in params.wells]).T) if params.wells else ((), ())
+
+        # Start from the undisturbed steady state; the pump switches on at pump_start
+        steady = flow_matrix(params, self.k, None)
+        self.h = splu(steady).solve(flow_rhs(params, None, None, np.zeros_like(self.k))).reshape(self.k.shape)
+        self.c = np.zeros_like(self.k)
+        self.step = 0
+        self.solver = splu(flow_matrix(params, self.k, self.dt))  # Factorized once; each step is a pair of triangular solves
+
+    def restore(self, step, h, c):
+        self.step, self.h, self.c = step, np.asarray(h, dtype=np.float64), np.asarray(c, dtype=np.float64)
+
+    def advance(self):  # Run the next time step and return the transport substeps it took
+        params, dt, time = self.params, self.dt, self.times[self.step]
+        pumping_on = time > params.pump_start
+        self.h = self.solver.solve(flow_rhs(params, self.h, dt, self.pumping if pumping_on else self.idle)).reshape(self.k.shape)
+        vx, vy = seepage_velocity(params, self.k, self.h)
+        dx_face, dy_face = dispersion_coefficients(params, vx, vy)
+        n_sub = stable_substeps(params, vx, vy, dx_face, dy_face, dt)
+        c = self.c
+        for _ in range(n_sub):
+            if time - dt < params.source_days:
+                c[self.source] = params.source_conc
+            c = transport_step(params, c, vx, vy, dx_face, dy_face, self.sink if pumping_on else self.idle, dt / n_sub)
+        self.c = c
+        self.step += 1
+        return n_sub
+
+    def wells(self):  # Heads and concentrations at the monitoring wells now
+        return self.h[self.well_cells], self.c[self.well_cells]
+
+
+def simulate_groundwater(params):
+    model = GroundwaterModel(params)
+    well_heads = np.empty((params.steps, len(params.wells)))
+    well_conc = np.empty((params.steps, len(params.wells)))
+    keep = set(snapshot_steps(params))
+    heads, plumes = [], []
+    substeps = 0
+    for step in range(params.steps):
+        substeps += model.advance()
+        well_heads[step], well_conc[step] = model.wells()
+        if step in keep:
+            heads.append(model.h.astype(np.float32))
+            plumes.append(model.c.astype(np.float32))
+    return GroundwaterRun(model.x, model.y, model.k.astype(np.float32), model.times, model.well_names, well_heads, well_conc,
+                          model.times[snapshot_steps(params)], np.stack(heads), np.stack(plumes), substeps)
+
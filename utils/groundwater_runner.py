@@ -0,0 +1,313 @@
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import numpy as np
+import streamlit as st
+
+from utils.groundwater import GroundwaterModel, GroundwaterRun, cell_centers, conductivity_field, snapshot_steps
+
+logger = logging.getLogger(__name__)
+
+# One directory per parameter set, holding the streamed results as float32
+# .npy files that are memory-mapped while the run is open
+RUNS_DIR = r'./runs'
+CHECKPOINT_EVERY = 10  # Steps between checkpoints; at most this many are recomputed after a restart
+MAX_STORED_RUNS = 32  # Finished or stopped runs kept on disk, oldest removed first
+MAX_OPEN_RUNS = 8
+MAX_RUNNING = 2  # Runs computing at once; the others wait their turn in the queue
+MAX_SESSIONS = 1_000  # Sessions whose current run is tracked, least recently seen dropped first
+LOCK_POLL = 0.5  # Seconds between checks while another process computes the same run
+
+PENDING, QUEUED, RUNNING, CANCELLED, DONE, FAILED = 'pending', 'queued', 'running', 'cancelled', 'done', 'failed'
+ACTIVE = (QUEUED, RUNNING)
+
+RunProgress = namedtuple('RunProgress', ['status', 'steps_done', 'steps', 'substeps', 'seconds', 'error'])
+
+
+def run_key(params):  # Stable across processes, unlike hash()
+    return hashlib.sha256(repr(tuple(params)).encode()).hexdigest()[:16]
+
+
+def write_json(path, data):  # Replace atomically so a reader never sees half a file
+    with open(path + '.tmp', 'w') as f:
+        json.dump(data, f)
+    os.replace(path + '.tmp', path)
+
+
+def open_run_lock(path):  # Hold the run directory's lock shared, retrying if a prune removed the directory meanwhile
+    import fcntl
+    while True:
+        os.makedirs(path, exist_ok=True)
+        f = open(os.path.join(path, '.lock'), 'a')
+        fcntl.flock(f, fcntl.LOCK_SH)
+        try:
+            if os.fstat(f.fileno()).st_ino == os.stat(f.name).st_ino:
+                return f
+        except FileNotFoundError:
+            pass
+        f.close()
+
+
+def open_results(path, shape):  # Map a results file, created only once when several processes open the run together
+    if not os.path.exists(path):
+        tmp = f'{path}.{os.getpid()}-{threading.get_ident()}.tmp'
+        np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float32, shape=shape).flush()
+        try:
+            # Unlike a rename, a link never replaces a file another process has mapped
+            os.link(tmp, path)
+        except FileExistsError:
+            pass
+        os.remove(tmp)
+    return np.lib.format.open_memmap(path, mode='r+')
+
+
+class SimulationRun:
+    # A groundwater run advanced by a background thread. Well samples go to
+    # wells.npy (step, head/conc, well) and the kept fields to fields.npy
+    # (snapshot, head/conc, row, column) as they are computed, so the page can
+    # draw a partial run. state.npz holds the exact model state at the last
+    # checkpoint; a cancelled or interrupted run resumes from there, and a
+    # finished one is replayed from disk without recomputation. With an
+    # executor the run waits for one of its workers instead of taking a thread.
+    # Every process with the run open holds .lock shared, so no prune removes
+    # it; only the one holding .compute.lock computes it or writes meta.json.
+    def __init__(self, params, runs_dir=RUNS_DIR, executor=None):
+        self.params = params
+        self.executor = executor
+        self.path = os.path.join(runs_dir, run_key(params))
+        self.snapshots = {step: i for i, step in enumerate(snapshot_steps(params))}
+        self.k = conductivity_field(params).astype(np.float32)
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._stopped = threading.Event()
+        self._superseded = False
+        self.error = None
+        self._open_lock = open_run_lock(self.path)
+        self._compute_lock = open(os.path.join(self.path, '.compute.lock'), 'a')
+        if os.path.exists(os.path.join(self.path, 'meta.json')):
+            meta = self._read_meta()
+            self.steps_done, self.substeps, self.seconds = meta['steps_done'], meta['substeps'], meta['seconds']
+            # A run left queued or running was cut off by a restart, or is computing in another
+            # process; either way it picks up from the last checkpoint once started here
+            self.status = PENDING if meta['status'] in ACTIVE else meta['status']
+            self.error = meta.get('error')
+            new = False
+        else:
+            self.steps_done, self.substeps, self.seconds, self.status = 0, 0, 0.0, PENDING
+            new = True
+        n_wells = len(params.wells)
+        self.wells = open_results(os.path.join(self.path, 'wells.npy'), (params.steps, 2, n_wells))
+        self.fields = open_results(os.path.join(self.path, 'fields.npy'), (len(self.snapshots), 2, params.ny, params.nx))
+        if new:
+            self._write_meta()
+
+    def _read_meta(self):
+        with open(os.path.join(self.path, 'meta.json')) as f:
+            return json.load(f)
+
+    def _write_meta(self):
+        write_json(os.path.join(self.path, 'meta.json'), {
+            'params': list(self.params), 'status': self.status, 'steps_done': self.steps_done,
+            'substeps': self.substeps, 'seconds': self.seconds, 'error': self.error,
+        })
+
+    def _checkpoint(self, model):
+        # Results first, then the state, then the step count that makes them valid
+        self.wells.flush()
+        self.fields.flush()
+        np.savez(os.path.join(self.path, 'state.tmp.npz'), step=model.step, h=model.h, c=model.c, substeps=self.substeps)
+        os.replace(os.path.join(self.path, 'state.tmp.npz'), os.path.join(self.path, 'state.npz'))
+        self._write_meta()
+
+    def start(self):  # Queue or resume the run; a no-op once finished
+        with self._lock:
+            self._superseded = False
+            if self.status in ACTIVE:
+                # Asked for again before a cancel took effect: carry on
+                self._cancel.clear()
+                return
+            if self.status == DONE:
+                return
+            self.status, self.error = QUEUED, None
+            self._cancel.clear()
+            self._stopped.clear()
+            if self.executor is not None:
+                self.executor.submit(self._run)
+            else:
+                threading.Thread(target=self._run, name=f'groundwater-{os.path.basename(self.path)}', daemon=True).start()
+
+    def cancel(self, superseded=False):  # A superseded run goes back to pending, so it resumes by itself when asked for again
+        with self._lock:
+            self._superseded = superseded
+            self._cancel.set()
+
+    def wait(self, timeout=None):  # Block until the worker stops; mostly for tests and benchmarks
+        self._stopped.wait(timeout)
+        return self.progress()
+
+    def _stop_status(self):
+        return PENDING if self._superseded else CANCELLED
+
+    def _claim(self):  # Wait until no other process computes the run; False if cancelled meanwhile
+        import fcntl
+        while True:
+            try:
+                fcntl.flock(self._compute_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if self._cancel.wait(LOCK_POLL):
+                    return False
+
+    def _run(self):
+        import fcntl
+        try:
+            if not self._claim():
+                # Cancelled while another process computed it; meta.json is that process's to write
+                with self._lock:
+                    self.status = self._stop_status()
+                return
+            try:
+                with self._lock:
+                    if self._cancel.is_set():
+                        # Cancelled while still in the queue
+                        self.status = self._stop_status()
+                        self._write_meta()
+                        return
+                    # Carry on from wherever another process left the run
+                    meta = self._read_meta()
+                    self.steps_done, self.substeps, self.seconds = meta['steps_done'], meta['substeps'], meta['seconds']
+                    if meta['status'] == DONE:
+                        self.status = DONE
+                        return
+                    self.status = RUNNING
+                self._compute()
+            finally:
+                fcntl.flock(self._compute_lock, fcntl.LOCK_UN)
+        finally:
+            self._stopped.set()
+
+    def _compute(self):
+        started = time.perf_counter() - self.seconds
+        try:
+            model = GroundwaterModel(self.params)
+            state_path = os.path.join(self.path, 'state.npz')
+            if os.path.exists(state_path):
+                with np.load(state_path) as state:
+                    model.restore(int(state['step']), state['h'], state['c'])
+                    self.substeps = int(state['substeps'])
+            self.steps_done = model.step
+            while True:
+                while model.step < self.params.steps and not self._cancel.is_set():
+                    step = model.step
+                    self.substeps += model.advance()
+                    self.wells[step] = model.wells()
+                    if step in self.snapshots:
+                        self.fields[self.snapshots[step]] = model.h, model.c
+                    # Rows up to steps_done are complete; the page reads no further
+                    self.steps_done = model.step
+                    self.seconds = time.perf_counter() - started
+                    if model.step % CHECKPOINT_EVERY == 0:
+                        self._checkpoint(model)
+                with self._lock:
+                    # start() may have withdrawn the cancel while the loop was stopping
+                    if model.step < self.params.steps and not self._cancel.is_set():
+                        continue
+                    self.status = DONE if model.step == self.params.steps else self._stop_status()
+                    break
+            self._checkpoint(model)
+        except Exception as e:
+            logger.exception('Groundwater run %s failed', self.path)
+            self.status, self.error = FAILED, str(e)
+            self._write_meta()
+
+    def progress(self):
+        return RunProgress(self.status, self.steps_done, self.params.steps, self.substeps, self.seconds, self.error)
+
+    def result(self):  # GroundwaterRun of the steps computed so far, as views of the mapped files
+        params, n = self.params, self.steps_done
+        x, y, _, _ = cell_centers(params)
+        times = params.days / params.steps * np.arange(1, n + 1)
+        kept = [step for step in self.snapshots if step < n]
+        return GroundwaterRun(
+            x, y, self.k, times, [name for name, _, _ in params.wells],
+            self.wells[:n, 0], self.wells[:n, 1], params.days / params.steps * (np.array(kept, dtype=float) + 1),
+            self.fields[:len(kept), 0], self.fields[:len(kept), 1], self.substeps,
+        )
+
+
+class RunManager:
+    # Open runs shared by every session, so two visitors with the same inputs
+    # share one worker. At most max_running runs compute at once; the others
+    # queue. A session that moves on to other inputs cancels the run it left,
+    # unless another session is still watching it.
+    def __init__(self, runs_dir=RUNS_DIR, max_open=MAX_OPEN_RUNS, max_stored=MAX_STORED_RUNS, max_running=MAX_RUNNING):
+        self.runs_dir = runs_dir
+        self.max_open = max_open
+        self.max_stored = max_stored
+        self._executor = ThreadPoolExecutor(max_workers=max_running, thread_name_prefix='groundwater')
+        self._lock = threading.Lock()
+        self._runs = OrderedDict()
+        self._watching = OrderedDict()  # Session id -> key of the run it last asked for
+
+    def get(self, params, session=None):
+        key = run_key(params)
+        with self._lock:
+            run = self._runs.get(key)
+            if run is None:
+                self._prune()
+                run = self._runs[key] = SimulationRun(params, self.runs_dir, self._executor)
+            self._runs.move_to_end(key)
+            if session is not None:
+                self._watch(session, key)
+            # Runs queued or computing stay open; the rest are closed least recently used first
+            idle = [k for k, r in self._runs.items() if r.status not in ACTIVE and k != key]
+            while len(self._runs) > self.max_open and idle:
+                del self._runs[idle.pop(0)]
+            return run
+
+    def _watch(self, session, key):
+        previous = self._watching.pop(session, None)
+        self._watching[session] = key
+        while len(self._watching) > MAX_SESSIONS:
+            self._watching.popitem(last=False)
+        if previous is None or previous == key or previous in self._watching.values():
+            return
+        superseded = self._runs.get(previous)
+        if superseded is not None and superseded.status in ACTIVE:
+            logger.info('Cancelling superseded groundwater run %s', superseded.path)
+            superseded.cancel(superseded=True)
+
+    def _prune(self):  # Remove the oldest stored runs that no process has open
+        import fcntl
+        if not os.path.isdir(self.runs_dir):
+            return
+        open_paths = {run.path for run in self._runs.values()}
+        paths = [os.path.join(self.runs_dir, name) for name in os.listdir(self.runs_dir)]
+        paths = sorted((p for p in paths if os.path.isdir(p) and p not in open_paths), key=os.path.getmtime)
+        excess = max(0, len(paths) - self.max_stored + 1)
+        for path in paths:
+            if not excess:
+                break
+            try:
+                f = open(os.path.join(path, '.lock'), 'a')
+            except OSError:
+                continue
+            with f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # Open in another process
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                excess -= 1
+
+
+@st.cache_resource
+def load_run_manager():
+    return RunManager()
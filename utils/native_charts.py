@@ -0,0 +1,75 @@
+# Browser-side versions of the dashboard charts. Each builder ships only the
+# aggregated series to the client as a Vega-Lite spec, styled to match the
+# matplotlib charts in utils/charts.py.
+import altair as alt
+import numpy as np
+import pandas as pd
+
+CURRENCY = '$,.0f'
+
+
+def sales_trend_chart(periods, sales, trend_line):
+    data = pd.DataFrame({'Period': periods.to_numpy(), 'Sales': np.asarray(sales), 'Trend': np.asarray(trend_line)})
+    base = alt.Chart(data, title=alt.Title('Sales Over Time', fontSize=14, fontWeight='bold')).encode(
+        x=alt.X('Period:T', title=None, axis=alt.Axis(labelAngle=-45)))
+    sales_line = base.mark_line(color='#53A2BE', strokeWidth=2, point=alt.OverlayMarkDef(color='#53A2BE')).encode(
+        y=alt.Y('Sales:Q', title=None, axis=alt.Axis(format=CURRENCY)),
+        tooltip=[alt.Tooltip('Period:T'), alt.Tooltip('Sales:Q', format=CURRENCY)])
+    trend = base.mark_line(color='#FF5733', strokeWidth=2, strokeDash=[6, 4]).encode(y='Trend:Q')
+    return sales_line + trend
+
+
+def sales_by_rep_chart(reps, sales):
+    data = pd.DataFrame({'Sales Rep': np.asarray(reps, dtype=object), 'Total Sales ($)': np.asarray(sales)})
+    return alt.Chart(data, title=alt.Title('Sales by Rep', fontSize=16, fontWeight='bold')).mark_bar(color='#53A2BE').encode(
+        x=alt.X('Sales Rep:N', sort=None, axis=alt.Axis(labelAngle=-45)),
+        y=alt.Y('Total Sales ($):Q', axis=alt.Axis(format=CURRENCY)),
+        tooltip=['Sales Rep', alt.Tooltip('Total Sales ($):Q', format=CURRENCY)])
+
+
+def product_mix_chart(sales_pivot):  # Stacked bar of product lines within each category
+    data = sales_pivot.stack().rename('Sales').reset_index()
+    data[['Product Category', 'Product Line']] = data[['Product Category', 'Product Line']].astype(str)
+    title = alt.Title('Sales Performance by Product Line per Category', fontSize=14, fontWeight='bold')
+    # Stack order follows the color domain, i.e. the pivot's column order
+    return alt.Chart(data, title=title).mark_bar().encode(
+        x=alt.X('Product Category:N', title=None, sort=list(sales_pivot.index.astype(str)), axis=alt.Axis(labelAngle=-45)),
+        y=alt.Y('sum(Sales):Q', title=None, axis=alt.Axis(format=CURRENCY)),
+        color=alt.Color('Product Line:N', sort=list(sales_pivot.columns.astype(str)), scale=alt.Scale(scheme='set3')),
+        tooltip=['Product Category', 'Product Line', alt.Tooltip('Sales:Q', format=CURRENCY)])
+
+
+def _customer_bars(customers, values, color, title, value_format=','):
+    customers = [str(c) for c in customers]
+    data = pd.DataFrame({'Customer': customers, 'Value': np.asarray(values)})
+    # matplotlib's barh draws the first row at the bottom; keep that order
+    return alt.Chart(data).mark_bar(color=color).encode(
+        y=alt.Y('Customer:N', title=None, sort=customers[::-1]),
+        x=alt.X('Value:Q', title=title, axis=alt.Axis(format=value_format)),
+        tooltip=['Customer', alt.Tooltip('Value:Q', title=title, format=value_format)])
+
+
+def customer_sales_chart(customers, sales):
+    return _customer_bars(customers, sales, '#53A2BE', 'Total Sales', CURRENCY)
+
+
+def customer_orders_chart(customers, order_count):
+    return _customer_bars(customers, order_count, '#EF8354', 'Number of Orders')
+
+
+def turnaround_chart(tat_days, weights=None):
+    # Same bins and density as the matplotlib histogram, computed here
+    num_bins = max(int(tat_days.max()), 1)
+    density, edges = np.histogram(tat_days, bins=num_bins, weights=weights, density=True)
+    data = pd.DataFrame({'start': edges[:-1], 'end': edges[1:], 'share': density})
+    data['label'] = [f'{100 * d:.1f}%' if d > 0 else '' for d in density]
+    data['mid'] = (data['start'] + data['end']) / 2
+    chart = alt.Chart(data, title='Delivery Turnaround Time')
+    bars = chart.mark_bar(color='#53A2BE', stroke='black').encode(
+        x=alt.X('start:Q', title='Turnaround Time (days)', axis=alt.Axis(tickMinStep=1, format='d')),
+        x2='end:Q',
+        y=alt.Y('share:Q', title='Percentage of Orders', axis=alt.Axis(format='.1%')),
+        y2=alt.datum(0),
+        tooltip=[alt.Tooltip('start:Q', title='From (days)'), alt.Tooltip('share:Q', title='Orders', format='.1%')])
+    labels = chart.mark_text(baseline='bottom', fontSize=8).encode(x='mid:Q', y='share:Q', text='label:N')
+    return bars + labels
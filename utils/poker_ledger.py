@@ -0,0 +1,149 @@
+from collections import namedtuple
+import itertools
+import logging
+import os
+import threading
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+# One row per tournament entry: date,tournament,buy_in,cash,finish,entrants
+LEDGER_CSV = r'./assets/poker_results.csv'
+LEDGER_DTYPES = {'tournament': 'string', 'buy_in': 'float64', 'cash': 'float64', 'finish': 'Int32', 'entrants': 'Int32'}
+FINAL_TABLE_SEATS = 9
+
+# Running sums over every entry so far; appending results only adds to them
+LedgerTotals = namedtuple('LedgerTotals', ['entries', 'staked', 'cashes', 'wins', 'final_tables', 'roi_sum', 'roi_entries',
+                                           'biggest_win', 'biggest_win_date', 'biggest_win_tournament', 'last_date'])
+LedgerSnapshot = namedtuple('LedgerSnapshot', ['results', 'totals', 'running_profit', 'generation'])
+
+_generations = itertools.count(1)
+
+
+def typed_results(results):  # Ledger columns typed and in date order, from a raw frame
+    results = results[['date', *LEDGER_DTYPES]].astype(LEDGER_DTYPES)
+    results['date'] = pd.to_datetime(results['date'])
+    # A blank cash means the entry finished out of the money
+    results['cash'] = results['cash'].fillna(0.0)
+    return results.sort_values('date', kind='stable', ignore_index=True)
+
+
+def read_ledger(source=LEDGER_CSV):  # Typed columns from a CSV path or buffer
+    return typed_results(pd.read_csv(source, usecols=['date', *LEDGER_DTYPES], dtype=LEDGER_DTYPES, parse_dates=['date']))
+
+
+def summarize_results(results):  # LedgerTotals of a block of results
+    if results.empty:
+        return LedgerTotals(0, 0.0, 0.0, 0, 0, 0.0, 0, 0.0, None, None, None)
+    profit = results['cash'] - results['buy_in']
+    # Freerolls have no stake, so they are left out of the per-entry ROI and its count
+    roi = (profit / results['buy_in'].where(results['buy_in'] > 0)).dropna()
+    best = profit.idxmax()
+    return LedgerTotals(
+        len(results),
+        results['buy_in'].sum(),
+        results['cash'].sum(),
+        int((results['finish'] == 1).sum()),
+        int((results['finish'] <= FINAL_TABLE_SEATS).sum()),
+        roi.sum(), len(roi),
+        profit[best], results.at[best, 'date'], results.at[best, 'tournament'],
+        results['date'].max(),
+    )
+
+
+def combine_totals(a, b):
+    if not b.entries:
+        return a
+    if not a.entries:
+        return b
+    best = a if a.biggest_win >= b.biggest_win else b
+    return LedgerTotals(
+        a.entries + b.entries, a.staked + b.staked, a.cashes + b.cashes, a.wins + b.wins,
+        a.final_tables + b.final_tables, a.roi_sum + b.roi_sum, a.roi_entries + b.roi_entries,
+        best.biggest_win, best.biggest_win_date, best.biggest_win_tournament,
+        max(a.last_date, b.last_date),
+    )
+
+
+def ledger_metrics(totals):  # Headline figures derived from the running sums
+    profit = totals.cashes - totals.staked
+    return {
+        'entries': totals.entries,
+        'average_stake': totals.staked / totals.entries,
+        'total_staked': totals.staked,
+        'total_cashes': totals.cashes,
+        'wins': totals.wins,
+        'final_tables': totals.final_tables,
+        'lifetime_profit': profit,
+        'average_profit': profit / totals.entries,
+        'total_roi': profit / totals.staked if totals.staked else 0.0,
+        'average_roi': totals.roi_sum / totals.roi_entries if totals.roi_entries else 0.0,
+    }
+
+
+class PokerLedger:
+    # The parsed results with their running totals and cumulative profit.
+    # Appends extend both in place of a full recompute and swap in a new
+    # snapshot, like the sales store.
+    def __init__(self, path=LEDGER_CSV):
+        self.path = path
+        self._lock = threading.Lock()
+        self._reload()
+
+    def _reload(self):
+        stat = os.stat(self.path)
+        self.version = stat.st_mtime_ns, stat.st_size
+        results = read_ledger(self.path)
+        running_profit = (results['cash'] - results['buy_in']).cumsum().to_numpy()
+        self._snapshot = LedgerSnapshot(results, summarize_results(results), running_profit, next(_generations))
+
+    def snapshot(self):
+        return self._snapshot
+
+    def refresh_if_changed(self):  # Full reload only when the file was rewritten by someone else
+        stat = os.stat(self.path)
+        if (stat.st_mtime_ns, stat.st_size) != self.version:
+            with self._lock:
+                stat = os.stat(self.path)
+                if (stat.st_mtime_ns, stat.st_size) != self.version:
+                    logger.info('%s changed on disk, reloading poker results', self.path)
+                    self._reload()
+        return self
+
+    def append(self, batch, persist=False):  # Fold new results (DataFrame or CSV file/buffer) into the totals
+        # Sorted first, so a batch that starts after the ledger extends the running profit as is
+        results = typed_results(batch) if isinstance(batch, pd.DataFrame) else read_ledger(batch)
+        with self._lock:
+            current = self._snapshot
+            if results.empty:
+                return current
+            if current.totals.entries and results['date'].min() < current.totals.last_date:
+                # Out-of-order results change the running profit curve; rebuild it
+                merged = pd.concat([current.results, results], ignore_index=True).sort_values('date', kind='stable', ignore_index=True)
+                running_profit = (merged['cash'] - merged['buy_in']).cumsum().to_numpy()
+            else:
+                merged = pd.concat([current.results, results], ignore_index=True)
+                last = current.running_profit[-1] if len(current.running_profit) else 0.0
+                running_profit = np.concatenate([current.running_profit, last + (results['cash'] - results['buy_in']).cumsum().to_numpy()])
+            totals = combine_totals(current.totals, summarize_results(results))
+            if persist:
+                # Written in the file's own column order
+                columns = pd.read_csv(self.path, nrows=0).columns
+                results.reindex(columns=columns).to_csv(self.path, mode='a', header=False, index=False, date_format='%Y-%m-%d')
+                stat = os.stat(self.path)
+                self.version = stat.st_mtime_ns, stat.st_size
+            self._snapshot = LedgerSnapshot(merged, totals, running_profit, next(_generations))
+            return self._snapshot
+
+
+@st.cache_resource(show_spinner='Loading poker results...')
+def _load_poker_ledger(path):
+    return PokerLedger(path)
+
+
+def load_poker_ledger(path=LEDGER_CSV):  # None when there is no results file
+    if not os.path.exists(path):
+        return None
+    return _load_poker_ledger(path).refresh_if_changed()
@@ -0,0 +1,127 @@
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+import threading
+import time
+import numpy as np
+import streamlit as st
+
+# One simulation request. Sequences of `entries` tournaments at `stake` each,
+# starting from `bankroll`, with cash multipliers drawn from the payout table
+# identified by `table_key` and rescaled to the requested ROI.
+SimParams = namedtuple('SimParams', ['entries', 'stake', 'bankroll', 'roi', 'sims', 'seed', 'table_key'])
+# Cumulative results after some number of completed sequences
+SimSummary = namedtuple('SimSummary', ['sims_done', 'sims', 'risk_of_ruin', 'prob_loss', 'roi_percentiles', 'downswing_percentiles'])
+
+PERCENTILES = (5, 25, 50, 75, 95)
+# Tournament results drawn per batch, so a batch's memory stays the same
+# however long each sequence is: about 16 bytes each (int64 draw, float32
+# running profit and peak), some 50 MB in all
+BATCH_ELEMENTS = 3_000_000
+PROGRESS_INTERVAL = 0.5  # Seconds between partial summaries; long sequences make for many small batches
+MODEL_ITM_RATE = 0.15
+MODEL_TAIL = 1.3  # Pareto tail of cash sizes; lower means rarer, bigger scores
+MODEL_MIN_CASH = 1.5
+MODEL_MAX_CASH = 2_000.0
+
+
+def model_payout_table(itm_rate=MODEL_ITM_RATE, size=100_000, seed=0):
+    # Cash multipliers of a typical MTT when there is no results ledger: most
+    # entries blank, cashes heavy-tailed and capped near a large-field win
+    rng = np.random.default_rng(seed)
+    cashes = MODEL_MIN_CASH * (1 - rng.random(size)) ** (-1 / MODEL_TAIL)
+    return np.where(rng.random(size) < itm_rate, np.minimum(cashes, MODEL_MAX_CASH), 0.0)
+
+
+def ledger_payout_table(results):  # Observed cash multipliers of every staked entry
+    staked = results[results['buy_in'] > 0]
+    return (staked['cash'] / staked['buy_in']).to_numpy(dtype=np.float64)
+
+
+def simulate_batch(multipliers, entries, stake, bankroll, batch, seed):
+    # Per-sequence final ROI, ruin flag and deepest downswing (in buy-ins) for one batch
+    rng = np.random.default_rng(seed)
+    profit = multipliers[rng.integers(0, len(multipliers), size=(batch, entries))]
+    profit -= 1.0
+    profit *= stake
+    np.cumsum(profit, axis=1, out=profit)
+    # Ruined once the bankroll can no longer cover a buy-in
+    ruined = profit.min(axis=1) < stake - bankroll
+    final_roi = profit[:, -1].astype(np.float64) / (entries * stake)
+    peak = np.maximum.accumulate(profit, axis=1)
+    np.maximum(peak, 0, out=peak)
+    downswing = (peak - profit).max(axis=1).astype(np.float64) / stake
+    return final_roi, ruined, downswing
+
+
+def batch_size(entries, budget=BATCH_ELEMENTS):  # Sequences per batch
+    return max(1, budget // entries)
+
+
+def summarize(params, roi, ruined, downswing):
+    return SimSummary(
+        len(roi), params.sims,
+        ruined.mean(), (roi < 0).mean(),
+        dict(zip(PERCENTILES, np.percentile(roi, PERCENTILES))),
+        dict(zip(PERCENTILES, np.percentile(downswing, PERCENTILES))),
+    )
+
+
+def simulate(params, payout_table, pool=None):
+    # Yields a SimSummary as batches complete, at most every PROGRESS_INTERVAL
+    # seconds and always after the last one. Each batch draws from its
+    # own spawned seed, so the final result is the same with or without a pool.
+    if not len(payout_table):
+        raise ValueError('There are no staked results to draw from.')
+    if payout_table.mean() <= 0:
+        raise ValueError('There are no cashes to rescale to an ROI.')
+    # float32 halves the memory traffic of the cumulative sums, well within cent precision per sequence
+    multipliers = (payout_table * ((1 + params.roi) / payout_table.mean())).astype(np.float32)
+    size = batch_size(params.entries)
+    batches = [min(size, params.sims - start) for start in range(0, params.sims, size)]
+    seeds = np.random.SeedSequence(params.seed).spawn(len(batches))
+    args = [(multipliers, params.entries, params.stake, params.bankroll, size, seed) for size, seed in zip(batches, seeds)]
+    roi, ruined, downswing = [], [], []
+    if pool is None:
+        results = (simulate_batch(*a) for a in args)
+    else:
+        results = (future.result() for future in as_completed([pool.submit(simulate_batch, *a) for a in args]))
+    last_yield = time.monotonic()
+    for batch_roi, batch_ruined, batch_downswing in results:
+        roi.append(batch_roi)
+        ruined.append(batch_ruined)
+        downswing.append(batch_downswing)
+        if len(roi) == len(batches) or time.monotonic() - last_yield >= PROGRESS_INTERVAL:
+            yield summarize(params, np.concatenate(roi), np.concatenate(ruined), np.concatenate(downswing))
+            last_yield = time.monotonic()
+
+
+class SimulationCache:  # Finished summaries per parameter set, least recently used evicted first
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._results = OrderedDict()
+
+    def get(self, params):
+        with self._lock:
+            summary = self._results.get(params)
+            if summary is not None:
+                self._results.move_to_end(params)
+            return summary
+
+    def put(self, params, summary):
+        with self._lock:
+            self._results[params] = summary
+            self._results.move_to_end(params)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+
+
+@st.cache_resource
+def load_simulation_cache():
+    return SimulationCache()
+
+
+@st.cache_resource
+def load_simulation_pool(workers):  # Spawned workers, so forking a threaded server is never involved
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
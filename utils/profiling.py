@@ -0,0 +1,109 @@
+from contextlib import contextmanager, nullcontext
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+import streamlit as st
+
+# Per-rerun stage tracer. Off unless PROFILE_PAGES=1 is set in the environment
+# or ?profile=1 is on the URL; PROFILE_ALLOCATIONS=1 adds tracemalloc peaks,
+# which slow every allocation down, so they are opt-in on top of timing.
+PROFILE_PAGES = os.environ.get('PROFILE_PAGES', '0') not in ('', '0')
+PROFILE_ALLOCATIONS = os.environ.get('PROFILE_ALLOCATIONS', '0') not in ('', '0')
+
+logger = logging.getLogger(__name__)
+if PROFILE_PAGES and not logger.handlers:
+    # One JSON line per rerun on stderr, whatever the app's logging setup
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+# Each session's script runs in its own thread, so the active trace is thread-local
+_local = threading.local()
+_DISABLED = nullcontext()
+
+
+def current_rss():  # Resident memory of this process in bytes, 0 if unknown
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        try:
+            import resource
+        except ImportError:
+            return 0
+        # Peak rather than current RSS, reported in KB on Linux and bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class PageTrace:  # Stage timings of one page rerun, in the order the stages finished
+    def __init__(self, page):
+        self.page = page
+        self.stages = []
+        self.depth = 0
+        self.start = time.perf_counter()
+        self.rss_start = current_rss()
+
+    @contextmanager
+    def stage(self, name):
+        depth, self.depth = self.depth, self.depth + 1
+        rss_before = current_rss()
+        if PROFILE_ALLOCATIONS:
+            # Nested stages reset the peak too, so an outer peak is a lower bound
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = {
+                'stage': name,
+                'depth': depth,
+                'ms': (time.perf_counter() - start) * 1000,
+                'rss_delta_mb': (current_rss() - rss_before) / 1e6,
+            }
+            if PROFILE_ALLOCATIONS:
+                record['alloc_peak_mb'] = tracemalloc.get_traced_memory()[1] / 1e6
+            self.depth = depth
+            self.stages.append(record)
+
+    def report(self):
+        return {
+            'page': self.page,
+            'total_ms': (time.perf_counter() - self.start) * 1000,
+            'rss_mb': current_rss() / 1e6,
+            'rss_delta_mb': (current_rss() - self.rss_start) / 1e6,
+            'stages': self.stages,
+        }
+
+
+def start_trace(page, enabled=PROFILE_PAGES):
+    if enabled and PROFILE_ALLOCATIONS and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _local.trace = PageTrace(page) if enabled else None
+
+
+def trace(name):  # with trace('stage'): ... -- a shared no-op context when tracing is off
+    page_trace = getattr(_local, 'trace', None)
+    return _DISABLED if page_trace is None else page_trace.stage(name)
+
+
+def finish_trace():  # Report of the rerun's trace, also logged as one JSON line; None when off
+    page_trace = getattr(_local, 'trace', None)
+    _local.trace = None
+    if page_trace is None:
+        return None
+    report = page_trace.report()
+    logger.info('page_trace %s', json.dumps(report))
+    return report
+
+
+def render_trace_panel(report, extras=None):  # Hidden debug panel in the sidebar
+    with st.sidebar.expander(f"Profile: {report['page']} ({report['total_ms']:.0f} ms)", expanded=True):
+        st.caption(f"RSS {report['rss_mb']:.1f} MB ({report['rss_delta_mb']:+.1f} MB this rerun)")
+        st.dataframe(report['stages'], hide_index=True, use_container_width=True)
+        for label, value in (extras or {}).items():
+            st.caption(label)
+            st.json(value, expanded=False)
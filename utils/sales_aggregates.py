@@ -0,0 +1,333 @@
+from collections import Counter, OrderedDict, namedtuple
+from datetime import date, timedelta
+import json
+import logging
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.profiling import trace
+from utils.sales_data import SALES_CSV
+from utils.sales_index import SalesFilter, canonical_filter
+from utils.sales_store import SalesSnapshot, load_sales_store
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_MAX_ENTRIES = 512
+SUMMARY_TTL = 6 * 60 * 60  # Seconds; a new data generation already makes old entries unreachable
+# Most requested (filter, tab, n) keys, kept across restarts so they can be pre-warmed
+POPULAR_PATH = r'./cache/popular_filters.json'
+POPULAR_SAVE_EVERY = 100  # Requests between saves
+POPULAR_SAVE_INTERVAL = 60.0  # And at least this many seconds
+POPULAR_MAX_KEYS = 1000
+
+# Compact per-tab results; each tab renders from one of these only
+TrendSummary = namedtuple('TrendSummary', ['total_sales', 'period_col', 'sales_by_period', 'trend_line', 'error'])
+RepSummary = namedtuple('RepSummary', ['top_rep', 'total_sales', 'avg_monthly_sales', 'biggest_sale', 'sales_by_rep'])
+ProductSummary = namedtuple('ProductSummary', ['total_sales', 'top_category', 'top_category_sales', 'top_line', 'top_line_sales',
+                                               'num_categories', 'num_lines', 'avg_sales_per_line', 'sales_pivot'])
+TurnaroundSummary = namedtuple('TurnaroundSummary', ['avg_tat', 'tat_counts'])
+# What the tabs read from the order facts, reduced per rep, customer and
+# turnaround day. It never grows with the number of orders, and the stats of
+# disjoint sets of orders merge exactly.
+OrderStats = namedtuple('OrderStats', ['biggest_sale', 'customers', 'turnaround'])
+
+
+def build_order_facts(lines):  # One row per order from the filtered line items
+    # Customer, rep and both dates are order-level fields, so 'first' is exact
+    facts = lines.groupby('Order #', observed=True).agg(
+        total_order_sales=('Line Item Total ($)', 'sum'),
+        line_count=('Line Item Total ($)', 'size'),
+        qty=('Qty (Units)', 'sum'),
+        biggest_line=('Line Item Total ($)', 'max'),
+        customer=('Customer', 'first'),
+        sales_rep=('Sales Rep', 'first'),
+        order_received=('Order Received', 'first'),
+        order_delivered=('Order Delivered', 'first'),
+    ).reset_index()
+    facts['tat_days'] = (facts['order_delivered'] - facts['order_received']).dt.days
+    return facts
+
+
+def build_order_stats(order_facts):
+    # Biggest sale is not additive, so it is kept as a maximum per rep
+    biggest_sale = order_facts.groupby('sales_rep', observed=True)['total_order_sales'].max()
+    customers = order_facts.groupby('customer', observed=True).agg(
+        order_count=('Order #', 'size'),
+        line_count=('line_count', 'sum'),
+        biggest_order=('biggest_line', 'max')
+    )
+    # Orders with negative or NaT turnaround are left out
+    orders = order_facts[order_facts['tat_days'] >= 0]
+    turnaround = orders.groupby('tat_days').agg(count=('line_count', 'size'), line_count=('line_count', 'sum'))
+    return OrderStats(biggest_sale, customers, turnaround)
+
+
+def merge_order_stats(parts):  # One OrderStats from those of disjoint sets of orders, e.g. one per month
+    return OrderStats(
+        pd.concat([part.biggest_sale for part in parts]).groupby(level=0, observed=True).max(),
+        pd.concat([part.customers for part in parts]).groupby(level=0, observed=True).agg(
+            {'order_count': 'sum', 'line_count': 'sum', 'biggest_order': 'max'}),
+        pd.concat([part.turnaround for part in parts]).groupby(level=0).sum().sort_index(),
+    )
+
+
+# --- Tab Summaries ---
+# Additive metrics come from the cube cells, the rest from the order facts
+def summarize_sales_trends(cells):
+    total_sales = cells['sales'].sum()
+    # If the time range is less than 91 days, group by week, else group by month
+    date_range = cells['last_received'].max() - cells['first_received'].min()
+    period_col = 'Week' if date_range < timedelta(days=91) else 'Year-Month'
+    sales_by_period = cells.groupby(period_col)['sales'].sum().rename('Line Item Total ($)').reset_index()
+    # Ensure the time period column is a proper datetime type for sorting
+    sales_by_period[period_col] = sales_by_period[period_col].dt.to_timestamp()
+    # Linear trend over the periods, or the reason there is none
+    x = np.arange(len(sales_by_period))
+    y = sales_by_period['Line Item Total ($)'].to_numpy()
+    trend_line, error = None, None
+    if len(x) < 2:
+        error = "Insufficient data to generate a trendline. At least two data points are required."
+    else:
+        try:
+            valid_mask = np.isfinite(x) & np.isfinite(y)
+            if valid_mask.sum() < 2:
+                raise ValueError("Filtered data contains fewer than two valid points.")
+            coefficients = np.polyfit(x[valid_mask], y[valid_mask], 1)  # 1st-degree polynomial (linear)
+            trend_line = np.poly1d(coefficients)(x)
+        except np.linalg.LinAlgError:
+            error = "Trendline calculation failed due to numerical instability."
+        except ValueError as e:
+            error = str(e)
+    return TrendSummary(total_sales, period_col, sales_by_period, trend_line, error)
+
+
+def summarize_sales_reps(cells, order_stats):
+    sales_by_rep = cells.groupby('Sales Rep', observed=True)['sales'].sum()
+    # Average monthly sales: sum per (rep, month), then the mean over each rep's months
+    monthly = cells.groupby(['Sales Rep', 'Year-Month'], observed=True)['sales'].sum()
+    avg_monthly_sales = monthly.groupby(level='Sales Rep', observed=True).mean()
+    top_rep = sales_by_rep.idxmax()
+    # Biggest sale is not additive, so it comes from the order stats
+    return RepSummary(top_rep, sales_by_rep[top_rep], avg_monthly_sales[top_rep], order_stats.biggest_sale[top_rep], sales_by_rep)
+
+
+def summarize_products(cells):
+    # Sales per Product Category and per Product Line, both rolled up from the shared (category, line) sums
+    product_sales = cells.groupby(['Product Category', 'Product Line'], observed=True)['sales'].sum()
+    sales_by_category = product_sales.groupby(level='Product Category', observed=True).sum()
+    sales_by_line = product_sales.groupby(level='Product Line', observed=True).sum()
+    # Each Product Line becomes a column under each Product Category, in sorted order
+    sales_pivot = product_sales.rename('Line Item Total ($)').reset_index().pivot(
+        index='Product Category', columns='Product Line', values='Line Item Total ($)')
+    sales_pivot = sales_pivot.sort_index().sort_index(axis=1)
+    return ProductSummary(
+        sales_by_category.sum(),
+        sales_by_category.idxmax(), sales_by_category.max(),
+        sales_by_line.idxmax(), sales_by_line.max(),
+        len(sales_by_category), len(sales_by_line),
+        sales_by_line.mean(),
+        sales_pivot,
+    )
+
+
+def summarize_customers(cells, order_stats, n):  # Top n customers by total sales, numeric columns
+    summary = cells.groupby('Customer', observed=True)['sales'].sum().rename('total_sales').reset_index()
+    summary = summary.sort_values(by='total_sales', ascending=False).head(n)
+    # Order counts and biggest orders are not additive, so read them from the order stats
+    summary = summary.join(order_stats.customers, on='Customer')
+    # Average value per line item, as in the per-line mean
+    summary['avg_order_value'] = summary['total_sales'] / summary['line_count']
+    return summary
+
+
+def summarize_turnaround(order_stats):
+    turnaround = order_stats.turnaround
+    # Average over line items, so weight each TAT value by its number of lines
+    avg_tat = (turnaround.index * turnaround['line_count']).sum() / turnaround['line_count'].sum()
+    # Orders per whole-day TAT value; enough to redraw the histogram exactly
+    return TurnaroundSummary(avg_tat, turnaround['count'])
+
+
+# --- Cached Loaders ---
+# _snapshot is a SalesSnapshot, or out of core the SalesPartitions standing in for one
+@st.cache_data(max_entries=16, show_spinner=False)
+def _load_partition_aggregates(_partitions, generation, sales_filter):
+    # One scan of the month partitions yields both the cells and the order facts
+    with trace('aggregate.partitions'):
+        return _partitions.query(sales_filter)
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _load_cells(_snapshot, generation, sales_filter):
+    if not isinstance(_snapshot, SalesSnapshot):
+        return _load_partition_aggregates(_snapshot, generation, sales_filter)[0]
+    with trace('aggregate.cells'):
+        return _snapshot.cells(sales_filter)
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _load_order_facts(_snapshot, generation, sales_filter):  # In memory only; out of core no query holds every order
+    with trace('filter.positions'):
+        lines = _snapshot.lines(sales_filter)
+    with trace('aggregate.order_facts'):
+        return build_order_facts(lines)
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _load_order_stats(_snapshot, generation, sales_filter):
+    if not isinstance(_snapshot, SalesSnapshot):
+        return _load_partition_aggregates(_snapshot, generation, sales_filter)[1]
+    with trace('aggregate.order_stats'):
+        return build_order_stats(_load_order_facts(_snapshot, generation, sales_filter))
+
+
+def _compute_tab_summary(_snapshot, generation, sales_filter, tab, n):
+    # Cells and order stats are only built when the requested tab needs them
+    if tab == 'trends':
+        return summarize_sales_trends(_load_cells(_snapshot, generation, sales_filter))
+    if tab == 'reps':
+        return summarize_sales_reps(_load_cells(_snapshot, generation, sales_filter), _load_order_stats(_snapshot, generation, sales_filter))
+    if tab == 'products':
+        return summarize_products(_load_cells(_snapshot, generation, sales_filter))
+    if tab == 'customers':
+        return summarize_customers(_load_cells(_snapshot, generation, sales_filter), _load_order_stats(_snapshot, generation, sales_filter), n)
+    if tab == 'turnaround':
+        return summarize_turnaround(_load_order_stats(_snapshot, generation, sales_filter))
+    raise ValueError(f'Unknown dashboard tab: {tab}')
+
+
+def load_order_facts(sales_filter, snapshot=None, path=SALES_CSV):  # The filter's orders, shared with the explorer
+    snapshot = snapshot or load_sales_store(path).snapshot()
+    return _load_order_facts(snapshot, snapshot.generation, sales_filter)
+
+
+# --- Summary Cache ---
+def filter_to_json(sales_filter):
+    return [list(values) for values in sales_filter[:4]] + [str(d) if d is not None else None for d in sales_filter[4:]]
+
+
+def filter_from_json(values):
+    return SalesFilter(*(tuple(v) for v in values[:4]), *(date.fromisoformat(d) if d else None for d in values[4:]))
+
+
+class SummaryCache:
+    # Tab summaries shared by every session, keyed on (data generation,
+    # canonical filter, tab, n). Entries expire after ttl seconds and the least
+    # recently used go first beyond max_entries. Concurrent misses on one key
+    # compute it once; the others wait for that result.
+    def __init__(self, max_entries=SUMMARY_MAX_ENTRIES, ttl=SUMMARY_TTL, popular_path=POPULAR_PATH):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.popular_path = popular_path
+        self.counters = Counter()
+        self.requests = Counter()  # (canonical filter, tab, n) -> requests
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._saving = False
+        self._saved_at = time.monotonic()
+
+    def get(self, key, compute, record=True):  # record=False keeps warm-up requests out of the popularity counts
+        generation, *request = key
+        if record:
+            self._count(tuple(request))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if time.monotonic() - entry[0] < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.counters['hits'] += 1
+                    return entry[1]
+                del self._entries[key]
+                self.counters['expired'] += 1
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = threading.Event()
+            self.counters['misses' if pending is None else 'waits'] += 1
+        if pending is not None:
+            pending.wait()
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None:
+                return entry[1]
+            return compute()  # The first caller failed; its error is ours to raise too
+        try:
+            value = compute()
+            with self._lock:
+                self._entries[key] = time.monotonic(), value
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.counters['evictions'] += 1
+            return value
+        finally:
+            with self._lock:
+                self._pending.pop(key).set()
+
+    def _count(self, request):
+        with self._lock:
+            self.requests[request] += 1
+            if len(self.requests) > POPULAR_MAX_KEYS:
+                # Forget the long tail, keeping the counts of the most requested half
+                self.requests = Counter(dict(self.requests.most_common(POPULAR_MAX_KEYS // 2)))
+            self.counters['requests'] += 1
+            now = time.monotonic()
+            if (not self.popular_path or self._saving or self.counters['requests'] % POPULAR_SAVE_EVERY
+                    or now - self._saved_at < POPULAR_SAVE_INTERVAL):
+                return
+            # Copy the counts under the lock; the file is written outside it, by one thread at a time
+            self._saving, self._saved_at = True, now
+            popular = self.requests.most_common(50)
+        try:
+            self._save_popular(popular)
+        finally:
+            with self._lock:
+                self._saving = False
+
+    def _save_popular(self, popular):
+        # A temporary file per process, so workers sharing popular_path never write into each other's
+        tmp_path = f'{self.popular_path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.popular_path) or '.', exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump([[filter_to_json(sales_filter), tab, n, count] for (sales_filter, tab, n), count in popular], f)
+            os.replace(tmp_path, self.popular_path)
+        except OSError as e:
+            logger.warning('Could not save popular filters to %s: %s', self.popular_path, e)
+
+    def popular(self, k):  # Most requested (filter, tab, n), this process and the last ones combined
+        with self._lock:
+            counts = Counter(self.requests)
+        if self.popular_path and os.path.exists(self.popular_path):
+            with open(self.popular_path) as f:
+                for values, tab, n, count in json.load(f):
+                    counts[filter_from_json(values), tab, n] += count
+        return [request for request, _ in counts.most_common(k)]
+
+    def stats(self):
+        with self._lock:
+            requests = self.counters['hits'] + self.counters['misses'] + self.counters['waits']
+            return {'entries': len(self._entries), **self.counters, 'hit_rate': self.counters['hits'] / requests if requests else None}
+
+
+@st.cache_resource
+def load_summary_cache():
+    return SummaryCache()
+
+
+def data_range(snapshot):  # First and last Order Received of a snapshot or partitions
+    return snapshot.min_date, snapshot.max_date
+
+
+def load_tab_summary(tab, sales_filter, snapshot=None, n=None, path=SALES_CSV, record=True):
+    # Computed once per tab, filter and data generation, shared across sessions.
+    # Filters that select the same rows share one entry.
+    snapshot = snapshot or load_sales_store(path).snapshot()
+    sales_filter = canonical_filter(sales_filter, *data_range(snapshot))
+    with trace(f'tab.{tab}'):
+        return load_summary_cache().get(
+            (snapshot.generation, sales_filter, tab, n),
+            lambda: _compute_tab_summary(snapshot, snapshot.generation, sales_filter, tab, n), record)
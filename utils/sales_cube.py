@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+from utils.sales_data import union_categories
+from utils.sales_index import FILTER_DIMENSIONS
+
+CELL_KEYS = ['Week', 'Year-Month'] + FILTER_DIMENSIONS
+
+
+def build_cells(lines):  # Pre-summed cells at (week, month, rep, category, line, customer) grain
+    received = lines['Order Received']
+    keys = [received.dt.to_period('W').rename('Week'), received.dt.to_period('M').rename('Year-Month')]
+    keys += [lines[name] for name in FILTER_DIMENSIONS]
+    cells = lines.groupby(keys, observed=True).agg(
+        sales=('Line Item Total ($)', 'sum'),
+        lines=('Line Item Total ($)', 'size'),
+        first_received=('Order Received', 'min'),
+        last_received=('Order Received', 'max'),
+    ).reset_index()
+    # A cell covers the days where its week and month overlap
+    cells['bucket_start'] = np.maximum(cells['Week'].dt.start_time, cells['Year-Month'].dt.start_time)
+    cells['bucket_end'] = np.minimum((cells['Week'] + 1).dt.start_time, (cells['Year-Month'] + 1).dt.start_time)
+    return cells
+
+
+def merge_cells(cells):  # Combine cells that share a key, e.g. after appending a batch
+    return cells.groupby(CELL_KEYS, observed=True).agg(
+        sales=('sales', 'sum'),
+        lines=('lines', 'sum'),
+        first_received=('first_received', 'min'),
+        last_received=('last_received', 'max'),
+        bucket_start=('bucket_start', 'first'),
+        bucket_end=('bucket_end', 'first'),
+    ).reset_index()
+
+
+def next_boundary(day):  # First week or month start on or after day
+    day = pd.Timestamp(day).normalize()
+    monday = day + pd.Timedelta(days=(7 - day.dayofweek) % 7)
+    month_start = day if day.day == 1 else day + pd.offsets.MonthBegin(1)
+    return min(monday, month_start)
+
+
+def previous_boundary(day):  # Last week or month start on or before day
+    day = pd.Timestamp(day).normalize()
+    return max(day - pd.Timedelta(days=day.dayofweek), day.replace(day=1))
+
+
+class SalesCube:
+    # Answers additive dashboard questions from pre-summed cells. Only the
+    # partial weeks/months at the ends of a date window are read from raw rows.
+    def __init__(self, sales_df, sales_index):
+        self.sales_df = sales_df
+        self.index = sales_index
+        self.cells = build_cells(sales_df)
+
+    def query(self, sales_filter):  # Cells for the filter, same columns as build_cells
+        start, end = sales_filter.start_date, sales_filter.end_date
+        if start is None or end is None or self.cells.empty:
+            return build_cells(self.sales_df.take(self.index.positions(sales_filter)))
+        inner_start, inner_end = next_boundary(start), previous_boundary(end)
+        if inner_start >= inner_end:
+            return build_cells(self.sales_df.take(self.index.positions(sales_filter)))
+        # Whole buckets inside the window come straight from the cube
+        cells = self.cells
+        mask = (cells['bucket_start'] >= inner_start) & (cells['bucket_end'] <= inner_end)
+        for name, values in zip(FILTER_DIMENSIONS, sales_filter[:4]):
+            if values:
+                mask &= cells[name].isin(values)
+        # Rows in [start, inner_start) and [inner_end, end] are summed on the fly
+        edge_rows = np.concatenate([
+            self.index.select(sales_filter, start, inner_start, include_end=False),
+            self.index.select(sales_filter, inner_end, end),
+        ])
+        edges = build_cells(self.sales_df.take(edge_rows))
+        return pd.concat([cells[mask], edges], ignore_index=True)
+
+    def extended(self, sales_df, sales_index, batch):  # New cube with batch folded into the cells
+        new = SalesCube.__new__(SalesCube)
+        new.sales_df = sales_df
+        new.index = sales_index
+        cells, batch_cells = union_categories([self.cells, build_cells(batch)], FILTER_DIMENSIONS)
+        new.cells = merge_cells(pd.concat([cells, batch_cells], ignore_index=True))
+        return new
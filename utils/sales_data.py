@@ -0,0 +1,203 @@
+import hashlib
+import logging
+import os
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.profiling import current_rss
+
+# Every session shares the cached frame below, so derived frames must never
+# write back into it. Copy-on-write makes that the default for all pandas ops.
+pd.set_option('mode.copy_on_write', True)
+
+logger = logging.getLogger(__name__)
+
+SALES_CSV = r'./assets/salesDF.csv'
+
+# Rename and Reorder Columns
+COLUMN_NAMES = {
+    'orderID': 'Order #',
+    'anon_customer': 'Customer',
+    'order_date': 'Order Received',
+    'start_ship_date': 'Order Delivered',
+    'anon_rep': 'Sales Rep',
+    'anon_product_line': 'Product Line',
+    'anon_product': 'Product',
+    'line_item_total': 'Line Item Total ($)',
+    'anon_category': 'Product Category'
+}
+COL_ORDER = ['Order #', 'Customer', 'Sales Rep', 'Order Received', 'Order Delivered', 'Product Category', 'Product Line', 'Product', 'Qty (Units)', 'Line Item Total ($)']
+CATEGORICAL_COLS = ['Order #', 'Customer', 'Sales Rep', 'Product Category', 'Product Line', 'Product']
+# Anomalous categories excluded from every view
+EXCLUDED_CATEGORIES = ['Category_4', 'Category_5', 'Category_6']
+# Timestamp layouts of the export, e.g. '2021-04-30 10:30 AM' and '2021-05-04'
+ORDER_DATE_FORMAT = '%Y-%m-%d %I:%M %p'
+SHIP_DATE_FORMAT = '%Y-%m-%d'
+# Raw CSV columns we actually use (skips the saved index column)
+RAW_COLUMNS = list(COLUMN_NAMES) + ['Qty (Units)']
+# Bump whenever clean_sales changes what it produces, so older snapshots are rebuilt
+CLEANING_VERSION = '1'
+
+
+def parse_dates(values, fmt):  # Fast path for the export's layout, inference for anything else
+    try:
+        return pd.to_datetime(values, format=fmt)
+    except (ValueError, TypeError):
+        return pd.to_datetime(values, format='mixed')
+
+
+def clean_sales(raw):  # Apply the import rules to a raw salesDF-shaped frame
+    # Remove anomalies before parsing anything else
+    sales_df = raw[~raw['anon_category'].isin(EXCLUDED_CATEGORIES)]
+    # Convert the 'Order Received' and 'Order Delivered' columns directly to datetime
+    sales_df['order_date'] = parse_dates(sales_df['order_date'], ORDER_DATE_FORMAT)
+    sales_df['start_ship_date'] = parse_dates(sales_df['start_ship_date'], SHIP_DATE_FORMAT)
+    # Convert Line Item Total to numeric, strip formatting
+    sales_df['line_item_total'] = pd.to_numeric(sales_df['line_item_total'].replace('[\\$,]', '', regex=True))
+    sales_df['Qty (Units)'] = pd.to_numeric(sales_df['Qty (Units)'])
+    sales_df = sales_df.rename(columns=COLUMN_NAMES)[COL_ORDER]
+    # Repeated strings become integer codes, categories sorted so groupby order is unchanged
+    for col in CATEGORICAL_COLS:
+        sales_df[col] = sales_df[col].astype('category')
+    return sales_df.reset_index(drop=True)
+
+
+def read_sales_csv(path=SALES_CSV):
+    return clean_sales(pd.read_csv(path, usecols=RAW_COLUMNS))
+
+
+def source_version(path):  # Cheap change detector used as the cache key
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# --- Columnar Snapshot ---
+def snapshot_path_for(csv_path):
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+
+def snapshot_is_current(csv_path, snapshot_path):
+    if not os.path.exists(snapshot_path):
+        return False
+    meta = pq.read_schema(snapshot_path).metadata or {}
+    if meta.get(b'cleaning_version') != CLEANING_VERSION.encode():
+        return False
+    mtime_ns, size = source_version(csv_path)
+    if meta.get(b'source_version') == f'{mtime_ns}:{size}'.encode():
+        return True
+    # The CSV was touched or copied; only rebuild if its content changed
+    sha256 = file_sha256(csv_path)
+    if meta.get(b'source_sha256') != sha256.encode():
+        return False
+    # Same content: record the new mtime and size so the next start takes the fast path again
+    try:
+        stamp_snapshot(pq.read_table(snapshot_path, memory_map=True), csv_path, snapshot_path, sha256)
+    except OSError as e:
+        logger.warning('Could not update sales snapshot %s: %s', snapshot_path, e)
+    return True
+
+
+def stamp_snapshot(table, csv_path, snapshot_path, sha256=None):  # Write table with csv_path's version in its metadata
+    mtime_ns, size = source_version(csv_path)
+    meta = dict(table.schema.metadata or {})
+    meta[b'source_version'] = f'{mtime_ns}:{size}'.encode()
+    meta[b'source_sha256'] = (sha256 or file_sha256(csv_path)).encode()
+    meta[b'cleaning_version'] = CLEANING_VERSION.encode()
+    table = table.replace_schema_metadata(meta)
+    # Write next to the target and swap in, so readers never see a partial file
+    tmp_path = snapshot_path + '.tmp'
+    pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, snapshot_path)
+
+
+def write_snapshot(sales_df, csv_path, snapshot_path):
+    stamp_snapshot(pa.Table.from_pandas(sales_df, preserve_index=False), csv_path, snapshot_path)
+
+
+def read_snapshot(snapshot_path, columns=COL_ORDER):
+    # Memory-mapped read that only materializes the projected columns
+    table = pq.read_table(snapshot_path, columns=columns, memory_map=True)
+    return table.to_pandas(self_destruct=True)
+
+
+def read_sales(path=SALES_CSV):  # Snapshot if it is current, otherwise parse the CSV and write one
+    snapshot_path = snapshot_path_for(path)
+    if snapshot_is_current(path, snapshot_path):
+        return read_snapshot(snapshot_path), 'snapshot'
+    sales_df = read_sales_csv(path)
+    try:
+        write_snapshot(sales_df, path, snapshot_path)
+    except OSError as e:
+        logger.warning('Could not write sales snapshot %s: %s', snapshot_path, e)
+    return sales_df, 'csv'
+
+
+_load_reports = {}
+
+
+def load_sales_frame(path=SALES_CSV):  # Cold load with timing and memory reporting
+    rss_before = current_rss()
+    start = time.perf_counter()
+    sales_df, source = read_sales(path)
+    report = {
+        'source': source,
+        'rows': len(sales_df),
+        'seconds': time.perf_counter() - start,
+        'frame_mb': sales_df.memory_usage(deep=True).sum() / 1e6,
+        'rss_mb': current_rss() / 1e6,
+        'rss_delta_mb': (current_rss() - rss_before) / 1e6,
+    }
+    _load_reports[path] = report
+    logger.info('Loaded %(rows)d sales rows from %(source)s in %(seconds).3fs '
+                '(frame %(frame_mb).1f MB, RSS %(rss_mb).1f MB, +%(rss_delta_mb).1f MB)', report)
+    return sales_df
+
+
+def load_report(path=SALES_CSV):  # Timing and memory of the last cold load
+    return _load_reports.get(path)
+
+
+# --- Incremental Batches ---
+def read_sales_batch(batch):  # Clean a DataFrame or CSV file/buffer of raw salesDF-shaped rows
+    if not isinstance(batch, pd.DataFrame):
+        batch = pd.read_csv(batch, usecols=RAW_COLUMNS)
+    return clean_sales(batch)
+
+
+def append_raw_csv(path, raw):  # Persist raw rows to the source CSV in its own column layout
+    header = pd.read_csv(path, nrows=0).columns
+    with open(path, 'rb+') as f:
+        # Make sure the new rows start on their own line
+        if f.seek(0, os.SEEK_END):
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+    raw.reindex(columns=header).to_csv(path, mode='a', header=False, index=False)
+
+
+def union_categories(frames, columns=CATEGORICAL_COLS):  # Copies of frames sharing the same sorted categories
+    frames = [frame.copy(deep=False) for frame in frames]
+    for col in columns:
+        categories = sorted(set().union(*(frame[col].cat.categories for frame in frames)))
+        for frame in frames:
+            if list(frame[col].cat.categories) != categories:
+                frame[col] = frame[col].cat.set_categories(categories)
+    return frames
+
+
+def concat_pieces(frames, columns=CATEGORICAL_COLS):  # Row subsets of different frames as one, categories cut to the values present
+    frames = [frame.copy(deep=False) for frame in frames]
+    for frame in frames:
+        for col in columns:
+            frame[col] = frame[col].cat.remove_unused_categories()
+    return pd.concat(union_categories(frames, columns), ignore_index=True)
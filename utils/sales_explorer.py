@@ -0,0 +1,224 @@
+import numpy as np
+import pandas as pd
+import pyarrow.compute as pc
+import streamlit as st
+
+from utils.profiling import trace
+from utils.sales_aggregates import build_order_facts, load_order_facts
+from utils.sales_data import COL_ORDER
+from utils.sales_partitions import filter_expression, search_expression
+from utils.sales_store import SalesSnapshot
+
+# Explorer views: the filtered line items, or one row per order. Columns are
+# (source column, display name); only the rows of the visible page are ever
+# materialized, the rest stays as an ordered array of row positions in
+# memory, or as per-month row counts out of core.
+EXPLORER_VIEWS = {
+    'lines': [
+        ('Order #', 'Order #'), ('Customer', 'Customer'), ('Sales Rep', 'Sales Rep'),
+        ('Order Received', 'Order Received'), ('Order Delivered', 'Order Delivered'),
+        ('Product Category', 'Product Category'), ('Product Line', 'Product Line'), ('Product', 'Product'),
+        ('Qty (Units)', 'Qty (Units)'), ('Line Item Total ($)', 'Line Item Total ($)'),
+    ],
+    'orders': [
+        ('Order #', 'Order #'), ('customer', 'Customer'), ('order_received', 'Order Received'),
+        ('order_delivered', 'Order Delivered'), ('qty', 'Qty (Units)'), ('total_order_sales', 'Line Item Total ($)'),
+        ('sales_rep', 'Sales Rep'),
+    ],
+}
+# Out of core, rows come in Order Received order only: it is the partition
+# key, so a page is found from per-month row counts and reading the months it
+# spans. Any other order would need every matching row at once.
+RECEIVED_COLUMNS = {'lines': 'Order Received', 'orders': 'order_received'}
+# Line item columns a search matches; the orders view's are order-level, so an
+# order matches exactly when its lines do
+SEARCH_COLUMNS = {
+    'lines': ['Order #', 'Customer', 'Sales Rep', 'Product Category', 'Product Line', 'Product'],
+    'orders': ['Order #', 'Customer', 'Sales Rep'],
+}
+EXPORT_CHUNK_ROWS = 50_000
+
+
+def view_source(view, sales_filter, snapshot):  # The frame a view's row positions point into, in memory
+    if view == 'orders':
+        return load_order_facts(sales_filter, snapshot)
+    if view != 'lines':
+        raise ValueError(f'Unknown explorer view: {view}')
+    if len(snapshot.segments) == 1:
+        return snapshot.segments[0].sales_df
+    # Batches appended since the last compaction; their filtered rows are gathered once
+    return _load_snapshot_lines(snapshot, snapshot.generation, sales_filter)
+
+
+def view_frame(view, sales_filter, snapshot):  # (frame, row positions) a view pages through, unsorted
+    frame = view_source(view, sales_filter, snapshot)
+    if view == 'lines' and len(snapshot.segments) == 1:
+        return frame, snapshot.segments[0].index.positions(sales_filter)
+    return frame, np.arange(len(frame))
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _load_snapshot_lines(_snapshot, generation, sales_filter):
+    return _snapshot.lines(sales_filter)
+
+
+def sort_key(column):  # float64 per row: category codes (categories are sorted), timestamps or numbers; missing is NaN
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes = column.cat.codes.to_numpy().astype(np.float64)
+        codes[codes < 0] = np.nan
+        return codes
+    if pd.api.types.is_datetime64_any_dtype(column):
+        key = column.to_numpy().view(np.int64).astype(np.float64)
+        key[column.isna().to_numpy()] = np.nan
+        return key
+    return column.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def search_mask(frame, rows, columns, text, order_ids=None):  # Rows with text in any of the categorical columns
+    # Matched against each column's distinct values, then rows selected by code
+    text = text.lower()
+    mask = np.zeros(len(rows), dtype=bool)
+    for column in columns:
+        values = frame[column]
+        if not isinstance(values.dtype, pd.CategoricalDtype):
+            continue
+        if column == 'Order #' and order_ids is not None:
+            # Coded: the codes are positions in order_ids
+            matched = np.flatnonzero(np.char.find(np.char.lower(order_ids), text) >= 0)
+        else:
+            matched = [code for code, value in enumerate(values.cat.categories) if text in str(value).lower()]
+        if len(matched):
+            mask |= np.isin(values.cat.codes.to_numpy()[rows], matched)
+    return mask
+
+
+def explorer_order(frame, rows, columns, sort, descending=False, search='', order_ids=None):  # Row positions in display order
+    if search:
+        rows = rows[search_mask(frame, rows, columns, search, order_ids)]
+    key = sort_key(frame[sort])[rows]
+    # Stable in both directions; NaN sorts last either way
+    order = np.argsort(-key if descending else key, kind='stable')
+    return rows[order]
+
+
+def explorer_page(frame, order, view, offset, limit, order_ids=None):  # The visible page only, with display column names
+    columns = EXPLORER_VIEWS[view]
+    page = frame.take(order[offset:offset + limit])[[source for source, _ in columns]]
+    if order_ids is not None:
+        # Only this page's Order # positions are decoded to IDs
+        page['Order #'] = order_ids[page['Order #'].to_numpy(dtype=np.int64)]
+    return page.rename(columns=dict(columns)).reset_index(drop=True)
+
+
+class ExplorerRows:  # In memory: a view's frame and its row positions in display order
+    def __init__(self, frame, order, view, order_ids=None):
+        self.frame = frame
+        self.order = order
+        self.view = view
+        self.order_ids = order_ids
+
+    def __len__(self):
+        return len(self.order)
+
+    def page(self, offset, limit):
+        return explorer_page(self.frame, self.order, self.view, offset, limit, self.order_ids)
+
+    def chunks(self, chunk_rows):
+        for start in range(0, len(self.order), chunk_rows):
+            yield self.page(start, chunk_rows)
+
+
+class PartitionRows:
+    # Out of core: a view's rows, month partition by month partition in
+    # Order Received order. Only the per-month counts are kept; a page reads
+    # the months it spans, so memory grows with the busiest month at most.
+    def __init__(self, partitions, view, sales_filter, descending, search, counts):
+        self.partitions = partitions
+        self.view = view
+        self.descending = descending
+        self.expression = filter_expression(sales_filter)
+        if search:
+            self.expression = search_expression(SEARCH_COLUMNS[view], search, self.expression)
+        self.months = partitions.months[::-1] if descending else partitions.months
+        self.counts = counts[::-1] if descending else counts
+        self.starts = np.concatenate([[0], np.cumsum(self.counts)])
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def month_rows(self, i):  # The view's rows of the i-th month, in display order
+        lines = self.partitions.month_frame(self.months[i], COL_ORDER, self.expression)
+        frame = lines if self.view == 'lines' else build_order_facts(lines)
+        key = sort_key(frame[RECEIVED_COLUMNS[self.view]])
+        frame = frame.take(np.argsort(-key if self.descending else key, kind='stable'))
+        return frame[[source for source, _ in EXPLORER_VIEWS[self.view]]]
+
+    def page(self, offset, limit):
+        parts = []
+        end = min(offset + limit, len(self))
+        i = max(np.searchsorted(self.starts, offset, side='right') - 1, 0)
+        while i < len(self.months) and self.starts[i] < end:
+            if self.counts[i]:
+                start = self.starts[i]
+                parts.append(self.month_rows(i).iloc[max(offset - start, 0):end - start])
+            i += 1
+        if not parts:
+            return pd.DataFrame(columns=[name for _, name in EXPLORER_VIEWS[self.view]])
+        return pd.concat(parts, ignore_index=True).rename(columns=dict(EXPLORER_VIEWS[self.view]))
+
+    def chunks(self, chunk_rows):  # Each month is read once
+        for i, count in enumerate(self.counts):
+            if count:
+                rows = self.month_rows(i).rename(columns=dict(EXPLORER_VIEWS[self.view]))
+                for start in range(0, len(rows), chunk_rows):
+                    yield rows.iloc[start:start + chunk_rows]
+
+
+def write_csv_chunks(f, rows, chunk_rows=EXPORT_CHUNK_ROWS):  # Whole result as CSV, one chunk of rows at a time
+    header = True
+    for chunk in rows.chunks(chunk_rows):
+        chunk.to_csv(f, header=header, index=False)
+        header = False
+    if header:
+        rows.page(0, 0).to_csv(f, index=False)
+
+
+def sort_columns(view, snapshot):  # The columns a view can be sorted by
+    if isinstance(snapshot, SalesSnapshot):
+        return [source for source, _ in EXPLORER_VIEWS[view]]
+    return [RECEIVED_COLUMNS[view]]
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _load_explorer_order(_snapshot, generation, sales_filter, view, sort, descending, search):
+    frame, rows = view_frame(view, sales_filter, _snapshot)
+    with trace('explorer.order'):
+        return explorer_order(frame, rows, [source for source, _ in EXPLORER_VIEWS[view]], sort, descending, search,
+                              _snapshot.order_ids)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _load_month_counts(_partitions, generation, sales_filter, view, search):  # Matching rows of the view per month, oldest first
+    expression = filter_expression(sales_filter)
+    if search:
+        expression = search_expression(SEARCH_COLUMNS[view], search, expression)
+    with trace('explorer.counts'):
+        if view == 'lines':
+            return np.array([_partitions.count_month(month, expression) for month in _partitions.months], dtype=np.int64)
+        return np.array([pc.count_distinct(_partitions.read_month(month, ['Order #'], expression)['Order #']).as_py()
+                         for month in _partitions.months], dtype=np.int64)
+
+
+def load_explorer(view, sales_filter, snapshot, sort, descending=False, search=''):
+    # The view's rows in display order; the ordering (or out of core, the
+    # per-month counts) is cached per filter, sort and search, shared across sessions
+    if view not in EXPLORER_VIEWS:
+        raise ValueError(f'Unknown explorer view: {view}')
+    search = search.strip()
+    if isinstance(snapshot, SalesSnapshot):
+        order = _load_explorer_order(snapshot, snapshot.generation, sales_filter, view, sort, descending, search)
+        return ExplorerRows(view_source(view, sales_filter, snapshot), order, view, snapshot.order_ids)
+    if sort != RECEIVED_COLUMNS[view]:
+        raise ValueError(f'Out of core, the {view} view can only be sorted by {RECEIVED_COLUMNS[view]}')
+    counts = _load_month_counts(snapshot, snapshot.generation, sales_filter, view, search)
+    return PartitionRows(snapshot, view, sales_filter, descending, search, counts)
@@ -0,0 +1,121 @@
+from collections import namedtuple
+import copy
+import numpy as np
+import pandas as pd
+
+# Multiselect filters on the Sales Dashboard, in SalesFilter field order
+FILTER_DIMENSIONS = ['Sales Rep', 'Product Category', 'Product Line', 'Customer']
+
+# One dashboard filter state; empty selections mean "no filter"
+SalesFilter = namedtuple('SalesFilter', ['reps', 'cats', 'lines', 'cust', 'start_date', 'end_date'])
+
+
+def canonical_filter(sales_filter, first=None, last=None):
+    # One key per set of matching rows: selections sorted, and open or
+    # out-of-range dates clamped to the days spanning the first and last orders
+    start, end = sales_filter.start_date, sales_filter.end_date
+    if first is not None and last is not None:
+        first_day, last_day = pd.Timestamp(first).normalize(), pd.Timestamp(last).ceil('D')
+        if start is None or pd.Timestamp(start) < first_day:
+            start = first_day.date()
+        # The end bound is inclusive at midnight, so the midnight after the last order covers it
+        if end is None or pd.Timestamp(end) > last_day:
+            end = last_day.date()
+    return SalesFilter(*(tuple(sorted(values)) for values in sales_filter[:4]), start, end)
+
+
+class DimensionIndex:  # Integer codes and per-value row lists for one column
+    def __init__(self, column):
+        column = column.astype('category')
+        self.size = len(column)
+        # Initial codes follow the sorted categories; values first seen in appended
+        # batches get new codes at the end, so existing codes never change
+        self.values = list(column.cat.categories)
+        self.lookup = {value: code for code, value in enumerate(self.values)}
+        codes = column.cat.codes.to_numpy()
+        # Rows grouped by code; a stable sort keeps each value's rows ascending
+        self.postings = np.argsort(codes, kind='stable')
+        counts = np.bincount(codes, minlength=len(self.values))
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def code(self, value):  # None if value never occurs
+        return self.lookup.get(value)
+
+    def rows(self, value):
+        code = self.code(value)
+        if code is None:
+            return self.postings[:0]
+        return self.postings[self.offsets[code]:self.offsets[code + 1]]
+
+    def bitmap(self, values):  # Row mask of every row matching any of values
+        mask = np.zeros(self.size, dtype=bool)
+        for value in values:
+            mask[self.rows(value)] = True
+        return mask
+
+    def extended(self, column):  # New index with column's values appended as rows size, size + 1, ...
+        new = copy.copy(self)
+        new.values = list(self.values)
+        new.lookup = dict(self.lookup)
+        for value in pd.unique(column):
+            if value not in new.lookup:
+                new.lookup[value] = len(new.values)
+                new.values.append(value)
+        codes = np.asarray(pd.Series(column, dtype=object).map(new.lookup), dtype=np.int64)
+        rows = self.size + np.arange(len(codes))
+        order = np.argsort(codes, kind='stable')
+        # Insert each new row at the end of its value's run in one vectorized pass
+        ends = np.concatenate((self.offsets, np.full(len(new.values) - len(self.values), self.offsets[-1])))
+        new.postings = np.insert(self.postings, ends[codes[order] + 1], rows[order])
+        counts = np.bincount(codes, minlength=len(new.values))
+        new.offsets = ends + np.concatenate(([0], np.cumsum(counts)))
+        new.size = self.size + len(codes)
+        return new
+
+
+class SalesIndex:
+    def __init__(self, sales_df):
+        self.size = len(sales_df)
+        self.dims = {name: DimensionIndex(sales_df[name]) for name in FILTER_DIMENSIONS}
+        # Row positions sorted by Order Received, for binary-searched date windows
+        dates = sales_df['Order Received'].to_numpy()
+        self.date_order = np.argsort(dates, kind='stable')
+        self.sorted_dates = dates[self.date_order]
+
+    def date_window(self, start, end, include_end=True):  # Rows with start <= Order Received <= end (or < end)
+        lo = 0 if start is None else np.searchsorted(self.sorted_dates, pd.Timestamp(start).to_datetime64(), side='left')
+        hi = self.size if end is None else np.searchsorted(self.sorted_dates, pd.Timestamp(end).to_datetime64(), side='right' if include_end else 'left')
+        return self.date_order[lo:max(lo, hi)]
+
+    def select(self, sales_filter, start, end, include_end=True):  # Filter dimensions over an explicit date window
+        mask = None
+        for name, values in zip(FILTER_DIMENSIONS, sales_filter[:4]):
+            if not values:
+                continue
+            bitmap = self.dims[name].bitmap(values)
+            mask = bitmap if mask is None else np.logical_and(mask, bitmap, out=mask)
+        rows = self.date_window(start, end, include_end)
+        if mask is not None:
+            rows = rows[mask[rows]]
+        return np.sort(rows)
+
+    def positions(self, sales_filter):  # Ascending row positions matching the filter
+        return self.select(sales_filter, sales_filter.start_date, sales_filter.end_date)
+
+    def extended(self, batch):  # New index covering batch appended after the current rows
+        new = copy.copy(self)
+        new.size = self.size + len(batch)
+        new.dims = {name: dim.extended(batch[name]) for name, dim in self.dims.items()}
+        dates = batch['Order Received'].to_numpy()
+        order = np.argsort(dates, kind='stable')
+        batch_dates, batch_rows = dates[order], self.size + order
+        if not self.size or batch_dates[0] >= self.sorted_dates[-1]:
+            # Usual case: newer records simply extend the sorted run
+            new.sorted_dates = np.concatenate((self.sorted_dates, batch_dates))
+            new.date_order = np.concatenate((self.date_order, batch_rows))
+        else:
+            # Late records are merged into place
+            at = np.searchsorted(self.sorted_dates, batch_dates, side='right')
+            new.sorted_dates = np.insert(self.sorted_dates, at, batch_dates)
+            new.date_order = np.insert(self.date_order, at, batch_rows)
+        return new
@@ -0,0 +1,236 @@
+from contextlib import contextmanager
+import itertools
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import streamlit as st
+
+from utils.sales_aggregates import build_order_facts, build_order_stats, merge_order_stats
+from utils.sales_cube import build_cells, merge_cells
+from utils.sales_data import CATEGORICAL_COLS, COL_ORDER, RAW_COLUMNS, SALES_CSV, clean_sales, source_version
+from utils.sales_index import FILTER_DIMENSIONS
+
+logger = logging.getLogger(__name__)
+
+# Out-of-core mode: the cleaned sales history lives on disk as Parquet files
+# partitioned by month of Order Received, and every dashboard query is a
+# filtered scan, one month at a time. Set SALES_OUT_OF_CORE=1 to serve the
+# Sales Dashboard this way; memory then grows with the busiest month and the
+# aggregates, not with the length of the history.
+OUT_OF_CORE = bool(os.environ.get('SALES_OUT_OF_CORE'))
+PARTITIONS_DIR = r'./assets/sales_partitions'
+CSV_CHUNK_ROWS = 500_000
+SCAN_BATCH_ROWS = 250_000  # Rows held in memory at once while scanning; the peak is at most this plus one month
+# Every column but Product, which no dashboard aggregate reads
+AGGREGATE_COLUMNS = [col for col in COL_ORDER if col != 'Product']
+PARTITIONING = ds.partitioning(pa.schema([('month', pa.string())]), flavor='hive')
+
+_generations = itertools.count(1)
+
+
+@contextmanager
+def writer_lock(root):  # One process at a time writes or removes partitions under root
+    import fcntl
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, '.lock'), 'w') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def write_partitions(csv_path, out_dir, chunk_rows=CSV_CHUNK_ROWS):
+    # Clean the CSV a chunk at a time into month partitions. Orders never span
+    # months (all their lines share Order Received), so each partition holds
+    # whole orders. Returns the catalog the page needs without a scan.
+    options = {name: {} for name in FILTER_DIMENSIONS}  # Insertion-ordered, like Series.unique()
+    rows, min_date, max_date = 0, None, None
+    for i, raw in enumerate(pd.read_csv(csv_path, usecols=RAW_COLUMNS, chunksize=chunk_rows)):
+        lines = clean_sales(raw)
+        if lines.empty:
+            continue
+        rows += len(lines)
+        first = lines['Order Received'].min()
+        last = lines['Order Received'].max()
+        min_date = first if min_date is None or first < min_date else min_date
+        max_date = last if max_date is None or last > max_date else max_date
+        for name in FILTER_DIMENSIONS:
+            options[name].update(dict.fromkeys(lines[name].dropna().unique()))
+        # Plain strings on disk, missing values as nulls; dictionary types would differ from chunk to chunk
+        lines = lines.astype({col: object for col in CATEGORICAL_COLS})
+        lines['month'] = lines['Order Received'].dt.strftime('%Y-%m')
+        table = pa.Table.from_pandas(lines, preserve_index=False)
+        # Also for a chunk where a column is all missing, which would otherwise get the null type
+        table = table.cast(pa.schema([field.with_type(pa.string()) if field.name in CATEGORICAL_COLS else field for field in table.schema]))
+        ds.write_dataset(table, out_dir, format='parquet', partitioning=PARTITIONING,
+                         basename_template=f'chunk-{i:05d}-{{i}}.parquet', existing_data_behavior='overwrite_or_ignore')
+    catalog = {
+        'source_version': list(source_version(csv_path)),
+        'rows': rows,
+        'min_date': None if min_date is None else min_date.isoformat(),
+        'max_date': None if max_date is None else max_date.isoformat(),
+        'options': {name: list(values) for name, values in options.items()},
+    }
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, '_catalog.json'), 'w') as f:
+        json.dump(catalog, f)
+    return catalog
+
+
+def filter_expression(sales_filter):  # The dashboard filter as a dataset predicate, months pruned by partition
+    expression = None
+    conditions = [ds.field(name).isin(list(values)) for name, values in zip(FILTER_DIMENSIONS, sales_filter[:4]) if values]
+    # Same bounds as SalesIndex.date_window: start <= Order Received <= end
+    if sales_filter.start_date is not None:
+        start = pd.Timestamp(sales_filter.start_date)
+        conditions += [ds.field('month') >= start.strftime('%Y-%m'), ds.field('Order Received') >= start.to_datetime64()]
+    if sales_filter.end_date is not None:
+        end = pd.Timestamp(sales_filter.end_date)
+        conditions += [ds.field('month') <= end.strftime('%Y-%m'), ds.field('Order Received') <= end.to_datetime64()]
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def search_expression(columns, text, expression=None):  # Rows with text in any of the columns, ignoring case, and expression
+    matches = None
+    for column in columns:
+        match = pc.match_substring(ds.field(column), text, ignore_case=True)
+        matches = match if matches is None else matches | match
+    if matches is None:
+        return expression
+    return matches if expression is None else expression & matches
+
+
+class SalesPartitions:
+    # Read side of out-of-core mode, standing in for a SalesSnapshot: cells and
+    # order stats are built per month partition and merged, so the tab
+    # summaries come out the same as from the in-memory cube. While open it
+    # holds the directory's .lock shared, so no process removes it mid-scan.
+    def __init__(self, path):
+        import fcntl
+        self.path = path
+        self._open_lock = open(os.path.join(path, '.lock'), 'a')
+        fcntl.flock(self._open_lock, fcntl.LOCK_SH)
+        with open(os.path.join(path, '_catalog.json')) as f:
+            self.catalog = json.load(f)
+        self.dataset = ds.dataset(path, format='parquet', partitioning=PARTITIONING)  # _catalog.json is skipped by its prefix
+        self.months = sorted({os.path.basename(os.path.dirname(f)).split('=', 1)[1] for f in self.dataset.files})
+        self.min_date = pd.Timestamp(self.catalog['min_date']) if self.catalog['min_date'] else pd.Timestamp.today()
+        self.max_date = pd.Timestamp(self.catalog['max_date']) if self.catalog['max_date'] else self.min_date
+        self.options = self.catalog['options']
+        # Every partition shares these, so partial results concatenate without recoding
+        self.dtypes = {name: pd.CategoricalDtype(sorted(values)) for name, values in self.options.items()}
+        # Never equal to a SalesSnapshot generation, so the two modes can share result caches
+        self.generation = ('partitions', next(_generations))
+
+    def _empty(self, columns):
+        return self._to_frame(self.dataset.schema.empty_table().select(columns))
+
+    def _to_frame(self, table):
+        lines = table.to_pandas()
+        for col in CATEGORICAL_COLS:
+            if col in lines:
+                lines[col] = lines[col].astype(self.dtypes.get(col, 'category'))
+        return lines
+
+    def read_month(self, month, columns, expression=None):  # One partition's rows matching expression, as a table
+        month_filter = ds.field('month') == month
+        return self.dataset.to_table(columns=columns, filter=month_filter if expression is None else expression & month_filter)
+
+    def count_month(self, month, expression=None):
+        month_filter = ds.field('month') == month
+        return self.dataset.count_rows(filter=month_filter if expression is None else expression & month_filter)
+
+    def month_frame(self, month, columns, expression=None):
+        table = self.read_month(month, columns, expression)
+        return self._to_frame(table) if table.num_rows else self._empty(columns)
+
+    def scan(self, sales_filter, columns=AGGREGATE_COLUMNS, batch_rows=SCAN_BATCH_ROWS):
+        # Matching rows in frames of whole consecutive months, about batch_rows
+        # each, so no order is ever split between two frames
+        expression = filter_expression(sales_filter)
+        tables, rows = [], 0
+        for month in self.months:
+            table = self.read_month(month, columns, expression)
+            if table.num_rows:
+                tables.append(table)
+                rows += table.num_rows
+            if rows >= batch_rows:
+                yield self._to_frame(pa.concat_tables(tables))
+                tables, rows = [], 0
+        if rows:
+            yield self._to_frame(pa.concat_tables(tables))
+
+    def query(self, sales_filter):  # (cells, order stats) merged from per-month partial aggregates
+        # Each batch's orders are reduced to their stats straight away, so no
+        # more than one batch of orders is held at a time
+        cells, stats = [], []
+        for lines in self.scan(sales_filter):
+            cells.append(build_cells(lines))
+            stats.append(build_order_stats(build_order_facts(lines)))
+        if not cells:
+            lines = self._empty(AGGREGATE_COLUMNS)
+            cells, stats = [build_cells(lines)], [build_order_stats(build_order_facts(lines))]
+        return merge_cells(pd.concat(cells, ignore_index=True)), merge_order_stats(stats)
+
+
+class PartitionStore:  # Keeps the partitions in step with the source CSV, like SalesStore
+    def __init__(self, path=SALES_CSV, root=PARTITIONS_DIR):
+        self.path = path
+        self.root = root
+        self._lock = threading.Lock()
+        self._reload()
+
+    def _reload(self):
+        import fcntl
+        self.version = source_version(self.path)
+        # One directory per source version, shared by every process
+        out_dir = os.path.join(self.root, '{}-{}'.format(*self.version))
+        with writer_lock(self.root):
+            if not os.path.exists(os.path.join(out_dir, '_catalog.json')):
+                logger.info('Writing month partitions of %s to %s', self.path, out_dir)
+                tmp_dir = tempfile.mkdtemp(suffix='.tmp', dir=self.root)
+                write_partitions(self.path, tmp_dir)
+                os.replace(tmp_dir, out_dir)
+            # Opened under the lock, so the sweep below in another process sees it in use
+            self._partitions = SalesPartitions(out_dir)
+            for name in os.listdir(self.root):
+                stale = os.path.join(self.root, name)
+                if stale == out_dir or name.endswith('.tmp') or not os.path.isdir(stale):
+                    continue
+                with open(os.path.join(stale, '.lock'), 'a') as f:
+                    try:
+                        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        # Still open for scans, in this process or another
+                        continue
+                    shutil.rmtree(stale, ignore_errors=True)
+
+    def partitions(self):
+        return self._partitions
+
+    def refresh_if_changed(self):
+        if source_version(self.path) != self.version:
+            with self._lock:
+                if source_version(self.path) != self.version:
+                    logger.info('%s changed on disk, rewriting partitions', self.path)
+                    self._reload()
+        return self
+
+
+@st.cache_resource(show_spinner='Preparing sales partitions...')
+def _load_partition_store(path, root):
+    return PartitionStore(path, root)
+
+
+def load_sales_partitions(path=SALES_CSV, root=PARTITIONS_DIR):  # One consistent view of the on-disk history
+    return _load_partition_store(path, root).refresh_if_changed().partitions()
@@ -0,0 +1,285 @@
+# Static Sales Dashboard reports, one bundle per Sales Rep and per top
+# customer, rendered headless across a process pool. Run from the repo root:
+#
+#   python -m utils.sales_reports --out reports/2025-06-27 --workers 4
+#   python -m utils.sales_reports --formats html png --top-customers 10 --start 2024-01-01
+#
+# Each bundle is a directory holding index.html (every tab's metrics with its
+# charts), the charts as PNGs and report.pdf, built from the same summaries
+# and chart drawers as views/portfolio2.py. A JSON run report with throughput
+# and per-worker memory goes to stdout or --stats. The Streamlit-backed
+# modules are imported inside the functions that use them, so the command
+# line and each pool worker can quiet their runtime warnings first.
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+import argparse
+import html
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+from utils.formatting import format_large_number
+from utils.profiling import current_rss
+from utils.sales_data import SALES_CSV
+
+REPORTS_DIR = r'./reports'
+REPORT_FORMATS = ('html', 'png', 'pdf')
+TOP_CUSTOMERS = 25  # Customers that get their own report
+CUSTOMERS_SHOWN = 10  # Customers on each report's Customers tab, the dashboard's default
+
+# One dashboard tab as it appears in a report
+ReportSection = namedtuple('ReportSection', ['tab', 'title', 'metrics', 'charts', 'notes'])
+# A chart as show_chart would draw it: drawer, positional and keyword arguments, figure size
+ReportChart = namedtuple('ReportChart', ['name', 'draw', 'args', 'kwargs', 'figsize'])
+ReportEntity = namedtuple('ReportEntity', ['kind', 'name', 'sales_filter'])
+
+
+def slug(name):  # Safe directory name for an entity
+    return re.sub(r'[^\w.-]+', '_', str(name)).strip('_') or 'unnamed'
+
+
+# --- Report Content ---
+def query_snapshot(snapshot, sales_filter):  # (cells, order stats) from a SalesSnapshot or SalesPartitions
+    from utils.sales_aggregates import build_order_facts, build_order_stats
+    from utils.sales_store import SalesSnapshot
+    if isinstance(snapshot, SalesSnapshot):
+        return snapshot.cells(sales_filter), build_order_stats(build_order_facts(snapshot.lines(sales_filter)))
+    return snapshot.query(sales_filter)
+
+
+def report_sections(cells, order_stats, n=CUSTOMERS_SHOWN):  # Every dashboard tab with the metrics and charts the page shows
+    from utils.charts import (draw_customer_orders, draw_customer_sales, draw_product_mix, draw_sales_by_rep,
+                              draw_sales_trend, draw_turnaround)
+    from utils.sales_aggregates import (summarize_customers, summarize_products, summarize_sales_reps,
+                                        summarize_sales_trends, summarize_turnaround)
+    sections = []
+
+    trends = summarize_sales_trends(cells)
+    charts, notes = [], []
+    if trends.error:
+        notes.append(trends.error)
+    else:
+        periods = trends.sales_by_period
+        charts.append(ReportChart('sales_trend', draw_sales_trend,
+                                  (periods[trends.period_col], periods['Line Item Total ($)'], trends.trend_line), {}, (8, 4)))
+    sections.append(ReportSection('trends', 'Sales Trends', [('Total Sales', f"${format_large_number(trends.total_sales)}")], charts, notes))
+
+    reps = summarize_sales_reps(cells, order_stats)
+    sections.append(ReportSection('reps', 'Sales Reps', [
+        ('Top Selling Rep', str(reps.top_rep)),
+        ('Total Sales', f"${format_large_number(reps.total_sales)}"),
+        ('Average Monthly Sales', f"${format_large_number(reps.avg_monthly_sales)}"),
+        ('Biggest Sale', f"${format_large_number(reps.biggest_sale)}"),
+    ], [ReportChart('sales_by_rep', draw_sales_by_rep, (reps.sales_by_rep.index, reps.sales_by_rep), {}, (10, 6))], []))
+
+    products = summarize_products(cells)
+    sections.append(ReportSection('products', 'Product Analysis', [
+        ('Total Sales', f"${format_large_number(products.total_sales)}"),
+        ('Top Product Category by Sales', f"{products.top_category} (${format_large_number(products.top_category_sales)})"),
+        ('Top Product Line by Sales', f"{products.top_line} (${format_large_number(products.top_line_sales)})"),
+        ('Number of Product Categories', format_large_number(products.num_categories)),
+        ('Number of Product Lines', format_large_number(products.num_lines)),
+        ('Average Sales per Product Line', f"${format_large_number(products.avg_sales_per_line)}"),
+    ], [ReportChart('product_mix', draw_product_mix, (products.sales_pivot,), {}, (10, 6))], []))
+
+    customers = summarize_customers(cells, order_stats, n)
+    top_customer = customers.loc[customers['total_sales'].idxmax()]
+    sections.append(ReportSection('customers', 'Customers', [
+        ('Top Customer by Total Sales', str(top_customer['Customer'])),
+        ('Total Sales', '$' + format_large_number(top_customer['total_sales'])),
+        ('Average Order Value', '$' + format_large_number(top_customer['avg_order_value'])),
+        ('Biggest Order', '$' + format_large_number(top_customer['biggest_order'])),
+    ], [
+        ReportChart('customer_sales', draw_customer_sales, (customers['Customer'], customers['total_sales']), {}, (10, 6)),
+        ReportChart('customer_orders', draw_customer_orders, (customers['Customer'], customers['order_count']), {}, (10, 6)),
+    ], []))
+
+    turnaround = summarize_turnaround(order_stats)
+    charts, notes = [], []
+    if turnaround.tat_counts.sum() > 1:
+        tat = turnaround.tat_counts
+        charts.append(ReportChart('turnaround', draw_turnaround, (tat.index.to_series(),), {'weights': tat.to_numpy()}, (10, 6)))
+    else:
+        notes.append('Not enough data to generate a histogram.')
+    sections.append(ReportSection('turnaround', 'Turnaround Time', [('Avg Turnaround Time', f'{turnaround.avg_tat:.0f} days')], charts, notes))
+    return sections
+
+
+def describe_filter(sales_filter):
+    parts = [f'{label}: {", ".join(map(str, values))}'
+             for label, values in zip(['Sales Rep', 'Product Category', 'Product Line', 'Customer'], sales_filter[:4]) if values]
+    return '; '.join(parts + [f'{sales_filter.start_date} to {sales_filter.end_date}'])
+
+
+# --- Bundle Writers ---
+def write_html(path, title, subtitle, sections, images):
+    body = [f'<h1>{html.escape(title)}</h1>', f'<p>{html.escape(subtitle)}</p>']
+    for section in sections:
+        body.append(f'<h2>{html.escape(section.title)}</h2><table>')
+        body += [f'<tr><th>{html.escape(label)}</th><td>{html.escape(value)}</td></tr>' for label, value in section.metrics]
+        body.append('</table>')
+        body += [f'<p><em>{html.escape(note)}</em></p>' for note in section.notes]
+        body += [f'<img src="{images[chart.name]}" alt="{html.escape(chart.name)}">' for chart in section.charts if chart.name in images]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<!DOCTYPE html>\n<html><head><meta charset="utf-8">'
+                f'<title>{html.escape(title)}</title>'
+                '<style>body{font-family:sans-serif;max-width:960px;margin:auto}img{max-width:100%}'
+                'th{text-align:left;padding-right:2em}</style></head><body>\n')
+        f.write('\n'.join(body))
+        f.write('\n</body></html>\n')
+
+
+def write_pdf(path, title, subtitle, sections):  # A summary page of every metric, then one page per chart
+    from matplotlib.backends.backend_pdf import PdfPages
+    from matplotlib.figure import Figure
+    lines = [subtitle, '']
+    for section in sections:
+        lines += [section.title] + [f'    {label}: {value}' for label, value in section.metrics] + [f'    {note}' for note in section.notes] + ['']
+    with PdfPages(path) as pdf:
+        page = Figure(figsize=(8.5, 11))
+        page.text(0.08, 0.95, title, fontsize=16, va='top')
+        page.text(0.08, 0.91, '\n'.join(lines), fontsize=9, va='top', family='monospace')
+        pdf.savefig(page)
+        for section in sections:
+            for chart in section.charts:
+                fig = Figure(figsize=chart.figsize)
+                chart.draw(fig.subplots(), *chart.args, **chart.kwargs)
+                fig.suptitle(section.title)
+                pdf.savefig(fig, bbox_inches='tight')
+
+
+def write_bundle(out_dir, entity, sections, formats=REPORT_FORMATS):  # Files written, relative to out_dir
+    from utils.charts import render_figure
+    os.makedirs(out_dir, exist_ok=True)
+    title = f'{entity.kind.title()}: {entity.name}'
+    subtitle = describe_filter(entity.sales_filter)
+    files, images = [], {}
+    if 'png' in formats or 'html' in formats:
+        # The HTML links the PNGs, so it needs them written either way
+        for section in sections:
+            for chart in section.charts:
+                images[chart.name] = f'{chart.name}.png'
+                with open(os.path.join(out_dir, images[chart.name]), 'wb') as f:
+                    f.write(render_figure(chart.draw, *chart.args, figsize=chart.figsize, **chart.kwargs))
+        files += list(images.values())
+    if 'html' in formats:
+        write_html(os.path.join(out_dir, 'index.html'), title, subtitle, sections, images)
+        files.append('index.html')
+    if 'pdf' in formats:
+        write_pdf(os.path.join(out_dir, 'report.pdf'), title, subtitle, sections)
+        files.append('report.pdf')
+    return files
+
+
+# --- Batch ---
+def load_snapshot(path=SALES_CSV):  # The data as the dashboard would see it in this process
+    from utils.sales_partitions import OUT_OF_CORE, load_sales_partitions
+    from utils.sales_store import load_sales_store
+    return load_sales_partitions(path) if OUT_OF_CORE else load_sales_store(path).snapshot()
+
+
+def report_entities(snapshot, start_date=None, end_date=None, top_customers=TOP_CUSTOMERS):
+    # Every Sales Rep, then the top customers by sales over the same dates
+    from utils.sales_aggregates import data_range, summarize_customers
+    from utils.sales_index import SalesFilter, canonical_filter
+    first, last = data_range(snapshot)
+    everything = canonical_filter(SalesFilter((), (), (), (), start_date, end_date), first, last)
+    cells, order_stats = query_snapshot(snapshot, everything)
+    reps = sorted(cells['Sales Rep'].unique())
+    customers = summarize_customers(cells, order_stats, top_customers)['Customer'] if top_customers else []
+    entities = [ReportEntity('rep', rep, everything._replace(reps=(rep,))) for rep in reps]
+    entities += [ReportEntity('customer', customer, everything._replace(cust=(customer,))) for customer in customers]
+    return entities
+
+
+def quiet_streamlit():  # Headless, so the missing runtime and session warnings are noise
+    import streamlit.logger
+    from streamlit import config
+    # Parsing the config resets the log level, so make sure that has happened first
+    config.get_config_options()
+    streamlit.logger.set_log_level('error')
+
+
+_worker = {}
+
+
+def _init_worker(path):  # Each worker loads (or, with SALES_SHARED, attaches to) the data once
+    quiet_streamlit()
+    _worker['snapshot'] = load_snapshot(path)
+
+
+def render_report(entity, out_root, formats):  # Runs in a worker; one entity's bundle plus timing and memory
+    import resource
+    start = time.perf_counter()
+    cells, order_stats = query_snapshot(_worker['snapshot'], entity.sales_filter)
+    files = []
+    if len(cells):
+        out_dir = os.path.join(out_root, entity.kind, slug(entity.name))
+        files = write_bundle(out_dir, entity, report_sections(cells, order_stats), formats)
+    return {
+        'kind': entity.kind, 'name': str(entity.name), 'files': len(files), 'seconds': time.perf_counter() - start,
+        'pid': os.getpid(), 'rss_mb': current_rss() / 1e6,
+        # Peak resident memory, in KB on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 / 1e6,
+    }
+
+
+def render_reports(out_root=REPORTS_DIR, path=SALES_CSV, workers=None, formats=REPORT_FORMATS,
+                   start_date=None, end_date=None, top_customers=TOP_CUSTOMERS):  # Run report with throughput and per-worker memory
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    entities = report_entities(load_snapshot(path), start_date, end_date, top_customers)
+    context = multiprocessing.get_context('spawn')  # Never fork a process that may hold threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(path,)) as pool:
+        results = list(pool.map(render_report, entities, [out_root] * len(entities), [formats] * len(entities)))
+    seconds = time.perf_counter() - started
+    per_worker = {}
+    for result in results:
+        stats = per_worker.setdefault(result['pid'], {'reports': 0, 'seconds': 0.0, 'rss_mb': 0.0, 'peak_rss_mb': 0.0})
+        stats['reports'] += 1
+        stats['seconds'] += result['seconds']
+        stats['rss_mb'] = max(stats['rss_mb'], result['rss_mb'])
+        stats['peak_rss_mb'] = max(stats['peak_rss_mb'], result['peak_rss_mb'])
+    written = [result for result in results if result['files']]
+    return {
+        'out': out_root,
+        'workers': workers,
+        'reports': len(written),
+        'skipped': [f"{result['kind']}: {result['name']}" for result in results if not result['files']],
+        'files': sum(result['files'] for result in results),
+        'seconds': seconds,
+        'reports_per_second': len(written) / seconds if seconds else None,
+        'report_seconds_median': sorted(result['seconds'] for result in results)[len(results) // 2] if results else None,
+        'per_worker': list(per_worker.values()),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render static Sales Dashboard reports per rep and per top customer.')
+    parser.add_argument('--out', default=REPORTS_DIR, help='directory the bundles are written under')
+    parser.add_argument('--csv', default=SALES_CSV, help='salesDF-shaped source CSV')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--formats', nargs='+', choices=REPORT_FORMATS, default=list(REPORT_FORMATS))
+    parser.add_argument('--top-customers', type=int, default=TOP_CUSTOMERS, help='customers that get their own report')
+    parser.add_argument('--start', type=date.fromisoformat, help='first day, the start of the data if omitted')
+    parser.add_argument('--end', type=date.fromisoformat, help='last day, the end of the data if omitted')
+    parser.add_argument('--stats', help='JSON run report path, stdout if omitted')
+    args = parser.parse_args(argv)
+    quiet_streamlit()
+    report = render_reports(args.out, args.csv, args.workers, tuple(args.formats), args.start, args.end, args.top_customers)
+    output = json.dumps(report, indent=2)
+    if args.stats:
+        with open(args.stats, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    print(f"{report['reports']} reports in {report['seconds']:.1f} s "
+          f"({report['reports_per_second'] or 0:.2f}/s) with {report['workers']} workers", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+from contextlib import contextmanager
+from functools import cached_property
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+from utils.sales_cube import SalesCube
+from utils.sales_data import SALES_CSV, append_raw_csv, concat_pieces, load_sales_frame, source_version
+from utils.sales_index import DimensionIndex, SalesIndex
+from utils.sales_store import SalesSegment, SalesSnapshot, SalesStore, build_segment, merge_segments
+
+logger = logging.getLogger(__name__)
+
+# Multi-process mode: the cleaned sales frame, its dimension indexes and the
+# cube's cells are published once as .npy files, and every server process
+# memory-maps the same pages read-only instead of holding its own copy. Each
+# publication is a generation directory of segments; CURRENT names the live
+# one and is replaced atomically, so a refresh reaches every worker at its
+# next rerun. An appended batch is a new segment; the generation publishing
+# it hard-links the segments before it instead of writing them again.
+# Set SALES_SHARED=1 to serve the Sales Dashboard this way (POSIX only).
+SHARED_DATA = bool(os.environ.get('SALES_SHARED'))
+SHARED_DIR = r'./assets/sales_shared'
+KEEP_GENERATIONS = 2  # The live generation and the one before, for reruns still reading it
+# Columns with about one category per order. As categories they would be a
+# string per order in every worker, so they are published as positions in one
+# mapped array of values instead, and only the rows a page shows are decoded.
+CODED_COLUMNS = ['Order #']
+LAYOUT_VERSION = 3  # Bump when the files of a generation change; older generations are republished
+
+
+def write_json(path, data):  # Replace atomically so a reader never sees half a file
+    with open(path + '.tmp', 'w') as f:
+        json.dump(data, f)
+    os.replace(path + '.tmp', path)
+
+
+@contextmanager
+def publish_lock(root):  # One publisher at a time across every process sharing root
+    import fcntl
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, '.lock'), 'w') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+# --- Columns ---
+def write_frame(out_dir, prefix, frame):  # One .npy file per column; returns what read_frame needs to rebuild it
+    columns = []
+    for i, (name, values) in enumerate(frame.items()):
+        spec = {'name': name, 'file': f'{prefix}-{i}.npy'}
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Codes and categories both go to mapped files, never into the metadata
+            spec.update(kind='coded' if name in CODED_COLUMNS else 'category', categories=f'{prefix}-{i}-categories.npy',
+                        ordered=values.cat.ordered)
+            np.save(os.path.join(out_dir, spec['categories']), np.array(values.cat.categories, dtype=str), allow_pickle=False)
+            data = values.cat.codes.to_numpy()
+        elif isinstance(values.dtype, pd.PeriodDtype):
+            spec.update(kind='period', dtype=str(values.dtype))
+            data = values.array.asi8
+        else:
+            spec.update(kind='array')
+            data = values.to_numpy()
+        np.save(os.path.join(out_dir, spec['file']), data, allow_pickle=False)
+        columns.append(spec)
+    return columns
+
+
+def read_frame(in_dir, columns):  # Frame over the mapped column files, nothing copied
+    data = {}
+    for spec in columns:
+        values = np.load(os.path.join(in_dir, spec['file']), mmap_mode='r')
+        if spec['kind'] == 'category':
+            # About as many categories as a filter dimension has values, so these are loaded
+            categories = np.load(os.path.join(in_dir, spec['categories']), mmap_mode='r').tolist()
+            values = pd.Categorical.from_codes(values, dtype=pd.CategoricalDtype(categories, spec['ordered']), validate=False)
+        elif spec['kind'] == 'coded':
+            # The categories are positions in the mapped values (values_of); a range of them takes no memory
+            positions = pd.RangeIndex(len(values_of(in_dir, spec)))
+            values = pd.Categorical.from_codes(values, dtype=pd.CategoricalDtype(positions, spec['ordered']), validate=False)
+        elif spec['kind'] == 'period':
+            values = pd.arrays.PeriodArray(values, dtype=pd.api.types.pandas_dtype(spec['dtype']))
+        data[spec['name']] = pd.Series(values, copy=False)
+    # One block per column; consolidating same-typed columns would copy them out of the mapping
+    return pd.DataFrame(data, copy=False)
+
+
+def values_of(in_dir, spec):  # The mapped values a coded column's positions point into
+    return np.load(os.path.join(in_dir, spec['categories']), mmap_mode='r')
+
+
+def decoded(frame, order_ids):  # frame with its coded 'Order #' as a categorical of the IDs it holds, as when loaded from the CSV
+    frame = frame.copy(deep=False)
+    positions = frame['Order #'].cat.codes.to_numpy()
+    # order_ids is sorted, so the categories are too
+    used = np.unique(positions[positions >= 0])
+    codes = np.where(positions >= 0, np.searchsorted(used, positions), -1)
+    frame['Order #'] = pd.Categorical.from_codes(codes, categories=order_ids[used].tolist(), validate=False)
+    return frame
+
+
+class MappedDimensionIndex(DimensionIndex):
+    # A published DimensionIndex: its values, and their sort order, are mapped
+    # arrays, and a value's code is found by binary search rather than a dict
+    def code(self, value):
+        i = np.searchsorted(self.values, value, sorter=self.sorter)
+        if i < len(self.values) and self.values[self.sorter[i]] == value:
+            return int(self.sorter[i])
+        return None
+
+    @cached_property
+    def lookup(self):
+        return {value: code for code, value in enumerate(self.values.tolist())}
+
+    def extended(self, column):  # Only the publishing worker appends; it extends a plain in-memory copy
+        plain = DimensionIndex.__new__(DimensionIndex)
+        plain.size, plain.values, plain.lookup = self.size, self.values.tolist(), self.lookup
+        plain.postings, plain.offsets = self.postings, self.offsets
+        return plain.extended(column)
+
+
+def write_index(out_dir, index):
+    spec = {'size': index.size, 'dims': {}}
+    for i, (name, dim) in enumerate(index.dims.items()):
+        values = np.array(dim.values, dtype=str)
+        np.save(os.path.join(out_dir, f'values-{i}.npy'), values, allow_pickle=False)
+        np.save(os.path.join(out_dir, f'sorter-{i}.npy'), np.argsort(values, kind='stable'))
+        np.save(os.path.join(out_dir, f'postings-{i}.npy'), dim.postings)
+        np.save(os.path.join(out_dir, f'offsets-{i}.npy'), dim.offsets)
+        spec['dims'][name] = {'values': f'values-{i}.npy', 'sorter': f'sorter-{i}.npy',
+                              'postings': f'postings-{i}.npy', 'offsets': f'offsets-{i}.npy'}
+    np.save(os.path.join(out_dir, 'date_order.npy'), index.date_order)
+    np.save(os.path.join(out_dir, 'sorted_dates.npy'), index.sorted_dates)
+    return spec
+
+
+def read_index(in_dir, spec):
+    def mapped(file):
+        return np.load(os.path.join(in_dir, file), mmap_mode='r')
+
+    index = SalesIndex.__new__(SalesIndex)
+    index.size = spec['size']
+    index.dims = {}
+    for name, dim_spec in spec['dims'].items():
+        dim = MappedDimensionIndex.__new__(MappedDimensionIndex)
+        dim.size = spec['size']
+        dim.values = mapped(dim_spec['values'])
+        dim.sorter = mapped(dim_spec['sorter'])
+        dim.postings = mapped(dim_spec['postings'])
+        dim.offsets = mapped(dim_spec['offsets'])
+        index.dims[name] = dim
+    index.date_order = mapped('date_order.npy')
+    index.sorted_dates = mapped('sorted_dates.npy')
+    return index
+
+
+# --- Generations ---
+class SharedSnapshot(SalesSnapshot):
+    # A published generation. Each segment codes 'Order #' against its own
+    # mapped IDs (segment_order_ids); with a single segment the explorer
+    # decodes only the rows it shows, otherwise lines() decodes the filtered
+    # rows so the segments' IDs combine. published pairs each segment's
+    # directory with its meta.json entry, for the next generation to link.
+    def __init__(self, segments, generation, segment_order_ids, published):
+        super().__init__(segments, generation, segment_order_ids[0] if len(segment_order_ids) == 1 else None)
+        self.segment_order_ids = segment_order_ids
+        self.published = published
+
+    def lines(self, sales_filter):
+        if len(self.segments) == 1:
+            return super().lines(sales_filter)
+        return concat_pieces([decoded(segment.sales_df.take(segment.index.positions(sales_filter)), order_ids)
+                              for segment, order_ids in zip(self.segments, self.segment_order_ids)])
+
+    def compacted(self):
+        return SalesSnapshot([merged_segment(self)], self.generation)
+
+
+def merged_segment(snapshot):  # One in-memory segment with every row of a shared snapshot, Order # decoded
+    return merge_segments([SalesSegment(decoded(segment.sales_df, order_ids), segment.index, segment.cube)
+                           for segment, order_ids in zip(snapshot.segments, snapshot.segment_order_ids)])
+
+
+def stage(root, segment):  # Write a segment outside any generation; (directory, meta.json entry) for publish to link
+    seg_dir = tempfile.mkdtemp(prefix='segment-', dir=root)
+    entry = {
+        'name': os.path.basename(seg_dir),
+        'rows': len(segment.sales_df),
+        'sales': write_frame(seg_dir, 'sales', segment.sales_df),
+        'index': write_index(seg_dir, segment.index),
+        'cells': write_frame(seg_dir, 'cells', segment.cube.cells),
+    }
+    return seg_dir, entry
+
+
+def publish(root, segments, version):  # Link staged or published segments into a new generation and make it the live one
+    name = f'{time.time_ns():020d}'  # Sorts by age
+    out_dir = os.path.join(root, name)
+    os.makedirs(out_dir + '.tmp')
+    for seg_dir, entry in segments:
+        # Links, not copies: a segment is written once, however many generations hold it
+        os.makedirs(os.path.join(out_dir + '.tmp', entry['name']))
+        for file in os.listdir(seg_dir):
+            os.link(os.path.join(seg_dir, file), os.path.join(out_dir + '.tmp', entry['name'], file))
+    meta = {
+        'layout_version': LAYOUT_VERSION,
+        'source_version': list(version),
+        'rows': sum(entry['rows'] for _, entry in segments),
+        'segments': [entry for _, entry in segments],
+    }
+    write_json(os.path.join(out_dir + '.tmp', 'meta.json'), meta)
+    os.replace(out_dir + '.tmp', out_dir)
+    write_json(os.path.join(root, 'CURRENT'), {'name': name})
+    # Workers still mapping a removed generation keep their pages until they move on
+    older = sorted(entry for entry in os.listdir(root) if entry[0].isdigit() and entry != name)
+    for stale in older[:max(0, len(older) - KEEP_GENERATIONS + 1)]:
+        shutil.rmtree(os.path.join(root, stale), ignore_errors=True)
+    logger.info('Published %d sales rows in %d segments as generation %s', meta['rows'], len(segments), name)
+    return name
+
+
+def publish_staged(root, published, segment, version):  # Publish the published segments followed by segment, a new one
+    seg_dir, entry = stage(root, segment)
+    try:
+        return publish(root, list(published) + [(seg_dir, entry)], version)
+    finally:
+        shutil.rmtree(seg_dir, ignore_errors=True)
+
+
+def attach(root, name):  # (snapshot, source version) of a published generation, memory-mapped read-only
+    in_dir = os.path.join(root, name)
+    with open(os.path.join(in_dir, 'meta.json')) as f:
+        meta = json.load(f)
+    segments, segment_order_ids, published = [], [], []
+    for entry in meta['segments']:
+        seg_dir = os.path.join(in_dir, entry['name'])
+        sales_df = read_frame(seg_dir, entry['sales'])
+        index = read_index(seg_dir, entry['index'])
+        cube = SalesCube.__new__(SalesCube)
+        cube.sales_df, cube.index, cube.cells = sales_df, index, read_frame(seg_dir, entry['cells'])
+        segments.append(SalesSegment(sales_df, index, cube))
+        order_ids, = (values_of(seg_dir, spec) for spec in entry['sales'] if spec['name'] == 'Order #')
+        segment_order_ids.append(order_ids)
+        published.append((seg_dir, entry))
+    # The same generation in every worker, so their result keys agree
+    return SharedSnapshot(segments, ('shared', name), segment_order_ids, published), tuple(meta['source_version'])
+
+
+class SharedSalesStore(SalesStore):
+    # SalesStore over the published generation. The first process to find no
+    # generation for the current CSV loads and publishes one while the others
+    # wait on the lock, then all of them attach. An append publishes the batch
+    # as one more segment, so every worker picks it up; as in SalesStore, a
+    # background thread later merges the segments, and publishes the result.
+    def __init__(self, path=SALES_CSV, root=SHARED_DIR):
+        self.root = root
+        self.current_path = os.path.join(root, 'CURRENT')
+        super().__init__(path)
+
+    def _reload(self):
+        version = source_version(self.path)
+        with publish_lock(self.root):
+            if not os.path.exists(self.current_path) or self._published_version() != version:
+                logger.info('Publishing sales data from %s to %s', self.path, self.root)
+                publish_staged(self.root, [], build_segment(load_sales_frame(self.path)), version)
+            self._attach()
+
+    def _published_version(self):  # Source version of the live generation, None if it has an older layout
+        with open(self.current_path) as f:
+            name = json.load(f)['name']
+        with open(os.path.join(self.root, name, 'meta.json')) as f:
+            meta = json.load(f)
+        return tuple(meta['source_version']) if meta.get('layout_version') == LAYOUT_VERSION else None
+
+    def _attach(self):  # Switch to the live generation; called holding the publish lock
+        self.current_version = source_version(self.current_path)
+        with open(self.current_path) as f:
+            name = json.load(f)['name']
+        self._snapshot, self.version = attach(self.root, name)
+
+    def _stale(self):  # The CSV was rewritten, or another worker published a generation
+        return source_version(self.path) != self.version or source_version(self.current_path) != self.current_version
+
+    def refresh_if_changed(self):
+        if self._stale():
+            with self._lock:
+                if self._stale():
+                    logger.info('Sales data changed, attaching to the live generation')
+                    self._reload()
+        return self
+
+    def _append(self, raw, lines, persist):
+        if lines.empty:
+            return self._snapshot
+        with publish_lock(self.root):
+            if source_version(self.current_path) != self.current_version:
+                # Build on whatever another worker published since
+                self._attach()
+            if persist:
+                append_raw_csv(self.path, raw)
+                # Our own write; the generation records it, so no worker reloads for it
+                self.version = source_version(self.path)
+            publish_staged(self.root, self._snapshot.published, build_segment(lines), self.version)
+            self._attach()
+        logger.info('Appended %d sales rows (%d total, %d segments)', len(lines), self._snapshot.rows, len(self._snapshot.segments))
+        self._schedule_compaction()
+        return self._snapshot
+
+    def _compact(self, snapshot):
+        # Merge and write the merged segment outside both locks, then publish
+        # it followed by any batch published meanwhile, by this worker or another
+        try:
+            staged = stage(self.root, merged_segment(snapshot))
+        except Exception:
+            logger.exception('Compacting sales segments failed')
+            staged = None
+        try:
+            with self._lock:
+                self._compacting = None
+                if staged is None:
+                    return
+                names = [entry['name'] for _, entry in snapshot.published]
+                with publish_lock(self.root):
+                    if source_version(self.current_path) != self.current_version:
+                        self._attach()
+                    current, n = self._snapshot, len(names)
+                    # A reload since then replaced the segments, and the merge with them
+                    if [entry['name'] for _, entry in current.published[:n]] != names:
+                        return
+                    publish(self.root, [staged] + list(current.published[n:]), self.version)
+                    self._attach()
+                logger.info('Compacted %d sales segments (%d rows)', n, staged[1]['rows'])
+                self._schedule_compaction()
+        finally:
+            if staged is not None:
+                shutil.rmtree(staged[0], ignore_errors=True)
@@ -0,0 +1,171 @@
+from collections import namedtuple
+from functools import cached_property
+import itertools
+import logging
+import threading
+import pandas as pd
+import streamlit as st
+
+from utils.sales_cube import SalesCube
+from utils.sales_data import (SALES_CSV, append_raw_csv, concat_pieces, load_sales_frame, read_sales_batch, source_version,
+                              union_categories)
+from utils.sales_index import FILTER_DIMENSIONS, SalesIndex
+
+logger = logging.getLogger(__name__)
+
+# Appended batches stay segments of their own until there are more than
+# COMPACT_SEGMENTS of them or they hold COMPACT_FRACTION of the history's
+# rows; then a background thread merges them into the history.
+COMPACT_SEGMENTS = 8
+COMPACT_FRACTION = 0.25
+
+# One immutable frame with the index and cube over its rows
+SalesSegment = namedtuple('SalesSegment', ['sales_df', 'index', 'cube'])
+
+# Unique across reloads, appends and compactions, so result caches can key on it
+_generations = itertools.count(1)
+
+
+def build_segment(sales_df):
+    index = SalesIndex(sales_df)
+    return SalesSegment(sales_df, index, SalesCube(sales_df, index))
+
+
+def merge_segments(segments):  # One segment with every row of segments, in order
+    base, batches = segments[0], segments[1:]
+    if not batches:
+        return base
+    batch = concat_pieces([segment.sales_df for segment in batches])
+    sales_df, batch = union_categories([base.sales_df, batch])
+    sales_df = pd.concat([sales_df, batch], ignore_index=True)
+    index = base.index.extended(batch)
+    return SalesSegment(sales_df, index, base.cube.extended(sales_df, index, batch))
+
+
+class SalesSnapshot:
+    # Everything a page needs to answer queries against one consistent
+    # version of the data: the history and the batches appended since, each a
+    # segment. Queries run per segment and combine the filtered results.
+    # order_ids is set when 'Order #' holds positions in that array of IDs
+    # rather than the IDs themselves (see sales_shared).
+    def __init__(self, segments, generation, order_ids=None):
+        self.segments = tuple(segments)
+        self.generation = generation
+        self.order_ids = order_ids
+
+    @property
+    def rows(self):
+        return sum(len(segment.sales_df) for segment in self.segments)
+
+    def lines(self, sales_filter):  # The filtered line items
+        pieces = [segment.sales_df.take(segment.index.positions(sales_filter)) for segment in self.segments]
+        return pieces[0] if len(pieces) == 1 else concat_pieces(pieces)
+
+    def cells(self, sales_filter):  # Cube cells for the filter, same columns as build_cells
+        pieces = [segment.cube.query(sales_filter) for segment in self.segments]
+        return pieces[0] if len(pieces) == 1 else concat_pieces(pieces, FILTER_DIMENSIONS)
+
+    @cached_property
+    def options(self):  # Filter choices per dimension in order of first appearance, like Series.unique()
+        return {name: list(dict.fromkeys(itertools.chain.from_iterable(segment.sales_df[name].unique() for segment in self.segments)))
+                for name in FILTER_DIMENSIONS}
+
+    @cached_property
+    def min_date(self):
+        dates = [segment.index.sorted_dates[0] for segment in self.segments if segment.index.size]
+        return pd.Timestamp(min(dates)) if dates else None
+
+    @cached_property
+    def max_date(self):
+        dates = [segment.index.sorted_dates[-1] for segment in self.segments if segment.index.size]
+        return pd.Timestamp(max(dates)) if dates else None
+
+    def compacted(self):  # Same rows and generation as a single segment
+        return SalesSnapshot([merge_segments(self.segments)], self.generation)
+
+
+class SalesStore:
+    # The cleaned sales data with its indexes and cubes. An append adds the
+    # batch as a new segment and swaps in a snapshot holding it, so readers
+    # never block, never see a half-applied batch, and the cost of an append
+    # follows the size of the batch rather than of the history.
+    def __init__(self, path=SALES_CSV):
+        self.path = path
+        self._lock = threading.Lock()
+        self._compacting = None
+        self._reload()
+
+    def _reload(self):
+        self.version = source_version(self.path)
+        self._snapshot = SalesSnapshot([build_segment(load_sales_frame(self.path))], next(_generations))
+
+    def snapshot(self):
+        return self._snapshot
+
+    def refresh_if_changed(self):  # Full reload only when someone else rewrote the source file
+        if source_version(self.path) != self.version:
+            with self._lock:
+                if source_version(self.path) != self.version:
+                    logger.info('%s changed on disk, reloading sales data', self.path)
+                    self._reload()
+        return self
+
+    def append(self, batch, persist=False):
+        # Clean a batch (DataFrame or CSV file/buffer of raw rows) and add it
+        # as a segment without reprocessing the existing history.
+        raw = batch if isinstance(batch, pd.DataFrame) else pd.read_csv(batch)
+        lines = read_sales_batch(raw)
+        with self._lock:
+            return self._append(raw, lines, persist)
+
+    def _append(self, raw, lines, persist):  # Called with the lock held
+        current = self._snapshot
+        if lines.empty:
+            return current
+        if persist:
+            append_raw_csv(self.path, raw)
+            # Our own write; keep it from triggering a full reload
+            self.version = source_version(self.path)
+        self._snapshot = SalesSnapshot(current.segments + (build_segment(lines),), next(_generations))
+        logger.info('Appended %d sales rows (%d total, %d segments)', len(lines), self._snapshot.rows, len(self._snapshot.segments))
+        self._schedule_compaction()
+        return self._snapshot
+
+    def _schedule_compaction(self):  # Called with the lock held
+        base, *batches = self._snapshot.segments
+        if self._compacting is not None or not batches:
+            return
+        if len(batches) > COMPACT_SEGMENTS or sum(len(batch.sales_df) for batch in batches) > COMPACT_FRACTION * len(base.sales_df):
+            self._compacting = threading.Thread(target=self._compact, args=(self._snapshot,), name='sales-compaction', daemon=True)
+            self._compacting.start()
+
+    def _compact(self, snapshot):
+        # Merge outside the lock; batches appended meanwhile stay segments after the merged one
+        try:
+            merged = merge_segments(snapshot.segments)
+        except Exception:
+            logger.exception('Compacting sales segments failed')
+            merged = None
+        with self._lock:
+            self._compacting = None
+            current, n = self._snapshot, len(snapshot.segments)
+            # A reload since then replaced the segments, and the merge with them
+            if merged is not None and len(current.segments) >= n and all(a is b for a, b in zip(current.segments, snapshot.segments)):
+                self._snapshot = SalesSnapshot((merged,) + current.segments[n:], next(_generations))
+                logger.info('Compacted %d sales segments (%d rows)', n, len(merged.sales_df))
+                self._schedule_compaction()
+
+
+@st.cache_resource(show_spinner='Loading sales data...')
+def _load_sales_store(path):
+    # sales_shared builds on this module, so it is imported here rather than at the top
+    from utils.sales_shared import SHARED_DATA, SharedSalesStore
+    return SharedSalesStore(path) if SHARED_DATA else SalesStore(path)
+
+
+def load_sales_store(path=SALES_CSV):  # One store per process, shared by every session
+    return _load_sales_store(path).refresh_if_changed()
+
+
+def ingest_sales(batch, path=SALES_CSV, persist=False):
+    return load_sales_store(path).append(batch, persist=persist)
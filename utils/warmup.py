@@ -0,0 +1,77 @@
+import importlib
+import logging
+import os
+import threading
+import time
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx
+
+logger = logging.getLogger(__name__)
+
+# Background warm-up after the first page is served: imports the heavy page
+# dependencies, loads the sales data and pre-computes the Sales Dashboard's
+# most likely views. Everything is imported lazily so main.py stays cheap to
+# import. Set WARM_UP=0 to turn it off.
+WARM_UP = os.environ.get('WARM_UP', '1') not in ('', '0')
+# Modules the project pages import, in roughly the order they are first needed
+WARM_MODULES = ['numpy', 'pandas', 'pyarrow', 'matplotlib.figure', 'utils.charts', 'utils.sales_aggregates',
+                'utils.sales_explorer', 'utils.groundwater_runner', 'utils.well_series']
+DEFAULT_TOP_CUSTOMERS = 10
+TABS = ['trends', 'reps', 'products', 'customers', 'turnaround']
+PREWARM_POPULAR = 20  # Most requested (filter, tab, n) keys computed after the default view
+
+
+def warm_requests(snapshot, popular):  # (filter, tab, n) to compute, default view first, no repeats
+    from utils.sales_aggregates import data_range
+    from utils.sales_index import SalesFilter, canonical_filter
+    # The Sales Dashboard as most visitors first see it: nothing selected, the full date range
+    default = canonical_filter(SalesFilter((), (), (), (), None, None), *data_range(snapshot))
+    requests = [(default, tab, DEFAULT_TOP_CUSTOMERS if tab == 'customers' else None) for tab in TABS]
+    for sales_filter, tab, n in popular:
+        request = canonical_filter(sales_filter, *data_range(snapshot)), tab, n
+        if request not in requests:
+            requests.append(request)
+    return requests
+
+
+def prewarm_sales():
+    # Fill the summary cache for the current data, on this thread
+    from utils.sales_aggregates import load_summary_cache, load_tab_summary
+    from utils.sales_partitions import OUT_OF_CORE, load_sales_partitions
+    from utils.sales_store import load_sales_store
+    start = time.perf_counter()
+    snapshot = load_sales_partitions() if OUT_OF_CORE else load_sales_store().snapshot()
+    try:
+        popular = load_summary_cache().popular(PREWARM_POPULAR)
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning('Could not read popular filters: %s', e)
+        popular = []
+    requests = warm_requests(snapshot, popular)
+    for sales_filter, tab, n in requests:
+        load_tab_summary(tab, sales_filter, snapshot, n=n, record=False)
+    logger.info('Pre-warmed %d dashboard summaries in %.1f s', len(requests), time.perf_counter() - start)
+
+
+def warm_up():
+    start = time.perf_counter()
+    for name in WARM_MODULES:
+        importlib.import_module(name)
+    logger.info('Imported page modules in %.1f s', time.perf_counter() - start)
+    prewarm_sales()
+
+
+def _warm_up_in_background():
+    try:
+        warm_up()
+    except Exception:
+        # Visitors still get everything, loaded on first request instead
+        logger.exception('Warm-up failed')
+
+
+@st.cache_resource
+def start_warmup():  # Once per server process, without holding up the page that triggers it
+    thread = threading.Thread(target=_warm_up_in_background, name='warm-up', daemon=True)
+    # The st.cache_* loaders it calls expect the context of a script run; it borrows the triggering one
+    add_script_run_ctx(thread)
+    thread.start()
+    return thread
@@ -0,0 +1,155 @@
+from collections import namedtuple
+import json
+import os
+import re
+import threading
+import numpy as np
+import streamlit as st
+
+from utils.downsample import lttb
+
+# Monitoring records, one partition per (well, analyte). Each partition is a
+# directory of column files: t.npy (datetime64[s], ascending) and v.npy
+# (float32) for the raw samples, plus per-bucket min/max/mean/time columns for
+# every aggregate level. catalog.json lists the partitions and is written last.
+MONITORING_DIR = r'./assets/monitoring'
+BUCKET_SIZES = (16, 256, 4096, 65536)  # Raw samples per bucket at each aggregate level
+MAX_POINTS = 1000  # Points per plotted window
+OVERSAMPLE = 4  # Buckets per output point fed to LTTB, so it still has shape to choose from
+
+# A plottable window: values at the kept times, with the min/max envelope of
+# every raw sample each point stands for. level 0 means the raw samples.
+SeriesWindow = namedtuple('SeriesWindow', ['times', 'values', 'lower', 'upper', 'raw_count', 'level'])
+
+
+def partition_name(well, analyte):  # Directory name for a partition
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', f'{well}__{analyte}')
+
+
+def bucket_aggregates(times, values, size):  # (time, min, max, mean) of consecutive runs of `size` samples
+    starts = np.arange(0, len(values), size)
+    counts = np.diff(np.append(starts, len(values)))
+    seconds = times.astype(np.int64)
+    return (
+        (np.add.reduceat(seconds - seconds[0], starts) // counts + seconds[0]).astype('datetime64[s]'),
+        np.minimum.reduceat(values, starts),
+        np.maximum.reduceat(values, starts),
+        (np.add.reduceat(values.astype(np.float64), starts) / counts).astype(np.float32),
+    )
+
+
+def save_column(path, data):  # Replaced, not rewritten in place, so open memory maps keep the old file
+    with open(path + '.tmp', 'wb') as f:
+        np.save(f, data)
+    os.replace(path + '.tmp', path)
+
+
+class WellSeriesWriter:
+    # Builds a store one partition at a time, so no more than one series is in
+    # memory. The catalog is replaced on close(); readers see the old store until then.
+    def __init__(self, root=MONITORING_DIR):
+        self.root = root
+        self.catalog = {}
+        os.makedirs(root, exist_ok=True)
+
+    def write(self, well, analyte, times, values, unit=''):
+        times = np.asarray(times, dtype='datetime64[s]')
+        values = np.asarray(values, dtype=np.float32)
+        keep = ~np.isnan(values)
+        order = np.argsort(times[keep], kind='stable')
+        times, values = times[keep][order], values[keep][order]
+        name = partition_name(well, analyte)
+        path = os.path.join(self.root, name)
+        os.makedirs(path, exist_ok=True)
+        save_column(os.path.join(path, 't.npy'), times)
+        save_column(os.path.join(path, 'v.npy'), values)
+        levels = [size for size in BUCKET_SIZES if size < len(values)]
+        for level, size in enumerate(levels, start=1):
+            for column, data in zip(('t', 'min', 'max', 'mean'), bucket_aggregates(times, values, size)):
+                save_column(os.path.join(path, f'l{level}_{column}.npy'), data)
+        self.catalog[name] = {'well': well, 'analyte': analyte, 'unit': unit, 'samples': len(values), 'levels': levels}
+
+    def close(self):
+        catalog_path = os.path.join(self.root, 'catalog.json')
+        with open(catalog_path + '.tmp', 'w') as f:
+            json.dump(self.catalog, f)
+        os.replace(catalog_path + '.tmp', catalog_path)
+
+
+class WellSeriesStore:
+    # Read side. Columns are memory-mapped on first use, so a query only pages
+    # in the slice of the level it reads, whatever the raw sample count.
+    def __init__(self, root=MONITORING_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._reload()
+
+    def _reload(self):
+        catalog_path = os.path.join(self.root, 'catalog.json')
+        stat = os.stat(catalog_path)
+        self.version = stat.st_mtime_ns, stat.st_size
+        with open(catalog_path) as f:
+            self.catalog = {(p['well'], p['analyte']): dict(p, name=name) for name, p in json.load(f).items()}
+        self._columns = {}
+
+    def refresh_if_changed(self):
+        stat = os.stat(os.path.join(self.root, 'catalog.json'))
+        if (stat.st_mtime_ns, stat.st_size) != self.version:
+            with self._lock:
+                self._reload()
+        return self
+
+    def wells(self):
+        return sorted({well for well, _ in self.catalog})
+
+    def analytes(self, well):
+        return sorted(analyte for w, analyte in self.catalog if w == well)
+
+    def unit(self, well, analyte):
+        return self.catalog[well, analyte]['unit']
+
+    def _column(self, well, analyte, column):
+        key = well, analyte, column
+        data = self._columns.get(key)
+        if data is None:
+            data = np.load(os.path.join(self.root, self.catalog[well, analyte]['name'], f'{column}.npy'), mmap_mode='r')
+            with self._lock:
+                self._columns[key] = data
+        return data
+
+    def span(self, well, analyte):  # First and last sample times
+        times = self._column(well, analyte, 't')
+        return times[0], times[-1]
+
+    def query(self, well, analyte, start=None, end=None, max_points=MAX_POINTS):
+        times = self._column(well, analyte, 't')
+        lo = 0 if start is None else np.searchsorted(times, np.datetime64(start, 's'), side='left')
+        hi = len(times) if end is None else np.searchsorted(times, np.datetime64(end, 's'), side='right')
+        raw_count = int(hi - lo)
+        if raw_count <= max_points:
+            values = np.asarray(self._column(well, analyte, 'v')[lo:hi])
+            return SeriesWindow(np.asarray(times[lo:hi]), values, values, values, raw_count, 0)
+        # Finest level with at most OVERSAMPLE buckets per output point; bucket-aligned at the window edges
+        sizes = [1, *self.catalog[well, analyte]['levels']]
+        level = next((i for i, size in enumerate(sizes) if raw_count / size <= max_points * OVERSAMPLE), len(sizes) - 1)
+        size = sizes[level]
+        if level:
+            b_lo, b_hi = lo // size, -(-hi // size)
+            t, low, high, mean = (np.asarray(self._column(well, analyte, f'l{level}_{c}')[b_lo:b_hi]) for c in ('t', 'min', 'max', 'mean'))
+        else:
+            t, mean = np.asarray(times[lo:hi]), np.asarray(self._column(well, analyte, 'v')[lo:hi])
+            low = high = mean
+        keep = lttb(t.astype(np.int64), mean, max_points)
+        # Each kept point carries the envelope of the buckets up to the next one
+        return SeriesWindow(t[keep], mean[keep], np.minimum.reduceat(low, keep), np.maximum.reduceat(high, keep), raw_count, level)
+
+
+@st.cache_resource(show_spinner='Opening monitoring records...')
+def _load_well_store(root):
+    return WellSeriesStore(root)
+
+
+def load_well_store(root=MONITORING_DIR):  # None when there are no monitoring records
+    if not os.path.exists(os.path.join(root, 'catalog.json')):
+        return None
+    return _load_well_store(root).refresh_if_changed()
@@ -1,14 +1,19 @@
 import streamlit as st
 
-from forms.contact import contact_form
+from forms.contact import contact_form, delivery_notice
+from utils.assets import load_asset, load_image
+from utils.profiling import trace
 
 @st.dialog('Contact Me')
 def toggle_contact_form():
     contact_form()
 
+delivery_notice()
+
 col1, col2 = st.columns(2, gap='medium', vertical_alignment='bottom')
 with col1:
-    st.image(r'./assets/IMG_1898-EDIT-EDIT.jpg', use_container_width=True,clamp=False)
+    with trace('asset.portrait'):
+        st.image(load_image(r'./assets/IMG_1898-EDIT-EDIT.jpg'), use_container_width=True,clamp=False)
 
 with col2:
     st.title('Ian Temchin', anchor=False)
@@ -56,13 +61,14 @@ with env:
              ____
     ''')    
 
-    with open(r'./assets/Resume_2025_Temchin.docx.pdf','rb') as resume:
-        pdfbyte = resume.read()
+    # Shared bytes, read from disk once per process rather than on every rerun
+    with trace('asset.resume'):
+        pdfbyte = load_asset(r'./assets/Resume_2025_Temchin.docx.pdf')
         st.download_button(
             label='📃 Remediation Resume (pdf)', data=pdfbyte, file_name='Temchin Resume, env remediation.pdf',mime='application/octet-stream')
 
-    with open(r'./assets/Copy of OSHA_40-hour_2011-2012.pdf', 'rb') as hazwoper:
-        pdfbyte = hazwoper.read()
+    with trace('asset.hazwoper'):
+        pdfbyte = load_asset(r'./assets/Copy of OSHA_40-hour_2011-2012.pdf')
         st.download_button(
             label='🪪 40HR HAZWOPER (pdf)', data=pdfbyte, file_name='Temchin HAZWOPER40.pdf',mime='application/octet-stream')
 
@@ -1,27 +1,141 @@
+import os
 import streamlit as st
 
+from utils.charts import draw_running_profit, show_chart
+from utils.downsample import lttb
+from utils.poker_ledger import ledger_metrics, load_poker_ledger
+from utils.poker_sim import (MODEL_ITM_RATE, PERCENTILES, SimParams, ledger_payout_table, load_simulation_cache, load_simulation_pool,
+                             model_payout_table, simulate)
+
 st.header('Poker Statistics 🃏')
 
+# Most points the running profit chart draws, however long the history gets
+MAX_CHART_POINTS = 1000
+
+# Figures as last published by hand, shown until a results file is deployed
+PUBLISHED = {
+    'entries': '1,524', 'average_stake': '$17.55', 'total_staked': '$34,125', 'total_cashes': '$44,598',
+    'biggest_win': '$8,110', 'biggest_win_caption': 'November 7, 2022\n\n\n\n$100 Sunday Special',
+    'wins': '33', 'final_tables': '150', 'lifetime_profit': '$7,188', 'average_profit': '$3.70',
+    'total_roi': '19.2%', 'average_roi': '20.2%', 'last_update': '17 January 2025',
+}
+
+
+# --- Load Results ---
+ledger = load_poker_ledger()
+snapshot = ledger.snapshot() if ledger else None
+if snapshot and snapshot.totals.entries:
+    totals = snapshot.totals
+    metrics = ledger_metrics(totals)
+    stats = {
+        'entries': f"{metrics['entries']:,}",
+        'average_stake': f"${metrics['average_stake']:,.2f}",
+        'total_staked': f"${metrics['total_staked']:,.0f}",
+        'total_cashes': f"${metrics['total_cashes']:,.0f}",
+        'biggest_win': f"${totals.biggest_win:,.0f}",
+        'biggest_win_caption': f"{totals.biggest_win_date:%B} {totals.biggest_win_date.day}, {totals.biggest_win_date.year}\n\n\n\n{totals.biggest_win_tournament}",
+        'wins': f"{metrics['wins']:,}",
+        'final_tables': f"{metrics['final_tables']:,}",
+        'lifetime_profit': f"${metrics['lifetime_profit']:,.0f}",
+        'average_profit': f"${metrics['average_profit']:,.2f}",
+        'total_roi': f"{metrics['total_roi']:.1%}",
+        'average_roi': f"{metrics['average_roi']:.1%}",
+        'last_update': f"{totals.last_date.day} {totals.last_date:%B %Y}",
+    }
+else:
+    stats = PUBLISHED
+
+
+# --- Headline Metrics ---
 col1, col2, col3, col4 = st.columns(4, gap='large')
 with col1:
-    st.metric('Total Entries', '1,524')
-    st.metric('Average Stake', '$17.55')
-    st.metric('Total Staked', '$34,125')
-    st.metric('Total Cashes', '$44,598')
+    st.metric('Total Entries', stats['entries'])
+    st.metric('Average Stake', stats['average_stake'])
+    st.metric('Total Staked', stats['total_staked'])
+    st.metric('Total Cashes', stats['total_cashes'])
     st.write('\n\n\n\n')
     cont = st.container(border=True)
     with cont:
         st.write('\n\n\n\n')
-        st.metric('Biggest Win', '$8,110')
-        st.caption('November 7, 2022\n\n\n\n$100 Sunday Special')
+        st.metric('Biggest Win', stats['biggest_win'])
+        st.caption(stats['biggest_win_caption'])
 with col2:
-    st.metric('Wins', '33')
-    st.metric('Final Tables', '150')
+    st.metric('Wins', stats['wins'])
+    st.metric('Final Tables', stats['final_tables'])
 with col3:
-    st.metric('Lifetime Profit', '$7,188')
-    st.metric('Average Profit', '$3.70')
+    st.metric('Lifetime Profit', stats['lifetime_profit'])
+    st.metric('Average Profit', stats['average_profit'])
 with col4:
-    st.metric('Total ROI', '19.2%')
-    st.metric('Average ROI', '20.2%')
+    st.metric('Total ROI', stats['total_roi'])
+    st.metric('Average ROI', stats['average_roi'])
+
+st.write(f"Last updates: {stats['last_update']}")
+
+
+# --- Running Profit ---
+if stats is not PUBLISHED:
+    # Downsampled so the chart costs the same for ten or a million entries
+    dates = snapshot.results['date']
+    keep = lttb(dates.to_numpy().astype('int64'), snapshot.running_profit, MAX_CHART_POINTS)
+    show_chart(('running_profit', snapshot.generation), draw_running_profit, dates.to_numpy()[keep], snapshot.running_profit[keep])
+
+
+# --- Bankroll Simulator ---
+st.subheader('Bankroll Simulator')
+st.caption('Monte Carlo runs of tournament sequences, drawing each result from '
+           + ('the recorded results.' if stats is not PUBLISHED else 'a typical tournament payout model.')
+           + ' Cash sizes are rescaled to the chosen ROI.')
+if stats is not PUBLISHED:
+    payout_key = ('ledger', snapshot.generation)
+    default_entries, default_stake, default_roi = totals.entries, metrics['average_stake'], metrics['total_roi']
+else:
+    payout_key = ('model', MODEL_ITM_RATE)
+    default_entries, default_stake, default_roi = 1524, 17.55, 0.192
+
+with st.form('bankroll_simulator'):
+    cola, colb, colc = st.columns(3)
+    with cola:
+        entries = st.number_input('Tournaments per run', min_value=10, max_value=20_000, value=min(int(default_entries), 20_000), step=100)
+        stake = st.number_input('Average stake ($)', min_value=0.5, value=round(float(default_stake), 2))
+    with colb:
+        bankroll_buyins = st.number_input('Starting bankroll (buy-ins)', min_value=1, value=100, step=10)
+        roi = st.number_input('Expected ROI (%)', min_value=-90.0, max_value=500.0, value=round(100 * float(default_roi), 1)) / 100
+    with colc:
+        sims = st.select_slider('Simulated runs', options=[10_000, 50_000, 100_000, 250_000], value=100_000)
+        parallel = st.toggle('Use worker processes', value=False)
+    run = st.form_submit_button('Run simulation')
+
+params = SimParams(int(entries), float(stake), float(stake) * bankroll_buyins, float(roi), int(sims), 0, payout_key)
+simulations = load_simulation_cache()
+
+
+def show_simulation(summary):
+    cola, colb, colc = st.columns(3)
+    cola.metric('Risk of Ruin', f'{summary.risk_of_ruin:.1%}')
+    colb.metric('Chance of a Losing Run', f'{summary.prob_loss:.1%}')
+    colc.metric('Median Worst Downswing', f'{summary.downswing_percentiles[50]:,.0f} buy-ins')
+    st.dataframe({
+        'Percentile': [f'{p}th' for p in PERCENTILES],
+        'ROI': [f'{summary.roi_percentiles[p]:.1%}' for p in PERCENTILES],
+        'Worst Downswing (buy-ins)': [f'{summary.downswing_percentiles[p]:,.0f}' for p in PERCENTILES],
+    }, hide_index=True)
+    if summary.sims_done < summary.sims:
+        st.caption(f'{summary.sims_done:,} of {summary.sims:,} runs')
+
 
-st.write(f'Last updates: 17 January 2025')
+summary = simulations.get(params)
+if summary is not None:
+    show_simulation(summary)
+elif run:
+    payout_table = ledger_payout_table(snapshot.results) if stats is not PUBLISHED else model_payout_table()
+    pool = load_simulation_pool(os.cpu_count() or 1) if parallel else None
+    # Partial percentiles are redrawn as each batch completes
+    progress = st.empty()
+    try:
+        for summary in simulate(params, payout_table, pool):
+            with progress.container():
+                show_simulation(summary)
+    except ValueError as e:
+        st.warning(f'Cannot simulate from these results. {e}', icon='⚠️')
+    else:
+        simulations.put(params, summary)
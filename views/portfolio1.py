@@ -1,3 +1,132 @@
+import numpy as np
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
-st.title('Groundwater Monitoring Simulation')
\ No newline at end of file
+from utils.charts import draw_plume, draw_well_record, draw_well_series, show_chart
+from utils.groundwater import GroundwaterParams
+from utils.groundwater_runner import ACTIVE, CANCELLED, DONE, FAILED, QUEUED, load_run_manager
+from utils.well_series import load_well_store
+
+st.title('Groundwater Monitoring Simulation')
+st.write('A contaminant source releases into an aquifer flowing left to right. After the recovery well switches on, '
+         'it bends the flow field and draws part of the plume in. Monitoring wells are sampled at every time step.')
+
+# Concentration that counts as a detection at a monitoring well
+DETECTION_LIMIT = 1.0  # mg/L
+GRIDS = {'Coarse (50 x 25)': (50, 25), 'Medium (100 x 50)': (100, 50), 'Fine (200 x 100)': (200, 100)}
+REFRESH_SECONDS = [1, 2, 5, 10]
+
+
+# --- Parameters ---
+defaults = GroundwaterParams()
+with st.form('groundwater_params'):
+    cola, colb, colc = st.columns(3)
+    with cola:
+        grid = st.selectbox('Grid', list(GRIDS), index=1)
+        k_mean = st.number_input('Mean hydraulic conductivity (m/d)', min_value=0.1, max_value=500.0, value=defaults.k_mean)
+        k_sigma = st.slider('Heterogeneity (std of ln K)', 0.0, 2.0, defaults.k_sigma, step=0.1)
+    with colb:
+        pump_rate = st.number_input('Recovery well rate (m³/d)', min_value=0.0, max_value=2000.0, value=defaults.pump_rate, step=50.0)
+        pump_start = st.number_input('Pump start (day)', min_value=0.0, value=defaults.pump_start, step=30.0)
+        alpha_l = st.number_input('Longitudinal dispersivity (m)', min_value=0.1, max_value=100.0, value=defaults.alpha_l)
+    with colc:
+        source_days = st.number_input('Source release (days)', min_value=0.0, value=defaults.source_days, step=30.0)
+        decay_half_life = st.number_input('Degradation half-life (days, 0 = none)', min_value=0.0, value=0.0, step=100.0)
+        days = st.number_input('Simulated period (days)', min_value=30.0, max_value=3650.0, value=defaults.days, step=30.0)
+    st.form_submit_button('Run simulation')
+
+nx, ny = GRIDS[grid]
+params = defaults._replace(
+    nx=nx, ny=ny, k_mean=k_mean, k_sigma=k_sigma, pump_rate=pump_rate, pump_start=pump_start, alpha_l=alpha_l,
+    alpha_t=alpha_l / 10, source_days=source_days, decay=np.log(2) / decay_half_life if decay_half_life else 0.0,
+    days=days, steps=max(1, int(days / 5)), snapshot_every=max(1, int(days / 5) // 30),
+)
+sim = load_run_manager().get(params, get_script_run_ctx().session_id)
+if sim.status not in (CANCELLED, FAILED):  # Stopped runs wait for Resume
+    sim.start()
+
+
+# --- Run Controls ---
+progress = sim.progress()
+cola, colb = st.columns([3, 1])
+with cola:
+    cadence = st.select_slider('Refresh while running', options=REFRESH_SECONDS, value=2, format_func=lambda s: f'every {s} s')
+with colb:
+    if progress.status in ACTIVE:
+        st.button('Cancel run', on_click=sim.cancel, use_container_width=True)
+    elif progress.status in (CANCELLED, FAILED):
+        st.button('Resume run', on_click=sim.start, use_container_width=True)
+
+
+def show_results(live):
+    progress = sim.progress()
+    if live and progress.status not in ACTIVE:
+        st.rerun()  # Finished or cancelled: redraw the whole page once and stop polling
+    if progress.status == FAILED:
+        st.error(f'The simulation failed: {progress.error}')
+    elif progress.status == QUEUED:
+        st.info('Waiting for a free simulation worker...', icon='⏳')
+    elif progress.status != DONE:
+        st.progress(progress.steps_done / progress.steps,
+                    text=f'Day {progress.steps_done * params.days / params.steps:,.0f} of {params.days:,.0f} '
+                         f'({progress.steps_done} of {progress.steps} steps{", cancelled" if progress.status == CANCELLED else ""})')
+    if not progress.steps_done:
+        return
+    run = sim.result()
+    # Partial runs change on every refresh, so only finished charts are cached
+    cached = progress.status == DONE
+
+    # --- Monitoring Wells ---
+    st.subheader('Monitoring Wells')
+    detected = run.well_conc >= DETECTION_LIMIT
+    cols = st.columns(len(run.well_names))
+    for col, name, well_detected, peak in zip(cols, run.well_names, detected.T, run.well_conc.max(axis=0)):
+        first = run.times[well_detected.argmax()] if well_detected.any() else None
+        col.metric(f'{name} peak', f'{peak:,.1f} mg/L')
+        col.caption(f'First detected on day {first:,.0f}' if first is not None else 'Not detected')
+
+    cola, colb = st.columns(2)
+    with cola:
+        show_chart(('well_conc', params) if cached else None, draw_well_series, run.times, run.well_conc, run.well_names,
+                   'Concentration (mg/L)', figsize=(8, 4))
+    with colb:
+        show_chart(('well_heads', params) if cached else None, draw_well_series, run.times, run.well_heads, run.well_names,
+                   'Head (m)', figsize=(8, 4))
+
+    # --- Plume Map ---
+    st.subheader('Plume Map')
+    if not len(run.snapshot_times):
+        return
+    snapshot = st.select_slider('Day', options=range(len(run.snapshot_times)), value=len(run.snapshot_times) - 1,
+                                format_func=lambda i: f'{run.snapshot_times[i]:,.0f}')
+    show_chart(('plume', params, snapshot) if cached else None, draw_plume, run.x, run.y, run.plumes[snapshot], run.heads[snapshot],
+               params.wells, (params.pump_x, params.pump_y), figsize=(10, 5))
+    cell_area = (run.x[1] - run.x[0]) * (run.y[1] - run.y[0])
+    st.caption(f'Plume area above {DETECTION_LIMIT:g} mg/L: {(run.plumes[snapshot] >= DETECTION_LIMIT).sum() * cell_area:,.0f} m² · '
+               f'{len(run.times)} flow steps, {run.substeps:,} transport substeps')
+
+
+# Polls the run while it computes; once it stops the results are drawn once and stay put
+live = progress.status in ACTIVE
+st.fragment(show_results, run_every=cadence if live else None)(live)
+
+
+# --- Monitoring Record ---
+# Field data, when a monitoring store is present; any window is drawn from at most MAX_POINTS points
+store = load_well_store()
+if store is not None:
+    st.subheader('Monitoring Record')
+    cola, colb = st.columns(2)
+    well = cola.selectbox('Well', store.wells())
+    analyte = colb.selectbox('Analyte', store.analytes(well))
+    first, last = (t.item() for t in store.span(well, analyte))
+    if first < last:
+        start, end = st.slider('Window', min_value=first, max_value=last, value=(first, last), format='YYYY-MM-DD')
+    else:
+        start, end = first, last
+    window = store.query(well, analyte, start, end)
+    unit = store.unit(well, analyte)
+    show_chart(('well_record', store.version, well, analyte, start, end), draw_well_record, window.times, window.values,
+               window.lower, window.upper, f'{analyte} ({unit})' if unit else analyte, figsize=(10, 4))
+    st.caption(f'{window.raw_count:,} samples drawn as {len(window.times):,} points'
+               + (', shaded between the minimum and maximum behind each point' if window.raw_count > len(window.times) else ''))